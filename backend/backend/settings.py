@@ -22,13 +22,28 @@ ALLOWED_HOSTS = ["*"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_PAGINATION_CLASS": "users.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": 50,
+    # orjson-backed JSON (optional dependency, falls back to the stdlib), see users/renderers.py
+    "DEFAULT_RENDERER_CLASSES": [
+        "users.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "users.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+# Build list pages from values_list() rows instead of model instances, see users/fast_serialization.py
+FAST_LIST_SERIALIZATION = os.getenv("FAST_LIST_SERIALIZATION", "false").lower() == "true"
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -36,6 +51,98 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
+# Resolved JWT users are cached per process and in the shared cache, see users/authentication.py
+JWT_USER_CACHE = {
+    "ALIAS": "default",
+    "LOCAL_MAXSIZE": 10000,
+    "LOCAL_TTL": int(os.getenv("JWT_USER_CACHE_LOCAL_TTL", "5")),
+    "SHARED_TTL": int(os.getenv("JWT_USER_CACHE_SHARED_TTL", "300")),
+}
+
+# Rendered GET /api/auth/profile/ payloads, see users/profile_cache.py
+PROFILE_CACHE = {
+    "ALIAS": "default",
+    "TTL": int(os.getenv("PROFILE_CACHE_TTL", "300")),
+}
+
+# Bloom filter of blacklisted refresh tokens, see users/revocation.py
+TOKEN_REVOCATION_FILTER = {
+    "capacity": int(os.getenv("TOKEN_REVOCATION_CAPACITY", "100000")),
+    "error_rate": 0.01,
+    "alias": "default",
+}
+
+# Per-route timing/query metrics and the slow request log, see users/instrumentation.py
+REQUEST_METRICS = {
+    "ENABLED": os.getenv("REQUEST_METRICS", "true").lower() == "true",
+    "SLOW_REQUEST_MS": int(os.getenv("SLOW_REQUEST_MS", "500")),
+    "SLOW_REQUEST_QUERIES": int(os.getenv("SLOW_REQUEST_QUERIES", "50")),
+    "MAX_CAPTURED_QUERIES": 100,
+    # Recent requests per route behind the p50/p95/p99 summary
+    "WINDOW": 1024,
+}
+
+# Bearer token for Prometheus scrapes of /api/metrics/ (staff JWTs work as well)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Deferred follow-up work (welcome emails, audit log, cache warm-up), see users/task_queue.py.
+# "thread" runs tasks in a pool inside each web process, "database" queues them in the
+# users_task table for `manage.py run_tasks` workers, "immediate" runs them inline.
+TASK_QUEUE = {
+    "BACKEND": os.getenv("TASK_QUEUE_BACKEND", "thread"),
+    "WORKERS": int(os.getenv("TASK_QUEUE_WORKERS", "2")),
+    # Tasks waiting per worker thread before new ones run inline
+    "QUEUE": 100,
+    # Database backend: attempts per task, first retry delay in seconds (doubled per attempt)
+    # and how long a running task may go without finishing before it is retried
+    "MAX_ATTEMPTS": int(os.getenv("TASK_QUEUE_MAX_ATTEMPTS", "5")),
+    "RETRY_DELAY": 30,
+    "STALE_AFTER": 600,
+}
+
+# Borrower imports through POST /api/clients/bulk_import/, see users/bulk_import.py: password
+# hashing processes per request (1 hashes inline) and the largest files accepted, with
+# passwords (about 0.4s of hashing per row) and in invitation mode (nothing to hash)
+BULK_IMPORT = {
+    "WORKERS": int(os.getenv("BULK_IMPORT_WORKERS", "1")),
+    "MAX_ROWS": int(os.getenv("BULK_IMPORT_MAX_ROWS", "50")),
+    "MAX_INVITE_ROWS": int(os.getenv("BULK_IMPORT_MAX_INVITE_ROWS", "5000")),
+}
+
+# Dashboard rollups, see users/dashboards.py: reported stale once the last full refresh
+# (`manage.py refresh_dashboards`, run on a schedule) is older than this many seconds
+DASHBOARD_REFRESH_INTERVAL = int(os.getenv("DASHBOARD_REFRESH_INTERVAL", "3600"))
+
+# WebSocket notifications, see users/notifications.py. The local broker only reaches
+# sockets of the same process: use "redis" with several ASGI workers or run_tasks workers
+NOTIFICATIONS = {
+    "BROKER": os.getenv("NOTIFICATIONS_BROKER", "local"),
+    "REDIS_URL": os.getenv("NOTIFICATIONS_REDIS_URL", os.getenv("REDIS_URL", "")),
+    "CHANNEL": "avendro:notifications",
+    "PATH": "/ws/notifications/",
+    # Events waiting on one socket before it is closed as too slow
+    "QUEUE": 100,
+}
+
+# Outgoing mail; printed to the console unless EMAIL_BACKEND is configured
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "false").lower() == "true"
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "Avendro <no-reply@avendro.ph>")
+
+# Shared cache; set REDIS_URL in production so every worker sees the same entries
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    } if os.getenv("REDIS_URL") else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -55,6 +162,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its wall time covers the rest of the stack
+    'users.instrumentation.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,6 +202,21 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 AUTH_USER_MODEL = 'users.CustomUser'
 
 # Database
+# Connection reuse: DB_POOL=true keeps a psycopg 3 pool of DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE
+# connections per process (use it under ASGI, where persistent connections are not reused
+# across requests). Otherwise each thread keeps its connection for DB_CONN_MAX_AGE seconds.
+# Either way connections are health-checked before reuse. See users/db_metrics.py for metrics.
+DB_POOL = os.getenv('DB_POOL', 'false').lower() == 'true'
+
+DB_POOL_OPTIONS = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    # Seconds a request waits for a free connection before failing
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -101,9 +225,25 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', '!Poypoy.mignon!01'),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        # Pooled connections go back to the pool instead
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            **({'pool': DB_POOL_OPTIONS} if DB_POOL else {}),
+        },
     }
 }
 
+# DB_ENGINE=sqlite runs against a local SQLite file instead (development and
+# benchmark stand-in; PostgreSQL-only indexes are skipped by their migrations)
+if os.getenv('DB_ENGINE', 'postgresql') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -123,6 +263,45 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# PASSWORD_HASHER picks the algorithm for new hashes (pbkdf2, argon2 or scrypt);
+# the others stay installed so existing hashes verify and upgrade on login.
+# argon2 requires the optional argon2-cffi package.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+
+PASSWORD_HASHER_OPTIONS = {
+    'pbkdf2_iterations': int(os.getenv('PBKDF2_ITERATIONS', '1000000')),
+    'argon2_time_cost': int(os.getenv('ARGON2_TIME_COST', '2')),
+    'argon2_memory_cost': int(os.getenv('ARGON2_MEMORY_COST', '102400')),
+    'argon2_parallelism': int(os.getenv('ARGON2_PARALLELISM', '8')),
+    'scrypt_work_factor': int(os.getenv('SCRYPT_WORK_FACTOR', str(2 ** 14))),
+    'scrypt_block_size': int(os.getenv('SCRYPT_BLOCK_SIZE', '8')),
+    'scrypt_parallelism': int(os.getenv('SCRYPT_PARALLELISM', '5')),
+}
+
+_PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'users.hashers.TunablePBKDF2PasswordHasher',
+    'argon2': 'users.hashers.TunableArgon2PasswordHasher',
+    'scrypt': 'users.hashers.TunableScryptPasswordHasher',
+}
+
+PASSWORD_HASHERS = [_PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+]
+# Django's other default hashers, so hashes in their formats still verify and upgrade.
+# Its pbkdf2, argon2 and scrypt hashers are left out: the last hasher listed for an
+# algorithm is the one that checks its hashes, which must stay the tunable one.
+PASSWORD_HASHERS += [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Login password verification pool, see users/backends.py (0 = verify in the request thread)
+AUTHENTICATION_BACKENDS = ['users.backends.PooledModelBackend']
+LOGIN_HASH_POOL_WORKERS = int(os.getenv('LOGIN_HASH_POOL_WORKERS', '0'))
+LOGIN_HASH_POOL_QUEUE = int(os.getenv('LOGIN_HASH_POOL_QUEUE', '4'))
+LOGIN_HASH_POOL_WAIT = float(os.getenv('LOGIN_HASH_POOL_WAIT', '2'))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
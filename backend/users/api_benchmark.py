@@ -0,0 +1,312 @@
+"""
+End-to-end benchmark of the users API.
+
+Each scenario drives one endpoint through Django's full request stack
+(middleware, JWT authentication, DRF) in process: a warm-up, a timed pass for
+throughput and latency percentiles, then a short profiling pass that counts
+queries per request and the peak memory allocated while handling one request.
+Runs are appended to a JSON lines file tagged with the git commit, so
+``compare()`` can flag regressions against an earlier run with the same
+database vendor and data volumes.
+"""
+import json
+import logging
+import os
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .benchmarking import seeded_users, summarize_latencies, timed
+from .models import CustomUser
+
+BENCH_EMAIL_DOMAIN = 'bench.avendro.test'
+PASSWORD = 'Bench-api-pass-1'
+DEFAULT_RESULTS = Path(settings.BASE_DIR) / 'benchmarks' / 'api.jsonl'
+
+
+def borrower_registration(index, run):
+    return {
+        'email': f'borrower-{run}-{index}@{BENCH_EMAIL_DOMAIN}',
+        'username': f'bench-borrower-{run}-{index}',
+        'password': PASSWORD,
+        'password_confirm': PASSWORD,
+        'first_name': 'Maria',
+        'last_name': f'Clara {index}',
+        'gender': 'female',
+        'current_street': '1 Rizal St',
+        'current_barangay': 'San Roque',
+        'current_city': 'Quezon City',
+        'current_region': 'ncr',
+        'permanent_street': '1 Rizal St',
+        'permanent_barangay': 'San Roque',
+        'permanent_city': 'Quezon City',
+        'permanent_region': 'ncr',
+        'employment_status': 'employed',
+        'company_name': 'Bench Corp',
+        'job_title': 'Analyst',
+        'monthly_income': '45000.00',
+        'bank_name': 'BDO',
+        'bank_account_number': f'{index:010d}',
+        'bank_account_name': f'Maria Clara {index}',
+    }
+
+
+def company_registration(index, run):
+    return {
+        'email': f'company-{run}-{index}@{BENCH_EMAIL_DOMAIN}',
+        'username': f'bench-company-{run}-{index}',
+        'password': PASSWORD,
+        'password_confirm': PASSWORD,
+        'first_name': 'Jose',
+        'last_name': 'Rizal',
+        'company_name': f'Bench Lending {run}-{index}',
+        'business_street': '1 Ayala Ave',
+        'business_barangay': 'Bel-Air',
+        'business_city': 'Makati',
+        'business_region': 'ncr',
+        'contact_person_name': 'Jose Rizal',
+        'contact_person_email': f'contact-{run}-{index}@{BENCH_EMAIL_DOMAIN}',
+        'contact_person_phone': '09170000000',
+        'company_phone': '0281234567',
+        'sec_registration_number': f'BENCH-SEC-{run}-{index}',
+        'company_tin': f'T{run}-{index}',
+        'business_type': 'Lending Company',
+        'license_number': f'BENCH-LIC-{run}-{index}',
+        'loan_products_offered': ['personal', 'salary'],
+        'minimum_interest_rate': '1.50',
+        'maximum_interest_rate': '3.00',
+        'processing_fee': '2.00',
+        'late_payment_fee': '5.00',
+        'lending_policy_description': 'Salary-backed loans for employed borrowers.',
+        'minimum_loan_amount': '5000.00',
+        'maximum_loan_amount': '500000.00',
+        'loan_term_minimum_months': 3,
+        'loan_term_maximum_months': 36,
+        'bank_name': 'BPI',
+        'bank_account_number': f'{index:010d}',
+        'bank_account_name': f'Bench Lending {index}',
+        'bank_branch': 'Makati',
+    }
+
+
+class Scenario:
+    """
+    One endpoint; payload is a dict or a callable(benchmark, index) building request number index
+    """
+    def __init__(self, name, method, path, payload=None, as_user=None, expected=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.payload = payload
+        self.as_user = as_user
+        self.expected = expected
+
+    def request(self, client, benchmark, index):
+        data = self.payload(benchmark, index) if callable(self.payload) else self.payload
+        if self.method == 'GET':
+            return client.get(self.path, data)
+        return client.post(self.path, data, content_type='application/json')
+
+
+SCENARIOS = [
+    Scenario('register_borrower', 'POST', '/api/auth/register_borrower/',
+             lambda benchmark, index: borrower_registration(index, benchmark.run_id), expected=201),
+    Scenario('register_company', 'POST', '/api/auth/register_company/',
+             lambda benchmark, index: company_registration(index, benchmark.run_id), expected=201),
+    Scenario('login', 'POST', '/api/auth/login/',
+             {'email': f'borrower@{BENCH_EMAIL_DOMAIN}', 'password': PASSWORD}),
+    Scenario('profile', 'GET', '/api/auth/profile/', as_user='borrower'),
+    Scenario('refresh_token', 'POST', '/api/auth/refresh_token/',
+             lambda benchmark, index: {'refresh': str(benchmark.tokens['borrower'])}, as_user='borrower'),
+    Scenario('client_list', 'GET', '/api/clients/', as_user='admin'),
+    Scenario('company_list', 'GET', '/api/companies/', as_user='admin'),
+    Scenario('user_list', 'GET', '/api/users/', as_user='admin'),
+    Scenario('lender_search', 'GET', '/api/companies/search/',
+             {'amount': '20000', 'term': 12, 'product': 'personal', 'region': 'ncr'}, as_user='borrower'),
+    Scenario('loan_quotes', 'POST', '/api/companies/quotes/',
+             {'amounts': ['20000', '50000'], 'terms': [6, 12, 24], 'product': 'personal'}, as_user='borrower'),
+    Scenario('dashboards', 'GET', '/api/dashboards/', as_user='admin'),
+]
+
+
+def git_commit():
+    """
+    (commit hash, has uncommitted changes) of the checkout, or ('unknown', False)
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+    return commit, bool(status.strip())
+
+
+class ApiBenchmark:
+    """
+    Run scenarios against the current database and collect a result record
+    """
+    def __init__(self, requests=200, warmup=10, profile=20):
+        self.requests = requests
+        self.warmup = warmup
+        self.profile = profile
+        # Short enough for company_tin (max 20 characters) with the request number appended
+        self.run_id = format(time.time_ns() // 1000, 'x')[-10:]
+        self.users = {}
+        self.tokens = {}
+
+    def setup(self):
+        self.cleanup()
+        self.users['borrower'] = CustomUser.objects.create_user(
+            email=f'borrower@{BENCH_EMAIL_DOMAIN}', username='bench-borrower', password=PASSWORD,
+            user_type='borrower', role='borrower',
+        )
+        self.users['admin'] = CustomUser.objects.create_user(
+            email=f'admin@{BENCH_EMAIL_DOMAIN}', username='bench-admin', password=PASSWORD,
+            user_type='lending_company', role='admin',
+        )
+        self.tokens = {name: RefreshToken.for_user(user) for name, user in self.users.items()}
+
+    def cleanup(self):
+        CustomUser.objects.filter(email__endswith=f'@{BENCH_EMAIL_DOMAIN}').delete()
+
+    def client_for(self, scenario):
+        client = HttpClient()
+        if scenario.as_user:
+            client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {self.tokens[scenario.as_user].access_token}'
+        return client
+
+    def run_scenario(self, scenario):
+        client = self.client_for(scenario)
+        # Each pass uses its own request numbers, so registrations never collide
+        numbers = iter(range(self.warmup + self.requests + self.profile))
+        failures = 0
+
+        def send():
+            nonlocal failures
+            response = scenario.request(client, self, next(numbers))
+            if response.status_code != scenario.expected:
+                failures += 1
+            return response
+
+        for _ in range(self.warmup):
+            send()
+
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(self.requests):
+            with timed(latencies):
+                send()
+        elapsed = time.perf_counter() - started
+
+        queries = []
+        peaks = []
+        tracemalloc.start()
+        try:
+            for _ in range(self.profile):
+                baseline = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                with CaptureQueriesContext(connection) as captured:
+                    send()
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+                queries.append(len(captured))
+        finally:
+            tracemalloc.stop()
+
+        summary = summarize_latencies(latencies)
+        summary.update({
+            'failed': failures,
+            'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+            'peak_kib_per_request': round(max(peaks) / 1024, 1) if peaks else None,
+        })
+        return summary
+
+    def run(self, scenarios, progress=None):
+        commit, dirty = git_commit()
+        record = {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'vendor': connection.vendor,
+            'borrowers': seeded_users('b').count(),
+            'lenders': seeded_users('l').count(),
+            'requests': self.requests,
+            'scenarios': {},
+        }
+        # tracemalloc slows every request down, so the slow request log would fire on most of them
+        slow_log = logging.getLogger('users.instrumentation')
+        level = slow_log.level
+        slow_log.setLevel(logging.ERROR)
+        self.setup()
+        try:
+            for scenario in scenarios:
+                record['scenarios'][scenario.name] = self.run_scenario(scenario)
+                if progress:
+                    progress(scenario.name, record['scenarios'][scenario.name])
+        finally:
+            self.cleanup()
+            slow_log.setLevel(level)
+        # ru_maxrss is KiB on Linux
+        record['max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return record
+
+
+def load_results(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as results:
+        return [json.loads(line) for line in results if line.strip()]
+
+
+def save_result(path, record):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a') as results:
+        results.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def find_baseline(records, record, commit=None):
+    """
+    The latest earlier run on the same vendor and data volumes (optionally of a given commit)
+    """
+    for candidate in reversed(records):
+        if (candidate['vendor'], candidate['borrowers'], candidate['lenders']) != (
+                record['vendor'], record['borrowers'], record['lenders']):
+            continue
+        if commit and not candidate['commit'].startswith(commit):
+            continue
+        return candidate
+    return None
+
+
+def compare(baseline, record, threshold=25, noise_ms=1.0):
+    """
+    (scenario, metric, before, after) regressions: p50/p95 slower by more than threshold
+    percent and noise_ms, or more queries per request
+    """
+    regressions = []
+    for name, after in record['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        # Timings of failing requests say nothing about the endpoint
+        if not before or not before.get('count') or not after.get('count') or before['failed'] or after['failed']:
+            continue
+        for metric in ('p50_ms', 'p95_ms'):
+            if (after[metric] > before[metric] * (1 + threshold / 100)
+                    and after[metric] - before[metric] > noise_ms):
+                regressions.append((name, metric, before[metric], after[metric]))
+        if (after['queries_per_request'] or 0) > (before['queries_per_request'] or 0):
+            regressions.append((name, 'queries_per_request', before['queries_per_request'], after['queries_per_request']))
+    return regressions
@@ -0,0 +1,150 @@
+"""
+Async variants of the login, profile and token refresh endpoints.
+
+Mounted under ``/api/async/auth/`` next to the AuthViewSet actions, with the
+same request and response bodies. Every database and cache round trip is
+awaited through Django's async ORM and cache APIs, and password hashing runs
+off the event loop (see users/backends.py), so under an ASGI server one worker
+can keep many slow connections open without holding a thread for each.
+simplejwt has no async API: creating a refresh token (an OutstandingToken
+insert) and checking the blacklist run in a worker thread.
+
+DRF views are sync-only, so these are plain Django views that accept JSON
+bodies and answer errors the way DRF's exception handler would.
+"""
+import io
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, MethodNotAllowed, NotAuthenticated, UnsupportedMediaType,
+)
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication
+from .models import Company
+from .parsers import FastJSONParser
+from .profile_cache import profile_cache
+from .renderers import FastJSONRenderer
+from .revocation import FastRevocationRefreshToken
+from .serializers import AsyncLoginSerializer
+
+authenticator = CachedJWTAuthentication()
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status, content_type='application/json', headers=headers,
+    )
+
+
+def error_response(exc):
+    """
+    The response DRF's exception handler gives for an APIException
+    """
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    headers = {}
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        headers['WWW-Authenticate'] = authenticator.authenticate_header(None)
+    if getattr(exc, 'wait', None):
+        headers['Retry-After'] = '%d' % exc.wait
+    return json_response(data, exc.status_code, headers)
+
+
+def parse_json(request):
+    """
+    The JSON request body as Python data ({} for an empty body)
+    """
+    if not request.body:
+        return {}
+    if request.content_type != 'application/json':
+        raise UnsupportedMediaType(request.content_type)
+    return FastJSONParser().parse(
+        io.BytesIO(request.body), 'application/json', {'encoding': request.encoding or 'utf-8'},
+    )
+
+
+def async_api_view(methods, authenticated=False):
+    """
+    Restrict an async view to methods, optionally require a JWT, and render API errors
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise MethodNotAllowed(request.method)
+                if authenticated:
+                    request.user, request.auth = await authenticator.aauthenticate(request)
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return error_response(exc)
+        return wrapper
+    return decorator
+
+
+@async_api_view(['POST'])
+async def login(request):
+    """
+    Login for both borrowers and lending companies
+    """
+    serializer = AsyncLoginSerializer(data=parse_json(request))
+    if not await serializer.ais_valid():
+        return json_response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    user = serializer.validated_data['user']
+
+    refresh = await sync_to_async(RefreshToken.for_user)(user)
+
+    additional_data = {}
+    if user.user_type == 'lending_company':
+        company_name = await (
+            Company.objects.filter(user=user).values_list('company_name', flat=True).afirst()
+        )
+        if company_name is not None:
+            additional_data['company_name'] = company_name
+
+    return json_response({
+        'message': 'Login successful',
+        'user': {
+            'id': user.id,
+            'email': user.email,
+            'user_type': user.user_type,
+            'role': user.role,
+            'full_name': user.get_full_name(),
+            **additional_data
+        },
+        'tokens': {
+            'access': str(refresh.access_token),
+            'refresh': str(refresh)
+        }
+    })
+
+
+@async_api_view(['GET'], authenticated=True)
+async def profile(request):
+    """
+    Current user profile (cached per user, honors If-None-Match)
+    """
+    return await profile_cache.aresponse(request)
+
+
+@async_api_view(['POST'], authenticated=True)
+async def refresh_token(request):
+    """
+    Refresh access token using refresh token
+    """
+    data = parse_json(request)
+    refresh_token = data.get('refresh') if isinstance(data, dict) else None
+    if not refresh_token or not isinstance(refresh_token, str):
+        return json_response({'error': 'Refresh token required'}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        refresh = await sync_to_async(FastRevocationRefreshToken)(refresh_token)
+    except TokenError:
+        return json_response({'error': 'Invalid refresh token'}, status.HTTP_401_UNAUTHORIZED)
+    return json_response({'access': str(refresh.access_token)})
@@ -0,0 +1,193 @@
+"""
+JWT authentication that resolves the token's user from a cache.
+
+Users are cached as field snapshots (everything but the password hash) in a
+per-process LRU with a short TTL, backed by the shared Django cache with a
+longer one. Saving or deleting a CustomUser drops both entries (see
+users/signals.py); other processes can serve their local copy for at most
+``LOCAL_TTL`` seconds. Bulk ``QuerySet.update()`` calls bypass the signals,
+so call ``user_cache.invalidate()`` after them.
+
+``aauthenticate()`` is the same flow for async views, using the async cache
+and ORM APIs. ``MetricsTokenAuthentication`` lets monitoring scrapers in with a
+static token instead of a user account.
+"""
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CustomUser
+
+# The password hash stays deferred and only loads if a view asks for it
+CACHED_FIELDS = tuple(
+    field.attname for field in CustomUser._meta.concrete_fields if field.attname != 'password'
+)
+
+
+class UserCache:
+    """
+    Local LRU in front of the shared cache, keyed by user id
+    """
+    key_prefix = 'jwt-user'
+
+    def __init__(self, options):
+        self.maxsize = options.get('LOCAL_MAXSIZE', 10000)
+        self.local_ttl = options.get('LOCAL_TTL', 5)
+        self.shared_ttl = options.get('SHARED_TTL', 300)
+        self.alias = options.get('ALIAS', 'default')
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def get(self, user_id):
+        """
+        Return a fresh CustomUser instance for user_id, or None on a miss
+        """
+        user = self._get_local(user_id)
+        if user is not None:
+            return user
+        snapshot = caches[self.alias].get(self._key(user_id))
+        if snapshot is None:
+            return None
+        self._remember(user_id, snapshot)
+        return self._build(snapshot)
+
+    async def aget(self, user_id):
+        user = self._get_local(user_id)
+        if user is not None:
+            return user
+        snapshot = await caches[self.alias].aget(self._key(user_id))
+        if snapshot is None:
+            return None
+        self._remember(user_id, snapshot)
+        return self._build(snapshot)
+
+    def set(self, user):
+        snapshot = {name: getattr(user, name) for name in CACHED_FIELDS}
+        caches[self.alias].set(self._key(user.pk), snapshot, self.shared_ttl)
+        self._remember(user.pk, snapshot)
+
+    async def aset(self, user):
+        snapshot = {name: getattr(user, name) for name in CACHED_FIELDS}
+        await caches[self.alias].aset(self._key(user.pk), snapshot, self.shared_ttl)
+        self._remember(user.pk, snapshot)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._local.pop(user_id, None)
+        caches[self.alias].delete(self._key(user_id))
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def _get_local(self, user_id):
+        with self._lock:
+            entry = self._local.get(user_id)
+            if entry is not None:
+                expires_at, snapshot = entry
+                if expires_at > time.monotonic():
+                    self._local.move_to_end(user_id)
+                    return self._build(snapshot)
+                del self._local[user_id]
+        return None
+
+    def _remember(self, user_id, snapshot):
+        with self._lock:
+            self._local[user_id] = (time.monotonic() + self.local_ttl, snapshot)
+            self._local.move_to_end(user_id)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def _build(self, snapshot):
+        names = [name for name in CACHED_FIELDS if name in snapshot]
+        return CustomUser.from_db(DEFAULT_DB_ALIAS, names, [snapshot[name] for name in names])
+
+
+user_cache = UserCache(getattr(settings, 'JWT_USER_CACHE', {}))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that skips the user lookup when the user is cached
+    """
+    def get_user(self, validated_token):
+        # Revocation by password change needs the current hash on every request
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user)
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views: a (user, token) pair, raising when no token was sent
+        """
+        header = self.get_header(request)
+        raw_token = None if header is None else self.get_raw_token(header)
+        if raw_token is None:
+            raise NotAuthenticated()
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            return await sync_to_async(super().get_user)(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = await user_cache.aget(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            await user_cache.aset(user)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """
+    Accept ``Authorization: Bearer <METRICS_TOKEN>``; any other header is left to the next authenticator
+    """
+    def authenticate(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        header = get_authorization_header(request).split()
+        if not token or len(header) != 2 or header[0].lower() != b'bearer':
+            return None
+        if not hmac.compare_digest(header[1], token.encode()):
+            return None
+        return AnonymousUser(), None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
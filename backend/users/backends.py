@@ -0,0 +1,105 @@
+"""
+Authentication backend that can verify passwords in a bounded process pool.
+
+Password hashing is pure CPU. With ``LOGIN_HASH_POOL_WORKERS`` set, request
+threads hand verification to a shared pool of that many processes, so a login
+burst can use at most that many cores and the remaining cores keep serving
+other endpoints. When every slot is busy for ``LOGIN_HASH_POOL_WAIT`` seconds
+the login is rejected with 429 instead of queueing without bound.
+
+``aauthenticate()`` never hashes on the event loop: it awaits the pool, or a
+worker thread when the pool is off.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, verify_password
+from rest_framework.exceptions import Throttled
+
+UserModel = get_user_model()
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_slots = None
+
+
+def _get_pool():
+    global _pool, _pool_slots
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.LOGIN_HASH_POOL_WORKERS
+            _pool = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+            # Allow a short queue per worker; beyond that, shed load
+            _pool_slots = threading.BoundedSemaphore(workers * settings.LOGIN_HASH_POOL_QUEUE)
+    return _pool, _pool_slots
+
+
+def verify_in_pool(password, encoded):
+    """
+    Run verify_password() in the hashing pool and return (is_correct, must_update)
+    """
+    pool, slots = _get_pool()
+    if not slots.acquire(timeout=settings.LOGIN_HASH_POOL_WAIT):
+        raise Throttled(detail='Too many concurrent logins, please retry shortly.')
+    try:
+        return pool.submit(verify_password, password, encoded).result()
+    finally:
+        slots.release()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend that offloads password verification when the pool is enabled
+    """
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if not settings.LOGIN_HASH_POOL_WORKERS:
+            return super().authenticate(request, username=username, password=password, **kwargs)
+
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # verify_password() runs the default hasher for unusable hashes,
+            # keeping the timing of nonexistent users in line (#20760)
+            verify_in_pool(password, UNUSABLE_PASSWORD_PREFIX)
+            return None
+
+        is_correct, must_update = verify_in_pool(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            user.set_password(password)
+            user.save(update_fields=['password'])
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        # Hashing blocks for the whole verification, so keep it off the event loop
+        if settings.LOGIN_HASH_POOL_WORKERS:
+            verify = sync_to_async(verify_in_pool, thread_sensitive=False)
+        else:
+            verify = sync_to_async(verify_password, thread_sensitive=False)
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await verify(password, UNUSABLE_PASSWORD_PREFIX)
+            return None
+
+        is_correct, must_update = await verify(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if must_update:
+            await sync_to_async(user.set_password, thread_sensitive=False)(password)
+            await user.asave(update_fields=['password'])
+        return user
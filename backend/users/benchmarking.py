@@ -0,0 +1,206 @@
+"""
+Shared helpers for the benchmark management commands.
+"""
+import math
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .choices import EMPLOYMENT_STATUSES, GENDERS, LOAN_PRODUCTS, MARITAL_STATUSES, REGIONS
+from .client_search import document_for
+from .models import CustomUser, Client, Company
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of an unsorted list of numbers
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies):
+    """
+    Latency summary in milliseconds for a list of durations in seconds
+    """
+    if not latencies:
+        return {'count': 0}
+    return {
+        'count': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+    }
+
+
+@contextmanager
+def timed(latencies):
+    """
+    Append the duration of the block (seconds) to latencies
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        latencies.append(time.perf_counter() - start)
+
+
+SEED_EMAIL_DOMAIN = 'seed.avendro.test'
+
+# Codes come from the choices registry, in its order
+SEED_REGIONS = list(REGIONS.labels)
+SEED_EMPLOYMENT = list(EMPLOYMENT_STATUSES.labels)
+SEED_PRODUCTS = list(LOAN_PRODUCTS.labels)
+SEED_GENDERS = list(GENDERS.labels)
+SEED_MARITAL_STATUSES = list(MARITAL_STATUSES.labels) + [None]
+SEED_CITIES = ['Quezon City', 'Manila', 'Cebu City', 'Davao City', 'Makati', 'Iloilo City', 'Baguio', 'Zamboanga City']
+SEED_BARANGAYS = ['San Roque', 'Poblacion', 'Santo Nino', 'San Isidro', 'Bagong Silang', 'Mabini', 'Lahug']
+SEED_FIRST_NAMES = ['Juan', 'Maria', 'Jose', 'Ana', 'Mark', 'Angel', 'John', 'Kristine', 'Paolo', 'Grace']
+SEED_LAST_NAMES = ['Dela Cruz', 'Santos', 'Reyes', 'Garcia', 'Mendoza', 'Bautista', 'Villanueva', 'Ramos']
+
+
+def seeded_users(kind):
+    """
+    Seeded users of one kind ('b' borrowers, 'l' lenders)
+    """
+    return CustomUser.objects.filter(email__endswith=f'@{kind}.{SEED_EMAIL_DOMAIN}')
+
+
+def seed_borrowers(count, batch_size=5000, seed=0, progress=None):
+    """
+    Top the seeded borrowers up to count (CustomUser + Client rows)
+    """
+    existing = seeded_users('b').count()
+    rng = random.Random(seed + existing)
+    for start in range(existing, count, batch_size):
+        stop = min(start + batch_size, count)
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create([
+                CustomUser(
+                    email=f'borrower{index}@b.{SEED_EMAIL_DOMAIN}',
+                    username=f'seed-borrower-{index}',
+                    password='!',
+                    first_name=rng.choice(SEED_FIRST_NAMES),
+                    last_name=rng.choice(SEED_LAST_NAMES),
+                    phone_number=f'0917{index:07d}',
+                    user_type='borrower',
+                    role='borrower',
+                )
+                for index in range(start, stop)
+            ])
+            clients = []
+            for user in users:
+                employment = rng.choice(SEED_EMPLOYMENT)
+                employed = employment in ('employed', 'self_employed')
+                region = rng.choice(SEED_REGIONS)
+                clients.append(Client(
+                    user=user,
+                    gender=rng.choice(SEED_GENDERS),
+                    marital_status=rng.choice(SEED_MARITAL_STATUSES),
+                    current_street=f'{rng.randint(1, 999)} Rizal St',
+                    current_barangay=rng.choice(SEED_BARANGAYS),
+                    current_city=rng.choice(SEED_CITIES),
+                    current_region=region,
+                    permanent_street=f'{rng.randint(1, 999)} Mabini St',
+                    permanent_barangay=rng.choice(SEED_BARANGAYS),
+                    permanent_city=rng.choice(SEED_CITIES),
+                    permanent_region=region,
+                    employment_status=employment,
+                    company_name='Seed Corp' if employed else None,
+                    job_title='Staff' if employed else None,
+                    monthly_income=Decimal(rng.randrange(8000, 200000, 500)) if employed else None,
+                    source_of_income=None if employed else 'Family support',
+                    bank_name='BDO',
+                    bank_account_number=str(rng.randrange(10 ** 9, 10 ** 10)),
+                    bank_account_name=f'{user.first_name} {user.last_name}',
+                ))
+                # bulk_create skips Client.save()
+                clients[-1].search_document = document_for(clients[-1], user)
+            Client.objects.bulk_create(clients)
+        if progress:
+            progress(stop)
+
+
+def seed_lenders(count, batch_size=5000, seed=0, progress=None):
+    """
+    Top the seeded lending companies up to count (CustomUser + Company rows)
+    """
+    existing = seeded_users('l').count()
+    rng = random.Random(seed + existing)
+    for start in range(existing, count, batch_size):
+        stop = min(start + batch_size, count)
+        with transaction.atomic():
+            users = CustomUser.objects.bulk_create([
+                CustomUser(
+                    email=f'lender{index}@l.{SEED_EMAIL_DOMAIN}',
+                    username=f'seed-lender-{index}',
+                    password='!',
+                    user_type='lending_company',
+                    role='admin',
+                )
+                for index in range(start, stop)
+            ])
+            companies = []
+            for index, user in zip(range(start, stop), users):
+                minimum_rate = Decimal(rng.randrange(50, 400)) / 100
+                minimum_amount = Decimal(rng.choice([1000, 5000, 10000, 50000, 100000]))
+                minimum_term = rng.choice([1, 3, 6, 12])
+                companies.append(Company(
+                    user=user,
+                    company_name=f'Seed Lending {index}',
+                    business_street=f'{rng.randint(1, 999)} Ayala Ave',
+                    business_barangay=rng.choice(SEED_BARANGAYS),
+                    business_city=rng.choice(SEED_CITIES),
+                    business_region=rng.choice(SEED_REGIONS),
+                    sec_registration_number=f'SEED-SEC-{index}',
+                    company_tin=f'SEED-TIN-{index}',
+                    loan_products_offered=rng.sample(SEED_PRODUCTS, rng.randint(1, 4)),
+                    minimum_interest_rate=minimum_rate,
+                    maximum_interest_rate=minimum_rate + Decimal(rng.randrange(50, 300)) / 100,
+                    processing_fee=Decimal(rng.randrange(0, 500)) / 100,
+                    late_payment_fee=Decimal(rng.randrange(100, 1000)) / 100,
+                    minimum_loan_amount=minimum_amount,
+                    maximum_loan_amount=minimum_amount * rng.choice([5, 10, 50, 100]),
+                    loan_term_minimum_months=minimum_term,
+                    loan_term_maximum_months=minimum_term + rng.choice([6, 12, 24, 48]),
+                ))
+            Company.objects.bulk_create(companies)
+        if progress:
+            progress(stop)
+
+
+def delete_seeded():
+    CustomUser.objects.filter(email__endswith=f'.{SEED_EMAIL_DOMAIN}').delete()
+
+
+def build_clients(count, seed=0):
+    """
+    Unsaved clients (with their users) carrying random choice codes
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    clients = []
+    for index in range(count):
+        user = CustomUser(id=index + 1, email=f'client{index}@example.com', first_name='Juan', last_name='Dela Cruz')
+        clients.append(Client(
+            id=index + 1,
+            user=user,
+            gender=rng.choice(GENDERS)[0],
+            marital_status=rng.choice(MARITAL_STATUSES + ((None, None),))[0],
+            current_region=rng.choice(REGIONS)[0],
+            permanent_region=rng.choice(REGIONS)[0],
+            employment_status=rng.choice(EMPLOYMENT_STATUSES)[0],
+            monthly_income=Decimal(rng.randrange(8000, 200000, 500)),
+            created_at=now,
+            updated_at=now,
+        ))
+    return clients
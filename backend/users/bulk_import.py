@@ -0,0 +1,234 @@
+"""
+Bulk borrower import for partner lender spreadsheets.
+
+Rows are validated in batches with BorrowerImportSerializer, passwords are
+hashed in a process pool (or replaced with unusable passwords and invitation
+tokens), and each batch is written with ``bulk_create`` inside its own
+transaction. Invalid rows are reported individually and never abort a batch.
+
+Invited borrowers set their password with the uid and token of their
+invitation (``POST /api/auth/accept_invitation/``). The API endpoint hashes
+in the request with ``BULK_IMPORT['WORKERS']`` processes (default: inline)
+and takes up to ``BULK_IMPORT['MAX_ROWS']`` rows (``MAX_INVITE_ROWS`` with
+nothing to hash); larger files go through ``manage.py import_borrowers``,
+which hashes on every CPU.
+"""
+import codecs
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .client_search import document_for
+from .dashboards import record_changes, saved_row
+from .models import CustomUser, Client
+from .serializers import BorrowerImportSerializer
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def import_options():
+    options = getattr(settings, 'BULK_IMPORT', {})
+    return {
+        'WORKERS': options.get('WORKERS', 1),
+        'MAX_ROWS': options.get('MAX_ROWS', 50),
+        'MAX_INVITE_ROWS': options.get('MAX_INVITE_ROWS', 5000),
+    }
+
+
+def _init_hash_worker():
+    """
+    Make sure Django settings are loaded in spawned hashing processes
+    """
+    django.setup()
+
+
+def read_rows(upload, filename=''):
+    """
+    Yield row dicts from a binary CSV or JSON (list of objects) upload; raises ValueError
+    for a file that is neither
+    """
+    if filename.endswith('.json'):
+        try:
+            rows = json.load(upload)
+        except ValueError as e:
+            raise ValueError(f'The file is not valid JSON: {e}') from e
+        yield from check_rows(rows)
+        return
+
+    try:
+        for row in csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig')):
+            # Spreadsheet exports use empty cells for missing optional values
+            yield {key: value for key, value in row.items() if value not in ('', None)}
+    except UnicodeDecodeError as e:
+        raise ValueError('The file is not UTF-8 encoded CSV') from e
+    except csv.Error as e:
+        raise ValueError(f'The file is not valid CSV: {e}') from e
+
+
+def check_rows(rows):
+    """
+    Return rows if it is a list of objects, raise ValueError otherwise
+    """
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError('Expected a list of objects, one per row')
+    return rows
+
+
+class BorrowerImporter:
+    """
+    Import borrower rows in batches and collect a per-row report
+    """
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, workers=None, invite=False):
+        self.batch_size = batch_size
+        self.workers = os.cpu_count() if workers is None else workers
+        self.invite = invite
+        self.created = 0
+        self.errors = []
+        self.invitations = []
+        self._seen_emails = set()
+        self._seen_usernames = set()
+
+    def run(self, rows):
+        """
+        Import an iterable of row dicts and return the report
+        """
+        executor = None
+        if not self.invite and self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_hash_worker)
+
+        try:
+            numbered = enumerate(rows, start=1)
+            while True:
+                batch = list(islice(numbered, self.batch_size))
+                if not batch:
+                    break
+                self._import_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return self.report()
+
+    def report(self):
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'invitations': self.invitations,
+        }
+
+    def _import_batch(self, batch, executor):
+        valid = self._validate_batch(batch)
+        if not valid:
+            return
+
+        if self.invite:
+            hashes = [make_password(None) for _ in valid]
+        else:
+            passwords = [user_data.pop('password') for _, user_data, _ in valid]
+            if executor is not None:
+                chunksize = max(1, len(passwords) // (self.workers * 4))
+                hashes = list(executor.map(make_password, passwords, chunksize=chunksize))
+            else:
+                hashes = [make_password(password) for password in passwords]
+
+        users = []
+        clients = []
+        for (row_number, user_data, client_data), password_hash in zip(valid, hashes):
+            user = CustomUser(password=password_hash, **user_data)
+            users.append((row_number, user))
+            client = Client(user=user, **client_data)
+            # bulk_create skips Client.save()
+            client.search_document = document_for(client, user)
+            clients.append(client)
+
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create([user for _, user in users])
+                Client.objects.bulk_create(clients)
+                # bulk_create skips the signals that keep the dashboard counts
+                record_changes(Client, added=[saved_row(client) for client in clients])
+            saved = users
+        except IntegrityError:
+            # A concurrent registration took one of the emails; isolate it row by row
+            saved = self._save_individually(users, clients)
+
+        self.created += len(saved)
+        if self.invite:
+            self.invitations.extend(self._invitation(user) for _, user in saved)
+
+    def _validate_batch(self, batch):
+        candidates = []
+        for row_number, row in batch:
+            serializer = BorrowerImportSerializer(data=row, context={'invite': self.invite})
+            if serializer.is_valid():
+                candidates.append((row_number, serializer.validated_data))
+            else:
+                self._add_error(row_number, serializer.errors)
+
+        if not candidates:
+            return []
+
+        emails = {data['email'] for _, data in candidates}
+        usernames = {data['username'] for _, data in candidates}
+        taken = CustomUser.objects.filter(Q(email__in=emails) | Q(username__in=usernames))
+        taken_emails = set(self._seen_emails)
+        taken_usernames = set(self._seen_usernames)
+        for email, username in taken.values_list('email', 'username'):
+            taken_emails.add(email)
+            taken_usernames.add(username)
+
+        valid = []
+        for row_number, data in candidates:
+            errors = {}
+            if data['email'] in taken_emails:
+                errors['email'] = ['A user with this email already exists.']
+            if data['username'] in taken_usernames:
+                errors['username'] = ['A user with this username already exists.']
+            taken_emails.add(data['email'])
+            taken_usernames.add(data['username'])
+            if errors:
+                self._add_error(row_number, errors)
+                continue
+
+            self._seen_emails.add(data['email'])
+            self._seen_usernames.add(data['username'])
+            user_data, client_data = BorrowerImportSerializer.split_validated_data(dict(data))
+            valid.append((row_number, user_data, client_data))
+        return valid
+
+    def _save_individually(self, users, clients):
+        saved = []
+        for (row_number, user), client in zip(users, clients):
+            try:
+                with transaction.atomic():
+                    user.pk = client.pk = None
+                    user.save(force_insert=True)
+                    client.user = user
+                    client.save(force_insert=True)
+            except IntegrityError as exc:
+                self._add_error(row_number, {'non_field_errors': [str(exc)]})
+            else:
+                saved.append((row_number, user))
+        return saved
+
+    def _invitation(self, user):
+        return {
+            'email': user.email,
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+            'token': default_token_generator.make_token(user),
+        }
+
+    def _add_error(self, row_number, errors):
+        self.errors.append({'row': row_number, 'errors': errors})
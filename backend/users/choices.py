@@ -0,0 +1,138 @@
+"""
+Choice sets shared by the models and serializers.
+
+Each set is an immutable tuple of ``(code, label)`` pairs carrying read-only
+code->label (``labels``) and label->code (``codes``) maps built once at
+import, so resolving a display label is a single dict hit. Django's
+``get_FOO_display()`` rebuilds a dict from the field's choices on every call;
+list serializers should go through these maps instead.
+"""
+from types import MappingProxyType
+
+
+class Choices(tuple):
+    """
+    Immutable (code, label) pairs with precomputed lookups in both directions
+    """
+    def __new__(cls, *pairs):
+        choices = super().__new__(cls, pairs)
+        choices.labels = MappingProxyType(dict(pairs))
+        choices.codes = MappingProxyType({label: code for code, label in pairs})
+        return choices
+
+    # Immutable, so field cloning (deepcopy) and pickling can share or rebuild it
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return Choices, tuple(self)
+
+    def label(self, code):
+        """
+        Display label for code (the code itself when unknown, like get_FOO_display)
+        """
+        return self.labels.get(code, code)
+
+
+USER_TYPES = Choices(
+    ('borrower', 'Borrower'),
+    ('lending_company', 'Lending Company'),
+)
+
+ROLES = Choices(
+    ('admin', 'Admin'),
+    ('manager', 'Manager'),
+    ('employee', 'Employee'),
+    ('borrower', 'Borrower'),
+)
+
+LOAN_PRODUCTS = Choices(
+    ('personal', 'Personal Loans'),
+    ('business', 'Business Loans'),
+    ('salary', 'Salary Loans'),
+    ('vehicle', 'Vehicle Loans'),
+    ('housing', 'Housing Loans'),
+    ('payday', 'Payday Loans'),
+    ('collateral', 'Collateral Loans'),
+    ('sme', 'SME Loans'),
+)
+
+# Philippine Regions
+REGIONS = Choices(
+    ('ncr', 'National Capital Region (NCR)'),
+    ('car', 'Cordillera Administrative Region (CAR)'),
+    ('region1', 'Ilocos Region (Region I)'),
+    ('region2', 'Cagayan Valley (Region II)'),
+    ('region3', 'Central Luzon (Region III)'),
+    ('region4a', 'CALABARZON (Region IV-A)'),
+    ('region4b', 'MIMAROPA (Region IV-B)'),
+    ('region5', 'Bicol Region (Region V)'),
+    ('region6', 'Western Visayas (Region VI)'),
+    ('region7', 'Central Visayas (Region VII)'),
+    ('region8', 'Eastern Visayas (Region VIII)'),
+    ('region9', 'Zamboanga Peninsula (Region IX)'),
+    ('region10', 'Northern Mindanao (Region X)'),
+    ('region11', 'Davao Region (Region XI)'),
+    ('region12', 'SOCCSKSARGEN (Region XII)'),
+    ('region13', 'Caraga (Region XIII)'),
+    ('barmm', 'Bangsamoro Autonomous Region in Muslim Mindanao (BARMM)'),
+)
+
+GENDERS = Choices(
+    ('male', 'Male'),
+    ('female', 'Female'),
+    ('other', 'Other'),
+)
+
+MARITAL_STATUSES = Choices(
+    ('single', 'Single'),
+    ('married', 'Married'),
+    ('divorced', 'Divorced'),
+    ('widowed', 'Widowed'),
+    ('separated', 'Separated'),
+)
+
+EMPLOYMENT_STATUSES = Choices(
+    ('employed', 'Employed'),
+    ('self_employed', 'Self-Employed'),
+    ('unemployed', 'Unemployed'),
+    ('retired', 'Retired'),
+    ('student', 'Student'),
+)
+
+TASK_STATUSES = Choices(
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('failed', 'Failed'),
+)
+
+# Repayment schedules (see users/loan_quotes.py)
+AMORTIZATION_METHODS = Choices(
+    ('equal', 'Equal installment'),
+    ('diminishing', 'Diminishing balance'),
+    ('add_on', 'Add-on (flat) rate'),
+)
+
+LOAN_APPLICATION_STATUSES = Choices(
+    ('pending', 'Pending'),
+    ('approved', 'Approved'),
+    ('rejected', 'Rejected'),
+    ('withdrawn', 'Withdrawn'),
+)
+
+LOAN_STATUSES = Choices(
+    ('active', 'Active'),
+    ('paid', 'Paid'),
+    ('defaulted', 'Defaulted'),
+)
+
+PAYMENT_CHANNELS = Choices(
+    ('bank_transfer', 'Bank Transfer'),
+    ('gcash', 'GCash'),
+    ('maya', 'Maya'),
+    ('over_the_counter', 'Over the Counter'),
+    ('cash', 'Cash'),
+)
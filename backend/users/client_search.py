@@ -0,0 +1,174 @@
+"""
+Client search over the denormalized ``Client.search_document`` column.
+
+The document holds a borrower's first, middle and last name, email, phone
+number, current city and barangay, lowercased and without accents, with a
+space before every word, so "words starting with dela" is the substring
+``' dela'``. ``Client.save()`` rebuilds it, and so does saving a borrower's
+name, email or phone (see users/signals.py); the bulk loaders set it
+themselves. ``QuerySet.update()`` on those fields bypasses both, so run
+``manage.py rebuild_client_search`` after one.
+
+On PostgreSQL, word prefixes are matched with full-text search
+(``to_tsvector('simple', ...) @@ 'term':*``), served by a GIN index that
+migration 0013 creates without any extension. With pg_trgm installed, the
+migration adds a GIN trigram index too, misspelled queries match by word
+similarity (``%>``, above ``pg_trgm.word_similarity_threshold``) and results
+are ranked by it. Other databases match prefixes with ``LIKE`` over the whole
+table.
+
+Only the first CANDIDATES matches are ranked, so a very common name costs the
+same as a rare one.
+"""
+import re
+import unicodedata
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import SearchQuery, SearchVector, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# More words than this hardly narrow a search but cost a LIKE each
+MAX_TERMS = 6
+CANDIDATES = 1000
+
+# Runs of anything but letters, digits, "@" and "." (which keep an email address one word)
+SEPARATORS = re.compile(r'[^\w@.]+')
+PHONE_QUERY = re.compile(r'^\+?[\d\s().-]{3,}$')
+
+_trigram_aliases = {}
+
+
+def normalize_words(text):
+    """
+    Lowercased words of text with accents removed ("Peñaflor" -> "penaflor")
+    """
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return SEPARATORS.sub(' ', stripped.lower()).split()
+
+
+def normalize_phone(phone):
+    """
+    Digits of a Philippine number in the local 0XXXXXXXXXX form
+    """
+    digits = re.sub(r'\D', '', phone or '')
+    if digits.startswith('63') and len(digits) == 12:
+        digits = '0' + digits[2:]
+    return digits
+
+
+def build_search_document(first_name, middle_name, last_name, email, phone_number, city, barangay):
+    words = normalize_words(' '.join(filter(None, [first_name, middle_name, last_name, email, city, barangay])))
+    phone = normalize_phone(phone_number)
+    if phone:
+        words.append(phone)
+    return ' ' + ' '.join(words)
+
+
+def document_for(client, user=None):
+    """
+    The search document of a Client (user defaults to client.user)
+    """
+    user = user or client.user
+    return build_search_document(
+        user.first_name, client.middle_name, user.last_name, user.email, user.phone_number,
+        client.current_city, client.current_barangay,
+    )
+
+
+def query_terms(query):
+    """
+    The words to match: one digits-only term for a phone number, else up to MAX_TERMS words
+    """
+    if PHONE_QUERY.match(query.strip()):
+        return [normalize_phone(query)]
+    return normalize_words(query)[:MAX_TERMS]
+
+
+def has_trigram(connection):
+    """
+    Whether pg_trgm is installed in the database (checked once per process and alias)
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _trigram_aliases:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_aliases[connection.alias] = cursor.fetchone() is not None
+    return _trigram_aliases[connection.alias]
+
+
+def search_vector():
+    """
+    The expression indexed by client_search_vector_idx (see migration 0013)
+    """
+    return SearchVector('search_document', config='simple')
+
+
+def matching(queryset, terms, trigram=False):
+    """
+    Clients of queryset with a word starting with every term (or, with trigram, similar to the query)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        # Terms hold no quotes (see SEPARATORS), so quoting them is enough to escape them
+        prefixes = ' & '.join(f"'{term}':*" for term in terms)
+        match = Q(search_vector=SearchQuery(prefixes, search_type='raw', config='simple'))
+        if trigram:
+            # %> (word similarity above the threshold), usable without django.contrib.postgres installed
+            match |= Q(TrigramWordSimilar(F('search_document'), ' '.join(terms)))
+        return queryset.annotate(search_vector=search_vector()).filter(match)
+    match = Q()
+    for term in terms:
+        match &= Q(search_document__contains=' ' + term)
+    return queryset.filter(match)
+
+
+def search_clients(queryset, query, limit=DEFAULT_LIMIT):
+    """
+    The best limit clients of queryset for query, with their relevance as rank
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    trigram = has_trigram(connections[queryset.db])
+    candidates = matching(queryset.order_by(), terms, trigram).values('pk')[:CANDIDATES]
+    if trigram:
+        rank = TrigramWordSimilarity(' '.join(terms), 'search_document')
+    else:
+        # Documents start with the first name
+        rank = Case(
+            When(search_document__startswith=' ' + terms[0], then=Value(1.0)),
+            default=Value(0.5),
+            output_field=FloatField(),
+        )
+    return queryset.filter(pk__in=candidates).annotate(rank=rank).order_by('-rank', '-id')[:limit]
+
+
+def rebuild_search_documents(queryset, batch_size=2000):
+    """
+    Recompute search_document for the clients in queryset, in primary key batches; returns rows changed
+    """
+    queryset = queryset.select_related('user').only(
+        'middle_name', 'current_city', 'current_barangay', 'search_document',
+        'user__first_name', 'user__last_name', 'user__email', 'user__phone_number',
+    ).order_by('pk')
+    changed_total = 0
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return changed_total
+        changed = []
+        for client in batch:
+            document = document_for(client)
+            if document != client.search_document:
+                client.search_document = document
+                changed.append(client)
+        queryset.model._default_manager.bulk_update(changed, ['search_document'])
+        changed_total += len(changed)
+        last_pk = batch[-1].pk
@@ -0,0 +1,270 @@
+"""
+Pre-computed counts for the overview dashboards.
+
+Each ``DashboardCount`` row is one bucket of a rollup:
+- clients by region, by employment status and by income bracket, with the
+  sum of their monthly incomes
+- companies by business region and by loan product offered
+Each rollup also has an "all" bucket. ``GET /api/dashboards/`` reads the
+rows as they are, a few dozen whatever the table sizes.
+
+Saving or deleting a Client or Company applies its change to the counts, one
+UPDATE per bucket that moves, inside the transaction of the save when there
+is one (see users/signals.py). Saves that leave every bucket
+as it was write nothing. ``bulk_create()`` and ``QuerySet.update()`` bypass
+the signals; the borrower importer applies its own batches. The rest are
+caught by ``manage.py refresh_dashboards``, which rebuilds every rollup with
+GROUP BY queries and should run on a schedule. Responses carry the time of
+the last refresh and of the last change, and report themselves stale after
+DASHBOARD_REFRESH_INTERVAL seconds without a refresh.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Count, F, Min, Sum, Value, When
+from django.utils import timezone
+
+from .choices import EMPLOYMENT_STATUSES, LOAN_PRODUCTS, REGIONS
+from .lender_search import product_filter
+from .models import Client, Company, DashboardCount
+
+# Upper bounds of the monthly income brackets (pesos)
+INCOME_BRACKETS = (10000, 20000, 40000, 70000, 100000)
+NO_INCOME = 'none'
+
+CLIENT_FIELDS = ('current_region', 'employment_status', 'monthly_income')
+COMPANY_FIELDS = ('business_region', 'loan_products_offered')
+
+
+def income_bucket(income):
+    if income is None:
+        return NO_INCOME
+    lower = 0
+    for upper in INCOME_BRACKETS:
+        if income < upper:
+            return f'{lower}-{upper}'
+        lower = upper
+    return f'{lower}+'
+
+
+def income_bucket_expression():
+    """
+    income_bucket() of monthly_income, in SQL
+    """
+    whens = [When(monthly_income__isnull=True, then=Value(NO_INCOME))]
+    lower = 0
+    for upper in INCOME_BRACKETS:
+        whens.append(When(monthly_income__lt=upper, then=Value(f'{lower}-{upper}')))
+        lower = upper
+    return Case(*whens, default=Value(f'{lower}+'))
+
+
+def client_buckets(region, employment_status, monthly_income):
+    """
+    (rollup, bucket, income) of every bucket a client with these CLIENT_FIELDS counts in
+    """
+    income = monthly_income or Decimal(0)
+    return [
+        ('clients', 'all', income),
+        ('clients_by_region', region, income),
+        ('clients_by_employment_status', employment_status or '', income),
+        ('clients_by_income', income_bucket(monthly_income), income),
+    ]
+
+
+def company_buckets(region, products):
+    buckets = [('companies', 'all', 0), ('companies_by_region', region, 0)]
+    # Like refresh_dashboards(), which counts the known products only
+    buckets.extend(
+        ('companies_by_product', product, 0)
+        for product in sorted(set(products or ())) if product in LOAN_PRODUCTS.labels
+    )
+    return buckets
+
+
+SOURCES = {
+    Client: (CLIENT_FIELDS, client_buckets),
+    Company: (COMPANY_FIELDS, company_buckets),
+}
+
+
+def stored_row(instance, update_fields=None):
+    """
+    The rollup fields of instance as stored before a save; None for new rows and for saves
+    of other fields only
+    """
+    fields, _ = SOURCES[type(instance)]
+    if instance._state.adding or (update_fields is not None and not set(fields).intersection(update_fields)):
+        return None
+    return type(instance)._default_manager.filter(pk=instance.pk).values_list(*fields).first()
+
+
+def saved_row(instance, stored=None, update_fields=None):
+    """
+    The rollup fields of instance after a save (fields left out of update_fields keep their stored value)
+    """
+    fields, _ = SOURCES[type(instance)]
+    # As they will read back, e.g. a monthly_income assigned as a string
+    values = tuple(instance._meta.get_field(field).to_python(getattr(instance, field)) for field in fields)
+    if stored is None or update_fields is None:
+        return values
+    return tuple(value if field in update_fields else old for field, value, old in zip(fields, values, stored))
+
+
+def record_changes(model, removed=(), added=()):
+    """
+    Apply rows of model's rollup fields leaving (removed) and joining (added) the counts
+    """
+    _, buckets = SOURCES[model]
+    deltas = defaultdict(lambda: [0, Decimal(0)])
+    for rows, sign in ((removed, -1), (added, 1)):
+        for row in rows:
+            for rollup, bucket, amount in buckets(*row):
+                delta = deltas[rollup, bucket]
+                delta[0] += sign
+                delta[1] += sign * amount
+    apply_deltas({key: delta for key, delta in deltas.items() if any(delta)})
+
+
+def apply_deltas(deltas):
+    """
+    Add {(rollup, bucket): [count, total]} to the stored counts
+    """
+    now = timezone.now()
+    # Always in the same order, so concurrent changes lock the rows without deadlocking
+    for (rollup, bucket), (count, total) in sorted(deltas.items()):
+        if not add_to_bucket(rollup, bucket, count, total, now):
+            create_bucket(rollup, bucket, count, total, now)
+
+
+def add_to_bucket(rollup, bucket, count, total, now):
+    return DashboardCount.objects.filter(rollup=rollup, bucket=bucket).update(
+        count=F('count') + count, total=F('total') + total, updated_at=now,
+    )
+
+
+def create_bucket(rollup, bucket, count, total, now):
+    # A bucket missing after a rebuild was empty then, so its count is as fresh as the others
+    refreshed_at = DashboardCount.objects.aggregate(oldest=Min('refreshed_at'))['oldest']
+    try:
+        with transaction.atomic():
+            DashboardCount.objects.create(
+                rollup=rollup, bucket=bucket, count=count, total=total, refreshed_at=refreshed_at, updated_at=now,
+            )
+    except IntegrityError:
+        # Created by a concurrent change meanwhile
+        add_to_bucket(rollup, bucket, count, total, now)
+
+
+def grouped(queryset, rollup, expression, income=False):
+    rows = queryset.order_by().annotate(bucket=expression).values('bucket').annotate(count=Count('pk'))
+    if not income:
+        return [(rollup, bucket or '', count, 0) for bucket, count in rows.values_list('bucket', 'count')]
+    rows = rows.annotate(total=Sum('monthly_income')).values_list('bucket', 'count', 'total')
+    return [(rollup, bucket or '', count, total or 0) for bucket, count, total in rows]
+
+
+def income_order(entry):
+    # Brackets from the lowest, incomes not stated last
+    bucket = entry['bucket']
+    return float('inf') if bucket == NO_INCOME else int(bucket.partition('-')[0].rstrip('+'))
+
+
+def compute_rollups():
+    """
+    Every (rollup, bucket, count, total) computed from the tables
+    """
+    clients = Client.objects.all()
+    overall = clients.aggregate(count=Count('pk'), total=Sum('monthly_income'))
+    rows = [('clients', 'all', overall['count'], overall['total'] or 0)]
+    rows += grouped(clients, 'clients_by_region', F('current_region'), income=True)
+    rows += grouped(clients, 'clients_by_employment_status', F('employment_status'), income=True)
+    rows += grouped(clients, 'clients_by_income', income_bucket_expression(), income=True)
+
+    companies = Company.objects.all()
+    rows.append(('companies', 'all', companies.count(), 0))
+    rows += grouped(companies, 'companies_by_region', F('business_region'))
+    for product in LOAN_PRODUCTS.labels:
+        count = companies.filter(product_filter(product, companies.db)).count()
+        if count:
+            rows.append(('companies_by_product', product, count, 0))
+    return rows
+
+
+def refresh_dashboards():
+    """
+    Rebuild every rollup from the tables; returns the number of buckets
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Changes wait for the rebuild (dashboard reads do not), so none is lost or counted twice
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {connection.ops.quote_name(DashboardCount._meta.db_table)} IN EXCLUSIVE MODE')
+        rows = compute_rollups()
+        DashboardCount.objects.all().delete()
+        DashboardCount.objects.bulk_create([
+            DashboardCount(rollup=rollup, bucket=bucket, count=count, total=total, refreshed_at=now, updated_at=now)
+            for rollup, bucket, count, total in rows
+        ])
+    return len(rows)
+
+
+def bucket_label(rollup, bucket):
+    if rollup.endswith('_by_region'):
+        return REGIONS.label(bucket)
+    if rollup.endswith('_by_employment_status'):
+        return EMPLOYMENT_STATUSES.label(bucket) or 'Not stated'
+    if rollup.endswith('_by_product'):
+        return LOAN_PRODUCTS.label(bucket)
+    if bucket == NO_INCOME:
+        return 'Not stated'
+    lower, _, upper = bucket.partition('-')
+    return f'₱{int(lower.rstrip("+")):,}+' if not upper else f'₱{int(lower):,} - ₱{int(upper) - 1:,}'
+
+
+def dashboard_data(now=None):
+    """
+    The stored rollups as served by GET /api/dashboards/
+    """
+    now = now or timezone.now()
+    data = {
+        'clients': {'count': 0, 'income_total': '0.00', 'by_region': [], 'by_employment_status': [], 'by_income': []},
+        'companies': {'count': 0, 'by_region': [], 'by_product': []},
+    }
+    refreshed = []
+    updated_at = None
+    rows = DashboardCount.objects.order_by('rollup', '-count', 'bucket').values_list(
+        'rollup', 'bucket', 'count', 'total', 'refreshed_at', 'updated_at',
+    )
+    for rollup, bucket, count, total, row_refreshed_at, row_updated_at in rows:
+        refreshed.append(row_refreshed_at)
+        updated_at = max(updated_at or row_updated_at, row_updated_at)
+        section, _, dimension = rollup.partition('_by_')
+        clients = section == 'clients'
+        if not dimension:
+            data[section]['count'] = count
+            if clients:
+                data[section]['income_total'] = str(total)
+            continue
+        if not count:
+            continue
+        entry = {'bucket': bucket, 'label': bucket_label(rollup, bucket), 'count': count}
+        if clients:
+            entry['income_total'] = str(total)
+        data[section][f'by_{dimension}'].append(entry)
+
+    data['clients']['by_income'].sort(key=income_order)
+
+    # Counts never rebuilt hold only the changes made since the table was created
+    refreshed_at = None if not refreshed or None in refreshed else min(refreshed)
+    age = None if refreshed_at is None else (now - refreshed_at).total_seconds()
+    data.update({
+        'refreshed_at': refreshed_at,
+        'updated_at': updated_at,
+        'age_seconds': None if age is None else round(age),
+        'stale': age is None or age > settings.DASHBOARD_REFRESH_INTERVAL,
+    })
+    return data
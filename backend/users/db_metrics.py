@@ -0,0 +1,77 @@
+"""
+Database connection metrics for monitoring.
+
+With ``DB_POOL`` on, the numbers for an alias come from its psycopg pool
+(``ConnectionPool.get_stats()``): connections open, in use and idle, requests
+waiting for one, and how many the pool has created. Without a pool, the process
+counts the connections it has opened (``connection_created``) and how many of
+them are still open, which shows whether ``CONN_MAX_AGE`` reuse is working.
+"""
+import threading
+import weakref
+
+from django.db import connections
+
+_lock = threading.Lock()
+_created = {}
+_wrappers = weakref.WeakSet()
+
+
+def record_connection(connection):
+    """
+    Count a new direct connection (connection_created also fires on every pool checkout)
+    """
+    if connection.vendor == 'postgresql' and connection.pool:
+        return
+    with _lock:
+        _created[connection.alias] = _created.get(connection.alias, 0) + 1
+        _wrappers.add(connection)
+
+
+def pool_metrics(connection):
+    stats = connection.pool.get_stats()
+    size = stats.get('pool_size', 0)
+    available = stats.get('pool_available', 0)
+    return {
+        'alias': connection.alias,
+        'pooled': True,
+        'min_size': stats.get('pool_min', 0),
+        'max_size': stats.get('pool_max', 0),
+        'open': size,
+        'in_use': size - available,
+        'idle': available,
+        'waiting': stats.get('requests_waiting', 0),
+        'created': stats.get('connections_num', 0),
+        'connection_errors': stats.get('connections_errors', 0),
+        'requests': stats.get('requests_num', 0),
+        'requests_queued': stats.get('requests_queued', 0),
+        'requests_wait_ms': stats.get('requests_wait_ms', 0),
+        'requests_timed_out': stats.get('requests_errors', 0),
+    }
+
+
+def direct_metrics(connection):
+    with _lock:
+        wrappers = [wrapper for wrapper in _wrappers if wrapper.alias == connection.alias]
+        created = _created.get(connection.alias, 0)
+    return {
+        'alias': connection.alias,
+        'pooled': False,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        # Each open connection belongs to one thread, so nothing ever waits for one
+        'open': sum(1 for wrapper in wrappers if wrapper.connection is not None),
+        'created': created,
+    }
+
+
+def connection_metrics():
+    """
+    Metrics for every configured database alias
+    """
+    metrics = []
+    for connection in connections.all():
+        if connection.vendor == 'postgresql' and connection.pool:
+            metrics.append(pool_metrics(connection))
+        else:
+            metrics.append(direct_metrics(connection))
+    return metrics
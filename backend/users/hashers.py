@@ -0,0 +1,35 @@
+"""
+Password hashers whose cost parameters come from settings.PASSWORD_HASHER_OPTIONS.
+
+Algorithm names are unchanged, so existing hashes keep verifying and are
+re-encoded with the configured cost on the user's next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+def _option(name, default):
+    return getattr(settings, 'PASSWORD_HASHER_OPTIONS', {}).get(name, default)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = _option('pbkdf2_iterations', PBKDF2PasswordHasher.iterations)
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Requires the optional argon2-cffi package
+    """
+    time_cost = _option('argon2_time_cost', Argon2PasswordHasher.time_cost)
+    memory_cost = _option('argon2_memory_cost', Argon2PasswordHasher.memory_cost)
+    parallelism = _option('argon2_parallelism', Argon2PasswordHasher.parallelism)
+
+
+class TunableScryptPasswordHasher(ScryptPasswordHasher):
+    work_factor = _option('scrypt_work_factor', ScryptPasswordHasher.work_factor)
+    block_size = _option('scrypt_block_size', ScryptPasswordHasher.block_size)
+    parallelism = _option('scrypt_parallelism', ScryptPasswordHasher.parallelism)
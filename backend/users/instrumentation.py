@@ -0,0 +1,357 @@
+"""
+Per-request timing and query instrumentation.
+
+``RequestMetricsMiddleware`` measures every request's wall time, database
+queries and time, serializer time and response size, and files them under the
+route name it resolved to (``clients-list``, ``auth-login``...). Aggregates are
+kept per process as Prometheus histograms plus a sliding window of recent
+latencies for p50/p95/p99, and served as text by ``GET /api/metrics/`` (see
+``render_prometheus()``); each worker process reports its own numbers.
+
+Queries are counted by an execute wrapper that every connection gets when it
+opens (see users/signals.py), and serializer time by
+``MeasuredSerializerMixin``, which every serializer in users/serializers.py
+includes, so both also cover code running in ``sync_to_async`` threads.
+Requests over ``SLOW_REQUEST_MS`` or ``SLOW_REQUEST_QUERIES`` are logged with
+the SQL they ran and its timings; parameters are left out, as they carry
+password hashes, tokens and bank details.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework import serializers
+
+from .benchmarking import percentile
+from .db_metrics import connection_metrics
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUANTILES = (0.5, 0.95, 0.99)
+UNMATCHED_ROUTE = 'unmatched'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def metrics_options():
+    options = getattr(settings, 'REQUEST_METRICS', {})
+    return {
+        'ENABLED': options.get('ENABLED', True),
+        'SLOW_REQUEST_MS': options.get('SLOW_REQUEST_MS', 500),
+        'SLOW_REQUEST_QUERIES': options.get('SLOW_REQUEST_QUERIES', 50),
+        'MAX_CAPTURED_QUERIES': options.get('MAX_CAPTURED_QUERIES', 100),
+        'WINDOW': options.get('WINDOW', 1024),
+    }
+
+
+class RequestCollector:
+    """
+    Measurements for the request being handled
+    """
+    def __init__(self, max_captured_queries):
+        self.max_captured_queries = max_captured_queries
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.captured = []
+
+    def add_query(self, sql, params, duration):
+        self.queries += 1
+        self.db_time += duration
+        if len(self.captured) < self.max_captured_queries:
+            # Parameters are dropped: they hold password hashes, tokens and account numbers
+            self.captured.append((duration, sql))
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper charging the query to the current request, if any
+    """
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.add_query(sql, params, time.perf_counter() - started)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure_serialization():
+    """
+    Charge the block to the current request's serializer time (nested blocks count once)
+    """
+    collector = _current.get()
+    if collector is None or collector.serializing:
+        yield
+        return
+    collector.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        collector.serializer_time += time.perf_counter() - started
+        collector.serializing = False
+
+
+class MeasuredSerializerMixin:
+    """
+    Charge to_representation() to the current request's serializer time, for
+    many=True lists as a whole (nested serializers count once)
+    """
+    def to_representation(self, instance):
+        with measure_serialization():
+            return super().to_representation(instance)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        if type(serializer) is serializers.ListSerializer:
+            serializer.__class__ = MeasuredListSerializer
+        return serializer
+
+
+class MeasuredListSerializer(MeasuredSerializerMixin, serializers.ListSerializer):
+    pass
+
+
+class Histogram:
+    """
+    Prometheus-style histogram: per-bucket counts (non-cumulative), sum and count
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class RouteMetrics:
+    def __init__(self, window):
+        self.duration = Histogram(DURATION_BUCKETS)
+        self.db_time = Histogram(DURATION_BUCKETS)
+        self.serializer_time = Histogram(DURATION_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.statuses = {}
+        self.recent = deque(maxlen=window)
+
+
+class MetricsRegistry:
+    """
+    Per-process aggregates keyed by (route, method)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, method, status, duration, collector, size, window):
+        with self._lock:
+            metrics = self._routes.get((route, method))
+            if metrics is None:
+                metrics = self._routes[(route, method)] = RouteMetrics(window)
+            metrics.duration.observe(duration)
+            metrics.db_time.observe(collector.db_time)
+            metrics.serializer_time.observe(collector.serializer_time)
+            metrics.queries.observe(collector.queries)
+            if size is not None:
+                metrics.response_size.observe(size)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.recent.append(duration)
+
+    def snapshot(self):
+        """
+        Copies of the per-route aggregates, safe to read without the lock
+        """
+        with self._lock:
+            snapshot = {}
+            for key, metrics in sorted(self._routes.items()):
+                copy = RouteMetrics(metrics.recent.maxlen)
+                for name in ('duration', 'db_time', 'serializer_time', 'queries', 'response_size'):
+                    source, target = getattr(metrics, name), getattr(copy, name)
+                    target.counts, target.sum, target.count = list(source.counts), source.sum, source.count
+                copy.statuses = dict(metrics.statuses)
+                copy.recent.extend(metrics.recent)
+                snapshot[key] = copy
+            return snapshot
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return match.url_name or match.route or UNMATCHED_ROUTE
+
+
+def _response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def _log_slow_request(request, route, duration, collector):
+    lines = [
+        f'Slow request {request.method} {request.path} ({route}): {duration * 1000:.1f}ms, '
+        f'{collector.queries} queries in {collector.db_time * 1000:.1f}ms, '
+        f'serializers {collector.serializer_time * 1000:.1f}ms'
+    ]
+    for query_time, sql in collector.captured:
+        lines.append(f'  {query_time * 1000:8.2f}ms  {sql}')
+    if collector.queries > len(collector.captured):
+        lines.append(f'  ... {collector.queries - len(collector.captured)} more queries')
+    logger.warning('\n'.join(lines))
+
+
+class RequestMetricsMiddleware:
+    """
+    Record wall time, queries, DB time, serializer time and response size per route
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        options = metrics_options()
+        if not options['ENABLED']:
+            return self.get_response(request)
+        collector = RequestCollector(options['MAX_CAPTURED_QUERIES'])
+        token = _current.set(collector)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, collector, options)
+        return response
+
+    async def __acall__(self, request):
+        options = metrics_options()
+        if not options['ENABLED']:
+            return await self.get_response(request)
+        collector = RequestCollector(options['MAX_CAPTURED_QUERIES'])
+        token = _current.set(collector)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, time.perf_counter() - started, collector, options)
+        return response
+
+    def record(self, request, response, duration, collector, options):
+        route = _route_name(request)
+        registry.record(
+            route, request.method, response.status_code, duration, collector,
+            _response_size(response), options['WINDOW'],
+        )
+        if (duration * 1000 >= options['SLOW_REQUEST_MS']
+                or collector.queries >= options['SLOW_REQUEST_QUERIES']):
+            _log_slow_request(request, route, duration, collector)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+HISTOGRAMS = (
+    ('duration', 'http_request_duration_seconds', 'Wall time per request.'),
+    ('db_time', 'http_request_db_seconds', 'Time spent in database queries per request.'),
+    ('queries', 'http_request_db_queries', 'Database queries per request.'),
+    ('serializer_time', 'http_request_serializer_seconds', 'Time spent in DRF serializers per request.'),
+    ('response_size', 'http_response_size_bytes', 'Response body size (streaming responses excluded).'),
+)
+
+DB_METRICS = (
+    ('open', 'db_connections_open', 'gauge', 'Open database connections.'),
+    ('in_use', 'db_connections_in_use', 'gauge', 'Pooled connections checked out.'),
+    ('waiting', 'db_connections_waiting', 'gauge', 'Requests waiting for a pooled connection.'),
+    ('created', 'db_connections_created_total', 'counter', 'Database connections opened by this process.'),
+)
+
+
+def render_prometheus():
+    """
+    The registry and database connection metrics in the Prometheus text format
+    """
+    snapshot = registry.snapshot()
+    lines = []
+
+    lines += ['# HELP http_requests_total Requests by route, method and status.', '# TYPE http_requests_total counter']
+    for (route, method), metrics in snapshot.items():
+        for status, count in sorted(metrics.statuses.items()):
+            lines.append(f'http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+    for attribute, name, help_text in HISTOGRAMS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (route, method), metrics in snapshot.items():
+            histogram = getattr(metrics, attribute)
+            for bound, count in histogram.cumulative():
+                lines.append(f'{name}_bucket{_labels(route=route, method=method, le=bound)} {count}')
+            lines.append(f'{name}_sum{_labels(route=route, method=method)} {histogram.sum}')
+            lines.append(f'{name}_count{_labels(route=route, method=method)} {histogram.count}')
+
+    name = 'http_request_recent_duration_seconds'
+    lines += [f'# HELP {name} Wall time quantiles over the most recent requests.', f'# TYPE {name} summary']
+    for (route, method), metrics in snapshot.items():
+        if not metrics.recent:
+            continue
+        recent = list(metrics.recent)
+        for q in QUANTILES:
+            lines.append(f'{name}{_labels(route=route, method=method, quantile=q)} {percentile(recent, q * 100)}')
+        lines.append(f'{name}_sum{_labels(route=route, method=method)} {sum(recent)}')
+        lines.append(f'{name}_count{_labels(route=route, method=method)} {len(recent)}')
+
+    databases = connection_metrics()
+    for key, name, kind, help_text in DB_METRICS:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for database in databases:
+            if key in database:
+                lines.append(f'{name}{_labels(alias=database["alias"])} {database[key]}')
+
+    return '\n'.join(lines) + '\n'
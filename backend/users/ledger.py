@@ -0,0 +1,215 @@
+"""
+Loans and the payment ledger.
+
+A payment is one INSERT into the append-only ``Payment`` ledger plus one UPDATE
+of its ``Loan`` that applies the amount to the running totals
+(``outstanding_balance``, ``total_paid``, ``payments_count``) with ``F()``
+expressions. Reading a balance is a primary key lookup, and history is never
+summed. The UPDATE runs first and holds the loan's row lock until commit,
+so concurrent payments on one loan queue behind each other, and the
+duplicate reference check cannot race.
+
+On PostgreSQL, ``users_payment`` is range-partitioned by month of ``paid_at``.
+New payments land in a small current partition, and old months can be
+detached or archived without touching live ones. A default partition
+catches payments dated outside the existing months. Run
+``manage.py create_payment_partitions`` monthly (cron) to create upcoming
+months ahead of time. It also moves rows already in the default partition
+into their new month.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .loan_quotes import ScheduleBatch
+from .models import Loan, Payment
+
+PAYMENT_TABLE = Payment._meta.db_table
+DEFAULT_PARTITION = f'{PAYMENT_TABLE}_default'
+# Retried submissions of a payment reuse its reference and date, so duplicates are only
+# looked for this close to paid_at; the range also prunes the search to a few partitions
+DUPLICATE_WINDOW = timedelta(days=31)
+
+
+class PaymentRejected(Exception):
+    pass
+
+
+def add_months(day, months):
+    """
+    day moved by months, clamped to the end of shorter months (Jan 31 + 1 -> Feb 28)
+    """
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return day.replace(year=year, month=month, day=min(day.day, (next_month - timedelta(days=1)).day))
+
+
+def open_loan(application, released_at=None):
+    """
+    Approve application and release its loan at the company's minimum rate, priced like a quote
+    """
+    released_at = released_at or timezone.now()
+    company = application.company
+    batch = ScheduleBatch.from_decimals(
+        [application.amount], [application.term_months], company.minimum_interest_rate or Decimal(0),
+        application.method, company.processing_fee or Decimal(0),
+    )
+    quote = batch.summary(0)
+    with transaction.atomic():
+        application.status = 'approved'
+        application.decided_at = released_at
+        application.save(update_fields=['status', 'decided_at', 'updated_at'])
+        return Loan.objects.create(
+            application=application,
+            client_id=application.client_id,
+            company_id=application.company_id,
+            principal=application.amount,
+            monthly_rate=quote['monthly_rate'],
+            method=application.method,
+            term_months=application.term_months,
+            processing_fee=quote['processing_fee'],
+            installment=quote['installment'],
+            total_payable=quote['total_payable'],
+            released_at=released_at,
+            maturity_date=add_months(timezone.localdate(released_at), application.term_months),
+            outstanding_balance=quote['total_payable'],
+        )
+
+
+def record_payment(loan_id, amount, paid_at=None, channel='bank_transfer', reference=''):
+    """
+    Append a payment to the ledger and apply it to the loan's totals; returns the Payment.
+    Raises PaymentRejected for a loan that is missing or not active, an amount above the
+    balance, or a reference already recorded on the loan
+    """
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise PaymentRejected('Payment amounts must be positive')
+    paid_at = paid_at or timezone.now()
+    with transaction.atomic():
+        applied = Loan.objects.filter(pk=loan_id, status='active', outstanding_balance__gte=amount).update(
+            outstanding_balance=F('outstanding_balance') - amount,
+            total_paid=F('total_paid') + amount,
+            payments_count=F('payments_count') + 1,
+            # Backdated payments do not move last_payment_at back
+            last_payment_at=Greatest(Coalesce(F('last_payment_at'), Value(paid_at)), Value(paid_at)),
+            # Right-hand sides read the row as it was before the update
+            status=Case(When(outstanding_balance=amount, then=Value('paid')), default=F('status')),
+            updated_at=timezone.now(),
+        )
+        if not applied:
+            raise PaymentRejected(rejection_reason(loan_id, amount))
+        if reference and is_duplicate(loan_id, reference, paid_at):
+            # Raising rolls the update back
+            raise PaymentRejected(f'Payment {reference} is already recorded for this loan')
+        return Payment.objects.create(
+            loan_id=loan_id, amount=amount, paid_at=paid_at, channel=channel, reference=reference,
+        )
+
+
+def reverse_payment(payment, paid_at=None):
+    """
+    Append the reversal of payment (a bounced check, a charge-back) and put its amount back on the loan
+    """
+    if payment.amount <= 0:
+        raise PaymentRejected('Only payments can be reversed')
+    paid_at = paid_at or timezone.now()
+    reference = f'reversal:{payment.pk}'
+    with transaction.atomic():
+        # Reversals are rare: lock the loan first so the duplicate check comes before any change
+        if not Loan.objects.select_for_update().filter(pk=payment.loan_id).values_list('pk'):
+            raise PaymentRejected(rejection_reason(payment.loan_id, payment.amount))
+        if is_duplicate(payment.loan_id, reference, payment.paid_at, paid_at):
+            raise PaymentRejected(f'Payment {payment.pk} is already reversed')
+        Loan.objects.filter(pk=payment.loan_id).update(
+            outstanding_balance=F('outstanding_balance') + payment.amount,
+            total_paid=F('total_paid') - payment.amount,
+            payments_count=F('payments_count') - 1,
+            status=Case(When(status='paid', then=Value('active')), default=F('status')),
+            updated_at=timezone.now(),
+        )
+        return Payment.objects.create(
+            loan_id=payment.loan_id, amount=-payment.amount, paid_at=paid_at, channel=payment.channel,
+            reference=reference,
+        )
+
+
+def is_duplicate(loan_id, reference, *dates):
+    return Payment.objects.filter(
+        loan_id=loan_id, reference=reference,
+        paid_at__gte=min(dates) - DUPLICATE_WINDOW, paid_at__lte=max(dates) + DUPLICATE_WINDOW,
+    ).exists()
+
+
+def rejection_reason(loan_id, amount):
+    loan = Loan.objects.filter(pk=loan_id).values('status', 'outstanding_balance').first()
+    if loan is None:
+        return f'Loan {loan_id} does not exist'
+    if loan['status'] != 'active':
+        return f"Loan {loan_id} is {loan['status']}"
+    return f"Payment of {amount} exceeds the outstanding balance of {loan['outstanding_balance']}"
+
+
+def month_start(day):
+    return datetime(day.year, day.month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PAYMENT_TABLE}_p{month:%Y_%m}'
+
+
+def payment_partitions(using='default'):
+    """
+    Names of the monthly payment partitions that exist (PostgreSQL)
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [PAYMENT_TABLE],
+        )
+        return [name for name, in cursor.fetchall() if name != DEFAULT_PARTITION]
+
+
+def create_payment_partitions(start, months, using='default'):
+    """
+    Create the monthly partitions for months months from start's month; returns the names
+    created. Payments already in the default partition for those months move to them
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return []
+    existing = set(payment_partitions(using))
+    created = []
+    month = month_start(start)
+    for _ in range(months):
+        following = month_start(add_months(month, 1))
+        name = partition_name(month)
+        if name not in existing:
+            attach_partition(connection, name, month, following)
+            created.append(name)
+        month = following
+    return created
+
+
+def attach_partition(connection, name, month, following):
+    quote = connection.ops.quote_name
+    table, partition, default = quote(PAYMENT_TABLE), quote(name), quote(DEFAULT_PARTITION)
+    bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # PostgreSQL refuses a new partition while the default one holds rows in its range,
+        # so build the month as a plain table, move those rows in, then attach it
+        cursor.execute(f'CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {default} WHERE paid_at >= %s AND paid_at < %s RETURNING *) '
+            f'INSERT INTO {partition} SELECT * FROM moved',
+            [month, following],
+        )
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {partition} {bounds}')
@@ -0,0 +1,50 @@
+"""
+Lender matching: companies whose published loan terms cover a borrower's request.
+
+Pages walk ``company_region_created_idx`` (one region, newest first) and
+check the amount/term/rate bounds on each row; on their own those bounds
+match too much of the table for a btree to beat the walk. Product membership
+uses jsonb containment on PostgreSQL, served by the GIN index from migration
+0011 when a product is rare. Companies that leave a bound blank do not match
+searches on that bound.
+"""
+import json
+
+from django.db import connections
+from django.db.models import Q
+
+
+def product_filter(product, using='default'):
+    """
+    Companies offering product, as a containment lookup where the backend has one
+    """
+    if connections[using].features.supports_json_field_contains:
+        return Q(loan_products_offered__contains=[product])
+    # The list is stored as JSON text, so match the quoted product code
+    return Q(loan_products_offered__icontains=json.dumps(product))
+
+
+def filter_lenders(queryset, criteria):
+    """
+    Narrow a Company queryset to lenders covering the validated search criteria
+    """
+    amount = criteria.get('amount')
+    if amount is not None:
+        queryset = queryset.filter(minimum_loan_amount__lte=amount, maximum_loan_amount__gte=amount)
+
+    term = criteria.get('term')
+    if term is not None:
+        queryset = queryset.filter(loan_term_minimum_months__lte=term, loan_term_maximum_months__gte=term)
+
+    rate = criteria.get('rate')
+    if rate is not None:
+        queryset = queryset.filter(minimum_interest_rate__lte=rate)
+
+    region = criteria.get('region')
+    if region:
+        queryset = queryset.filter(business_region=region)
+
+    product = criteria.get('product')
+    if product:
+        queryset = queryset.filter(product_filter(product, queryset.db))
+    return queryset
@@ -0,0 +1,310 @@
+"""
+Loan quotes: repayment schedules for many loans at once.
+
+Company rates are monthly percentages, as Philippine lenders quote them, and
+the processing fee is a percentage of the principal deducted at release.
+Three schedules are supported (``AMORTIZATION_METHODS``):
+
+* ``equal``: the same installment every month, with interest on the
+  outstanding balance (a standard amortized loan).
+* ``diminishing``: the same principal every month plus interest on the
+  outstanding balance, so installments shrink.
+* ``add_on``: interest on the original principal for the whole term
+  (principal x rate x months), spread evenly over the installments.
+
+``ScheduleBatch`` holds whole centavos in int64 arrays, with one row per loan
+and one column per month. It steps through the months once for the whole
+batch. Every amount is rounded half up to the centavo as it is computed, and
+the last installment settles what is left, so principal always sums exactly
+to the loan amount. Decimals appear only at the edges: ``from_decimals()``
+takes them in, and ``summary()`` and ``schedule()`` hand them out, while
+``rows()`` returns their strings for JSON.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from .choices import AMORTIZATION_METHODS
+
+MAX_TERM = 360
+MAX_QUOTES = 10000
+# Newton steps for the effective rate; it converges in well under this many
+EFFECTIVE_RATE_STEPS = 30
+
+
+class TooManyQuotes(Exception):
+    pass
+
+
+def to_hundredths(value):
+    """
+    A Decimal amount as whole centavos, or a percentage as hundredths of a percent
+    """
+    return int((Decimal(value) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_hundredths(value):
+    return Decimal(int(value)).scaleb(-2)
+
+
+def format_hundredths(values):
+    """
+    The strings of from_hundredths() for an array of values >= 0, without building Decimals
+    """
+    return ['%d.%02d' % pair for pair in zip((values // 100).tolist(), (values % 100).tolist())]
+
+
+def round_half_up(values):
+    return np.floor(values + 0.5).astype(np.int64)
+
+
+def equal_installments(amounts, terms, rate, months):
+    """
+    (principal, interest) by month for equal installment loans: P r / (1 - (1 + r)^-n)
+    a month (P / n without interest), the last installment settling the balance
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = np.where(rate > 0, amounts * rate / (1 - (1 + rate) ** -terms.astype(float)), amounts / terms)
+    installment = round_half_up(annuity)
+    principal = np.zeros((len(amounts), months), dtype=np.int64)
+    interest = np.zeros((len(amounts), months), dtype=np.int64)
+    balance = amounts.copy()
+    # Each month's interest depends on the rounded balance before it, so step through the months;
+    # repaid loans have a zero balance and stay at zero
+    for month in range(int(terms.max())):
+        month_interest = round_half_up(balance * rate)
+        month_principal = np.where(month == terms - 1, balance, np.minimum(installment - month_interest, balance))
+        principal[:, month] = month_principal
+        interest[:, month] = month_interest
+        balance -= month_principal
+    return principal, interest
+
+
+class ScheduleBatch:
+    """
+    Repayment schedules for loans given as arrays: amounts in centavos, terms in
+    months, monthly rates and processing fees in hundredths of a percent, and
+    AMORTIZATION_METHODS codes (an array, or one code for every loan)
+    """
+    def __init__(self, amounts, terms, rates, methods, fees=0):
+        self.amounts = np.asarray(amounts, dtype=np.int64)
+        self.terms = np.asarray(terms, dtype=np.int64)
+        self.rates = np.broadcast_to(np.asarray(rates, dtype=np.int64), self.amounts.shape)
+        self.methods = np.broadcast_to(np.asarray(methods), self.amounts.shape)
+        self.fees = np.broadcast_to(np.asarray(fees, dtype=np.int64), self.amounts.shape)
+        if len(self.terms) and (self.terms.min() < 1 or self.terms.max() > MAX_TERM):
+            raise ValueError(f'Terms must be between 1 and {MAX_TERM} months')
+        if not np.isin(self.methods, list(AMORTIZATION_METHODS.labels)).all():
+            raise ValueError('Unknown amortization method')
+
+        self.principal, self.interest = self._amortize()
+        self.payments = self.principal + self.interest
+        self.total_interest = self.interest.sum(axis=1)
+        self.total_payable = self.amounts + self.total_interest
+        self.processing_fee = round_half_up(self.amounts * (self.fees / 10000))
+        self.net_proceeds = self.amounts - self.processing_fee
+        self.effective_rates = self._effective_rates()
+
+    def __len__(self):
+        return len(self.amounts)
+
+    @classmethod
+    def from_decimals(cls, amounts, terms, rates, methods, fees=0):
+        """
+        A batch from Decimal amounts and percentages (sequences, or one value for every loan)
+        """
+        def hundredths(values):
+            if isinstance(values, (list, tuple)):
+                return [to_hundredths(value) for value in values]
+            return to_hundredths(values)
+        return cls(hundredths(amounts), terms, hundredths(rates), methods, hundredths(fees))
+
+    def _amortize(self):
+        loans = len(self)
+        months = int(self.terms.max()) if loans else 0
+        month = np.arange(months)
+        active = month < self.terms[:, None]
+        last = month == self.terms[:, None] - 1
+        rate = self.rates / 10000
+
+        # Diminishing balance: the same principal every month, the last one settling the
+        # remainder, and interest on the balance at the start of the month
+        even_principal = (self.amounts // self.terms)[:, None]
+        principal = np.where(active, even_principal, 0) + np.where(last, (self.amounts % self.terms)[:, None], 0)
+        opening = self.amounts[:, None] - even_principal * month
+        interest = np.where(active, round_half_up(opening * rate[:, None]), 0)
+
+        # Add-on: the same principal, and the flat interest split the same way
+        add_on = self.methods == 'add_on'
+        if add_on.any():
+            terms = self.terms[add_on]
+            total = round_half_up(self.amounts[add_on] * rate[add_on] * terms)
+            interest[add_on] = (
+                np.where(active[add_on], (total // terms)[:, None], 0)
+                + np.where(last[add_on], (total % terms)[:, None], 0)
+            )
+
+        equal = self.methods == 'equal'
+        if equal.any():
+            principal[equal], interest[equal] = equal_installments(
+                self.amounts[equal], self.terms[equal], rate[equal], months,
+            )
+        return principal, interest
+
+    def _effective_rates(self):
+        """
+        Monthly rate at which the installments repay the net proceeds, in hundredths
+        of a percent (the effective interest rate disclosed under the Truth in Lending Act)
+        """
+        loans, months = self.payments.shape
+        if not loans:
+            return np.zeros(0, dtype=np.int64)
+        payments = self.payments.astype(float)
+        weighted = payments * np.arange(1, months + 1)
+        net = self.net_proceeds.astype(float)
+        # NPV(i) - net is convex and decreasing, and not negative at the nominal rate (fees
+        # and add-on interest only push the root up), so Newton's method from there climbs
+        # to the root without overshooting
+        rate = self.rates / 10000
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            for _ in range(EFFECTIVE_RATE_STEPS):
+                # (1 + i)^-t for t = 1..months
+                discount = np.cumprod(np.broadcast_to((1 / (1 + rate))[:, None], payments.shape), axis=1)
+                value = (payments * discount).sum(axis=1) - net
+                slope = -(weighted * discount).sum(axis=1) / (1 + rate)
+                step = np.where(slope < 0, value / slope, 0)
+                rate = rate - step
+                # NaN steps (see below) count as converged
+                if not (np.abs(step) >= 1e-9).any():
+                    break
+        # Nothing is released when fees take the whole principal
+        rate = np.where(net > 0, rate, np.nan)
+        return round_half_up(np.nan_to_num(rate * 10000, nan=-1))
+
+    def summary(self, index):
+        effective_rate = self.effective_rates[index]
+        return {
+            'amount': from_hundredths(self.amounts[index]),
+            'term': int(self.terms[index]),
+            'method': str(self.methods[index]),
+            'monthly_rate': from_hundredths(self.rates[index]),
+            'installment': from_hundredths(self.payments[index, 0]),
+            'total_interest': from_hundredths(self.total_interest[index]),
+            'total_payable': from_hundredths(self.total_payable[index]),
+            'processing_fee': from_hundredths(self.processing_fee[index]),
+            'net_proceeds': from_hundredths(self.net_proceeds[index]),
+            'effective_rate': from_hundredths(effective_rate) if effective_rate >= 0 else None,
+        }
+
+    def schedule(self, index):
+        """
+        Month by month: payment, principal, interest and the balance left after it
+        """
+        term = int(self.terms[index])
+        balances = self.amounts[index] - np.cumsum(self.principal[index, :term])
+        return [
+            {
+                'month': month + 1,
+                'payment': from_hundredths(self.payments[index, month]),
+                'principal': from_hundredths(self.principal[index, month]),
+                'interest': from_hundredths(self.interest[index, month]),
+                'balance': from_hundredths(balances[month]),
+            }
+            for month in range(term)
+        ]
+
+    def rows(self, order=None, include_schedule=False):
+        """
+        summary() of every loan, in order, with amounts as strings; with include_schedule,
+        also schedule() as lists of payment, principal, interest and balance by month
+        """
+        if not len(self):
+            return []
+        order = np.arange(len(self)) if order is None else order
+        effective_rates = self.effective_rates[order]
+        columns = zip(
+            format_hundredths(self.amounts[order]), self.terms[order].tolist(), self.methods[order].tolist(),
+            format_hundredths(self.rates[order]), format_hundredths(self.payments[order, 0]),
+            format_hundredths(self.total_interest[order]), format_hundredths(self.total_payable[order]),
+            format_hundredths(self.processing_fee[order]), format_hundredths(self.net_proceeds[order]),
+            format_hundredths(np.maximum(effective_rates, 0)), (effective_rates >= 0).tolist(),
+        )
+        rows = [
+            {
+                'amount': amount,
+                'term': term,
+                'method': method,
+                'monthly_rate': rate,
+                'installment': installment,
+                'total_interest': total_interest,
+                'total_payable': total_payable,
+                'processing_fee': fee,
+                'net_proceeds': net,
+                'effective_rate': effective_rate if known else None,
+            }
+            for amount, term, method, rate, installment, total_interest, total_payable, fee, net, effective_rate, known
+            in columns
+        ]
+        if include_schedule:
+            principals = self.principal[order]
+            balances = self.amounts[order, None] - np.cumsum(principals, axis=1)
+            # Format the months of every loan at once; row-major, so each loan's months are contiguous
+            terms = self.terms[order]
+            active = np.arange(principals.shape[1]) < terms[:, None]
+            payments = format_hundredths(self.payments[order][active])
+            principal = format_hundredths(principals[active])
+            interest = format_hundredths(self.interest[order][active])
+            balance = format_hundredths(balances[active])
+            # Columns rather than a dict per month: far fewer objects to build and encode
+            ends = np.cumsum(terms).tolist()
+            for row, start, end in zip(rows, [0] + ends, ends):
+                row['schedule'] = {
+                    'payment': payments[start:end],
+                    'principal': principal[start:end],
+                    'interest': interest[start:end],
+                    'balance': balance[start:end],
+                }
+        return rows
+
+
+QUOTE_FIELDS = (
+    'id', 'company_name', 'minimum_interest_rate', 'processing_fee',
+    'minimum_loan_amount', 'maximum_loan_amount', 'loan_term_minimum_months', 'loan_term_maximum_months',
+)
+
+
+def quote_lenders(companies, amounts, terms, method='equal', include_schedule=False):
+    """
+    Quotes at each lender's minimum rate for every amount and term within its bounds,
+    grouped by amount and term, cheapest first. Raises TooManyQuotes past MAX_QUOTES
+    """
+    # Lenders that leave a bound or their rate blank do not match, as in lender search
+    lenders = list(
+        companies.exclude(minimum_interest_rate=None).exclude(minimum_loan_amount=None)
+        .exclude(maximum_loan_amount=None).exclude(loan_term_minimum_months=None)
+        .exclude(loan_term_maximum_months=None).order_by().values_list(*QUOTE_FIELDS)
+    )
+    if not lenders:
+        return []
+    ids, names, rates, fees, min_amounts, max_amounts, min_terms, max_terms = zip(*lenders)
+    rates = np.array([to_hundredths(rate) for rate in rates], dtype=np.int64)
+    fees = np.array([to_hundredths(fee or 0) for fee in fees], dtype=np.int64)
+    min_amounts = np.array([to_hundredths(amount) for amount in min_amounts], dtype=np.int64)
+    max_amounts = np.array([to_hundredths(amount) for amount in max_amounts], dtype=np.int64)
+    amounts = np.array([to_hundredths(amount) for amount in amounts], dtype=np.int64)
+    terms = np.array(terms, dtype=np.int64)
+
+    # lender x amount x term
+    amount_ok = (min_amounts[:, None] <= amounts) & (amounts <= max_amounts[:, None])
+    term_ok = (np.array(min_terms)[:, None] <= terms) & (terms <= np.array(max_terms)[:, None])
+    lender, amount, term = np.nonzero(amount_ok[:, :, None] & term_ok[:, None, :])
+    if len(lender) > MAX_QUOTES:
+        raise TooManyQuotes(f'{len(lender)} quotes match, at most {MAX_QUOTES} can be computed at once')
+
+    batch = ScheduleBatch(amounts[amount], terms[term], rates[lender], method, fees[lender])
+    order = np.lexsort((np.array(ids)[lender], batch.total_payable, batch.terms, batch.amounts))
+    rows = batch.rows(order, include_schedule)
+    for row, index in zip(rows, lender[order].tolist()):
+        row['company'] = ids[index]
+        row['company_name'] = names[index]
+    return rows
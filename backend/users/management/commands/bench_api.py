@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from users.api_benchmark import (
+    DEFAULT_RESULTS, SCENARIOS, ApiBenchmark, compare, find_baseline, load_results, save_result,
+)
+from users.benchmarking import delete_seeded, seed_borrowers, seed_lenders
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed borrowers/lenders, drive the users API endpoints and report latency percentiles, '
+        'queries per request and memory; results are stored so later runs can flag regressions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--borrowers', type=int, default=10_000)
+        parser.add_argument('--lenders', type=int, default=1_000)
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--profile', type=int, default=20, help='Requests per scenario for queries/memory')
+        parser.add_argument('--scenario', action='append', choices=[scenario.name for scenario in SCENARIOS],
+                            help='Run only these scenarios (repeatable)')
+        parser.add_argument('--results', default=str(DEFAULT_RESULTS), help='JSON lines file of past runs')
+        parser.add_argument('--baseline', help='Compare with the latest run of this commit (default: latest run)')
+        parser.add_argument('--threshold', type=float, default=25, help='Allowed p50/p95 slowdown in percent')
+        parser.add_argument('--no-save', action='store_true', help='Do not append this run to --results')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['borrowers']} borrowers and {options['lenders']} lenders...")
+        seed_borrowers(options['borrowers'])
+        seed_lenders(options['lenders'])
+
+        scenarios = [s for s in SCENARIOS if not options['scenario'] or s.name in options['scenario']]
+        benchmark = ApiBenchmark(options['requests'], options['warmup'], options['profile'])
+        try:
+            record = benchmark.run(scenarios, progress=self.report)
+        finally:
+            if options['cleanup']:
+                delete_seeded()
+        self.stdout.write(f"max RSS: {record['max_rss_kib'] / 1024:.1f} MiB")
+
+        previous = load_results(options['results'])
+        baseline = find_baseline(previous, record, options['baseline'])
+        if not options['no_save']:
+            save_result(options['results'], record)
+            self.stdout.write(f"Saved run of {record['commit'][:12]} to {options['results']}")
+
+        if baseline is None:
+            self.stdout.write('No earlier run with the same database and data volumes to compare with')
+            return
+        regressions = compare(baseline, record, options['threshold'])
+        self.stdout.write(f"Compared with {baseline['commit'][:12]} ({baseline['timestamp']})")
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f'  regression: {name} {metric} {before} -> {after}'))
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('  no regressions'))
+        elif options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regression(s)')
+
+    def report(self, name, summary):
+        status = self.style.ERROR(f", {summary['failed']} failed") if summary['failed'] else ''
+        self.stdout.write(
+            f"{name:>18}: {summary['throughput_rps']:8.1f} req/s, p50 {summary['p50_ms']}ms, "
+            f"p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms, "
+            f"{summary['queries_per_request']} queries/req, peak {summary['peak_kib_per_request']} KiB/req{status}"
+        )
@@ -0,0 +1,62 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from users.benchmarking import build_clients
+from users.serializers import ChoiceDisplayField, ClientSerializer
+
+
+def measure(function, clients):
+    """
+    (seconds, peak traced bytes) for one pass of function over clients
+    """
+    started = time.perf_counter()
+    function(clients)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    function(clients)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+class Command(BaseCommand):
+    help = 'Compare choice display resolution (get_FOO_display vs the choices registry) over serialized clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        clients = build_clients(options['clients'])
+        display_fields = [
+            field for field in ClientSerializer().fields.values() if isinstance(field, ChoiceDisplayField)
+        ]
+        display_methods = [f'get_{field.source}_display' for field in display_fields]
+
+        def model_display(rows):
+            for client in rows:
+                for method in display_methods:
+                    getattr(client, method)()
+
+        def registry_display(rows):
+            for client in rows:
+                for field in display_fields:
+                    field.to_representation(field.get_attribute(client))
+
+        lookups = len(clients) * len(display_fields)
+        self.stdout.write(f'{len(clients)} clients, {len(display_fields)} display fields each')
+        for label, function in (('get_FOO_display()', model_display), ('choices registry', registry_display)):
+            elapsed, peak = measure(function, clients)
+            self.stdout.write(
+                f'{label:>20}: {elapsed * 1000:.1f}ms total, {elapsed / lookups * 1e9:.0f}ns per label, '
+                f'peak {peak / 1024:.1f} KiB allocated'
+            )
+
+        started = time.perf_counter()
+        ClientSerializer(clients, many=True).data
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'ClientSerializer(many=True): {elapsed:.2f}s ({elapsed / len(clients) * 1e6:.1f}us per client)'
+        ))
@@ -0,0 +1,68 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users.benchmarking import (
+    SEED_BARANGAYS, SEED_CITIES, SEED_FIRST_NAMES, SEED_LAST_NAMES, delete_seeded, seed_borrowers,
+    summarize_latencies, timed,
+)
+from users.client_search import has_trigram, search_clients
+from users.models import Client
+
+
+def random_query(rng, borrowers):
+    """
+    A staff-style lookup: a name, a name and place, a phone prefix or a partial word
+    """
+    kind = rng.random()
+    if kind < 0.3:
+        return f'{rng.choice(SEED_FIRST_NAMES)} {rng.choice(SEED_LAST_NAMES)}'
+    if kind < 0.5:
+        return f'{rng.choice(SEED_LAST_NAMES)} {rng.choice(SEED_CITIES)} {rng.choice(SEED_BARANGAYS)}'
+    if kind < 0.8:
+        return f'0917{rng.randrange(borrowers):07d}'
+    return rng.choice(SEED_LAST_NAMES)[:4]
+
+
+class Command(BaseCommand):
+    help = 'Seed borrowers and measure client search latency (top results, as the endpoint serves them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--borrowers', type=int, default=1_000_000)
+        parser.add_argument('--searches', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['borrowers']} borrowers...")
+        seed_borrowers(options['borrowers'], progress=lambda done: self.stdout.write(f'  borrowers: {done}'))
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE "{Client._meta.db_table}"')
+        self.stdout.write(f"pg_trgm: {'yes' if has_trigram(connection) else 'no (prefix matching only)'}")
+
+        rng = random.Random(options['seed'])
+        try:
+            sample = search_clients(Client.objects.all(), random_query(rng, options['borrowers']), options['limit'])
+            if connection.vendor == 'postgresql':
+                self.stdout.write(sample.explain(analyze=True))
+            else:
+                self.stdout.write(sample.explain())
+
+            latencies = []
+            matches = 0
+            for _ in range(options['searches']):
+                query = random_query(rng, options['borrowers'])
+                with timed(latencies):
+                    matches += len(search_clients(Client.objects.all(), query, options['limit']))
+            summary = summarize_latencies(latencies)
+        finally:
+            if options['cleanup']:
+                delete_seeded()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{options['searches']} searches, {matches / options['searches']:.1f} results on average\n"
+            f"p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms"
+        ))
@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users.benchmarking import delete_seeded, seed_borrowers, seed_lenders, summarize_latencies, timed
+from users.models import CustomUser, Client, Company
+
+# Indexes added for role/user_type, dashboard and lender search filtering (migrations 0010-0011)
+BENCHMARKED_INDEXES = {
+    CustomUser: ['customuser_type_role_idx', 'customuser_borrower_idx'],
+    Client: ['client_region_employment_idx', 'client_employment_idx', 'client_employed_income_idx'],
+    Company: ['company_region_created_idx'],
+}
+
+
+def benchmark_queries():
+    """
+    (label, queryset, count) triples mirroring the viewset and dashboard filters
+    """
+    return [
+        ('newest borrowers page',
+         CustomUser.objects.filter(user_type='borrower').order_by('-created_at', '-id')[:50], False),
+        ('lender admins',
+         CustomUser.objects.filter(user_type='lending_company', role='admin'), True),
+        ('clients in region',
+         Client.objects.filter(current_region='region7'), True),
+        ('clients in region by employment',
+         Client.objects.filter(current_region='region7', employment_status='employed'), True),
+        ('retired clients',
+         Client.objects.filter(employment_status='retired'), True),
+        ('employed clients in region earning 50k+',
+         Client.objects.filter(current_region='ncr', employment_status='employed', monthly_income__gte=50000), True),
+        ('companies in region',
+         Company.objects.filter(business_region='region7').order_by('-created_at', '-id')[:50], False),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Seed users/clients/companies and compare filter query plans and latency with and without indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--borrowers', type=int, default=1_000_000)
+        parser.add_argument('--lenders', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--skip-before', action='store_true', help='Only measure with the indexes in place')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['borrowers']} borrowers and {options['lenders']} lenders...")
+        seed_borrowers(options['borrowers'], progress=lambda done: self.stdout.write(f'  borrowers: {done}'))
+        seed_lenders(options['lenders'])
+        self.analyze()
+
+        try:
+            if not options['skip_before']:
+                self.toggle_indexes(enabled=False)
+                try:
+                    self.run('without indexes', options['repeat'])
+                finally:
+                    self.toggle_indexes(enabled=True)
+            self.run('with indexes', options['repeat'])
+        finally:
+            if options['cleanup']:
+                delete_seeded()
+
+    def analyze(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model in BENCHMARKED_INDEXES:
+                    cursor.execute(f'ANALYZE "{model._meta.db_table}"')
+
+    def toggle_indexes(self, enabled):
+        with connection.schema_editor() as editor:
+            for model, names in BENCHMARKED_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        (editor.add_index if enabled else editor.remove_index)(model, index)
+        self.analyze()
+
+    def run(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {title} =='))
+        for label, queryset, count in benchmark_queries():
+            plan_queryset = queryset.values('pk') if count else queryset
+            analyze = connection.vendor == 'postgresql'
+            plan = plan_queryset.explain(analyze=analyze) if analyze else plan_queryset.explain()
+
+            latencies = []
+            for _ in range(repeat):
+                with timed(latencies):
+                    queryset.count() if count else list(queryset)
+            summary = summarize_latencies(latencies)
+
+            self.stdout.write(self.style.SUCCESS(
+                f"\n{label}: p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms"
+            ))
+            self.stdout.write(plan)
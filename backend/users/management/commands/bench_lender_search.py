@@ -0,0 +1,73 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from users.benchmarking import SEED_PRODUCTS, SEED_REGIONS, delete_seeded, seed_lenders, summarize_latencies, timed
+from users.lender_search import filter_lenders
+from users.models import Company
+from users.pagination import LenderSearchPagination
+
+
+def random_criteria(rng):
+    """
+    A borrower-style search; region and rate are left out now and then
+    """
+    criteria = {
+        'amount': Decimal(rng.choice([5000, 20000, 50000, 150000, 500000])),
+        'term': rng.choice([3, 6, 12, 24, 36]),
+        'product': rng.choice(SEED_PRODUCTS),
+    }
+    if rng.random() < 0.8:
+        criteria['region'] = rng.choice(SEED_REGIONS)
+    if rng.random() < 0.5:
+        criteria['rate'] = Decimal(rng.randrange(100, 500)) / 100
+    return criteria
+
+
+class Command(BaseCommand):
+    help = 'Seed lending companies and measure lender search latency (first page, as the endpoint serves it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=100_000)
+        parser.add_argument('--searches', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['companies']} lending companies...")
+        seed_lenders(options['companies'], progress=lambda done: self.stdout.write(f'  lenders: {done}'))
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE "{Company._meta.db_table}"')
+
+        page_size = LenderSearchPagination.page_size
+        ordering = ['-' + field for field in LenderSearchPagination.keyset]
+        rng = random.Random(options['seed'])
+
+        def first_page(criteria):
+            return filter_lenders(Company.objects.all(), criteria).order_by(*ordering)[:page_size + 1]
+
+        try:
+            sample = first_page(random_criteria(rng))
+            if connection.vendor == 'postgresql':
+                self.stdout.write(sample.explain(analyze=True))
+            else:
+                self.stdout.write(sample.explain())
+
+            latencies = []
+            matches = 0
+            for _ in range(options['searches']):
+                criteria = random_criteria(rng)
+                with timed(latencies):
+                    matches += len(first_page(criteria))
+            summary = summarize_latencies(latencies)
+        finally:
+            if options['cleanup']:
+                delete_seeded()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"\n{options['searches']} searches, {matches / options['searches']:.1f} rows per page on average\n"
+            f"p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms"
+        ))
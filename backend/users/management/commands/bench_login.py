@@ -0,0 +1,66 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client as HttpClient
+
+from users.benchmarking import summarize_latencies, timed
+from users.models import CustomUser
+
+PASSWORD = 'Bench-login-pass-1'
+
+
+class Command(BaseCommand):
+    help = 'Measure POST /api/auth/login/ throughput (logins/sec and logins/sec per core)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        emails = [f'bench-login-{index}@example.com' for index in range(options['users'])]
+        CustomUser.objects.filter(email__in=emails).delete()
+        for index, email in enumerate(emails):
+            CustomUser.objects.create_user(email=email, username=f'bench-login-{index}', password=PASSWORD)
+
+        latencies = []
+        failures = []
+
+        def login(number):
+            client = HttpClient()
+            try:
+                with timed(latencies):
+                    response = client.post(
+                        '/api/auth/login/',
+                        {'email': emails[number % len(emails)], 'password': PASSWORD},
+                        content_type='application/json',
+                    )
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                list(executor.map(login, range(options['logins'])))
+            elapsed = time.perf_counter() - started
+        finally:
+            CustomUser.objects.filter(email__in=emails).delete()
+
+        # Hashing is the bottleneck, so it runs on pool workers when the pool is on
+        cores = settings.LOGIN_HASH_POOL_WORKERS or os.cpu_count()
+        throughput = len(latencies) / elapsed
+        summary = summarize_latencies(latencies)
+
+        self.stdout.write(f"hasher: {get_hasher().algorithm}, pool workers: {settings.LOGIN_HASH_POOL_WORKERS}")
+        self.stdout.write(f"logins: {summary['count']} ({len(failures)} failed) in {elapsed:.2f}s")
+        self.stdout.write(f"throughput: {throughput:.1f} logins/sec, {throughput / cores:.1f} logins/sec per core ({cores} cores)")
+        self.stdout.write(
+            f"latency ms: p50 {summary['p50_ms']}, p95 {summary['p95_ms']}, p99 {summary['p99_ms']}, max {summary['max_ms']}"
+        )
@@ -0,0 +1,117 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from users.benchmarking import delete_seeded, seed_borrowers, seed_lenders, summarize_latencies, timed
+from users.ledger import add_months, create_payment_partitions, record_payment
+from users.models import Client, Company, Loan, LoanApplication, Payment
+
+PURPOSE = 'bench-payments'
+
+
+def seed_loans(count, rng):
+    """
+    Top the benchmark loans up to count, one per seeded borrower
+    """
+    existing = Loan.objects.filter(application__purpose=PURPOSE).count()
+    clients = list(Client.objects.filter(loan_applications=None).values_list('pk', flat=True)[:count - existing])
+    companies = list(Company.objects.values_list('pk', flat=True)[:100])
+    now = timezone.now()
+    for start in range(0, len(clients), 5000):
+        with transaction.atomic():
+            applications = LoanApplication.objects.bulk_create([
+                LoanApplication(
+                    client_id=client, company_id=rng.choice(companies), product='personal',
+                    amount=Decimal('50000'), term_months=24, status='approved', decided_at=now, purpose=PURPOSE,
+                )
+                for client in clients[start:start + 5000]
+            ])
+            Loan.objects.bulk_create([
+                Loan(
+                    application=application, client_id=application.client_id, company_id=application.company_id,
+                    principal=application.amount, monthly_rate=Decimal('2.00'), term_months=24,
+                    installment=Decimal('2643.56'), total_payable=Decimal('63445.44'), released_at=now,
+                    maturity_date=add_months(now.date(), 24),
+                    # Room for every payment the benchmark makes
+                    outstanding_balance=Decimal('9999999.00'),
+                )
+                for application in applications
+            ])
+
+
+def seed_history(loans, count, months, rng, batch_size=10000):
+    """
+    count past payments spread over the last months months (rows only, totals untouched)
+    """
+    now = timezone.now()
+    for start in range(0, count, batch_size):
+        Payment.objects.bulk_create([
+            Payment(
+                loan_id=rng.choice(loans), amount=Decimal('2643.56'),
+                paid_at=now - timedelta(seconds=rng.randrange(months * 30 * 86400)),
+                reference=f'H{start + index}',
+            )
+            for index in range(min(batch_size, count - start))
+        ])
+
+
+def delete_benchmark_loans():
+    # The ledger refuses deletes through the ORM; benchmark rows go with raw SQL
+    loans = Loan.objects.filter(application__purpose=PURPOSE)
+    sql, params = loans.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {Payment._meta.db_table} WHERE loan_id IN ({sql})', params)
+    loans.delete()
+    LoanApplication.objects.filter(purpose=PURPOSE).delete()
+
+
+class Command(BaseCommand):
+    help = 'Measure payment ingestion and balance reads on a ledger with a large payment history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loans', type=int, default=10000)
+        parser.add_argument('--history', type=int, default=1_000_000, help='Past payments to add before measuring')
+        parser.add_argument('--months', type=int, default=24, help='Months the history is spread over')
+        parser.add_argument('--payments', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"Seeding {options['loans']} loans...")
+        seed_borrowers(options['loans'])
+        seed_lenders(100)
+        seed_loans(options['loans'], rng)
+        loans = list(Loan.objects.filter(application__purpose=PURPOSE).values_list('pk', flat=True))
+
+        created = create_payment_partitions(timezone.now() - timedelta(days=options['months'] * 31), options['months'] + 2)
+        self.stdout.write(f'{len(created)} payment partitions created')
+        self.stdout.write(f"Adding {options['history']} past payments...")
+        seed_history(loans, options['history'], options['months'], rng)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Payment._meta.db_table}')
+
+        try:
+            ingest = []
+            reads = []
+            for index in range(options['payments']):
+                loan = rng.choice(loans)
+                with timed(ingest):
+                    record_payment(loan, '2643.56', reference=f'B{index}')
+                with timed(reads):
+                    Loan.objects.filter(pk=loan).values_list('outstanding_balance', flat=True).get()
+        finally:
+            if options['cleanup']:
+                delete_benchmark_loans()
+                delete_seeded()
+
+        for label, latencies in (('record_payment', ingest), ('balance read', reads)):
+            summary = summarize_latencies(latencies)
+            self.stdout.write(self.style.SUCCESS(
+                f"{label}: p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms"
+            ))
@@ -0,0 +1,83 @@
+import random
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.test import Client as HttpClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.api_benchmark import BENCH_EMAIL_DOMAIN
+from users.benchmarking import SEED_PRODUCTS, delete_seeded, seed_lenders, summarize_latencies, timed
+from users.loan_quotes import ScheduleBatch
+from users.models import CustomUser
+
+AMOUNTS = ['5000', '10000', '20000', '50000', '100000', '150000', '250000', '500000']
+TERMS = [3, 6, 9, 12, 18, 24, 36, 48]
+
+
+class Command(BaseCommand):
+    help = 'Measure the quote engine on batches of schedules, and the quote endpoint over seeded lenders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedules', type=int, default=10000, help='Loans per engine batch')
+        parser.add_argument('--companies', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--include-schedule', action='store_true', help='Ask the endpoint for full schedules')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        loans = options['schedules']
+        batch_args = (
+            rng.integers(5000, 500000, loans) * 100,
+            rng.choice(TERMS, loans),
+            rng.integers(50, 400, loans),
+            rng.choice(['equal', 'diminishing', 'add_on'], loans),
+            rng.integers(0, 500, loans),
+        )
+        compute = []
+        render = []
+        for _ in range(options['requests']):
+            with timed(compute):
+                batch = ScheduleBatch(*batch_args)
+            with timed(render):
+                batch.rows(include_schedule=options['include_schedule'])
+        self.report(f'Engine, {loans} schedules: compute', compute)
+        self.report(f'Engine, {loans} schedules: rows', render)
+
+        self.stdout.write(f"Seeding {options['companies']} lending companies...")
+        seed_lenders(options['companies'], progress=lambda done: self.stdout.write(f'  lenders: {done}'))
+        user = CustomUser.objects.create_user(
+            email=f'quotes@{BENCH_EMAIL_DOMAIN}', username='bench-quotes', password=None,
+            user_type='borrower', role='borrower',
+        )
+        client = HttpClient()
+        client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+        pick = random.Random(options['seed'])
+        try:
+            latencies = []
+            quotes = 0
+            for _ in range(options['requests']):
+                body = {
+                    'amounts': pick.sample(AMOUNTS, 4),
+                    'terms': pick.sample(TERMS, 4),
+                    'product': pick.choice(SEED_PRODUCTS),
+                    'include_schedule': options['include_schedule'],
+                }
+                with timed(latencies):
+                    response = client.post('/api/companies/quotes/', body, content_type='application/json')
+                if response.status_code != 200:
+                    self.stderr.write(f'{response.status_code}: {response.content[:200]!r}')
+                    continue
+                quotes += response.json()['count']
+        finally:
+            CustomUser.objects.filter(pk=user.pk).delete()
+            if options['cleanup']:
+                delete_seeded()
+        self.report(f"Endpoint, {quotes / options['requests']:.0f} quotes per request", latencies)
+
+    def report(self, label, latencies):
+        summary = summarize_latencies(latencies)
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, max {summary['max_ms']}ms"
+        ))
@@ -0,0 +1,58 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from users.benchmarking import build_clients
+from users.parsers import FastJSONParser
+from users.renderers import FastJSONRenderer, orjson
+from users.serializers import ClientSerializer
+
+
+def best_of(repeat, function, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+class Command(BaseCommand):
+    help = 'Compare the stdlib and orjson JSON renderer/parser on a large serialized client list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50_000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write(self.style.WARNING('orjson is not installed; FastJSONRenderer uses the stdlib path'))
+
+        count, repeat = options['clients'], options['repeat']
+        payload = {
+            'next': 'http://testserver/api/clients/?cursor=abc',
+            'previous': None,
+            'results': ClientSerializer(build_clients(count), many=True).data,
+        }
+
+        body = JSONRenderer().render(payload)
+        if FastJSONRenderer().render(payload) != body:
+            self.stderr.write(self.style.ERROR('Rendered output differs from the stdlib renderer'))
+        self.stdout.write(f'{count} clients, {len(body) / 1024 / 1024:.1f} MiB of JSON (best of {repeat})')
+
+        rows = (
+            ('render', JSONRenderer().render, FastJSONRenderer().render, payload),
+            ('parse', lambda data: JSONParser().parse(io.BytesIO(data)),
+             lambda data: FastJSONParser().parse(io.BytesIO(data)), body),
+        )
+        for label, stdlib, fast, argument in rows:
+            slow_time = best_of(repeat, stdlib, argument)
+            fast_time = best_of(repeat, fast, argument)
+            self.stdout.write(
+                f'{label:>7}: stdlib {slow_time * 1000:.0f}ms ({count / slow_time:,.0f} rows/sec), '
+                f'orjson {fast_time * 1000:.0f}ms ({count / fast_time:,.0f} rows/sec), '
+                f'{slow_time / fast_time:.1f}x'
+            )
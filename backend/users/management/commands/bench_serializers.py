@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from users.benchmarking import delete_seeded, seed_borrowers, seed_lenders
+from users.fast_serialization import get_row_plan
+from users.models import Client, Company
+from users.query_planning import get_query_plan
+from users.serializers import ClientSerializer, CompanySerializer
+
+TARGETS = [
+    ('clients', Client, ClientSerializer),
+    ('companies', Company, CompanySerializer),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of the serializer list path and the fast values_list() path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows afterwards')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        seed_borrowers(rows)
+        seed_lenders(rows)
+        renderer = JSONRenderer()
+
+        try:
+            for label, model, serializer_class in TARGETS:
+                queryset = model.objects.order_by('-created_at', '-id')[:rows]
+                row_plan = get_row_plan(serializer_class)
+
+                def serializer_path():
+                    instances = get_query_plan(serializer_class).apply(queryset)
+                    return renderer.render(serializer_class(instances, many=True).data)
+
+                def fast_path():
+                    return renderer.render(row_plan.serialize(queryset.values_list(*row_plan.columns)))
+
+                if serializer_path() != fast_path():
+                    self.stderr.write(self.style.ERROR(f'{label}: fast path output differs'))
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label} ({rows} rows, query + serialize + render)'))
+                for name, function in (('serializer', serializer_path), ('fast path', fast_path)):
+                    best = min(self.time(function) for _ in range(options['repeat']))
+                    self.stdout.write(f'{name:>12}: {rows / best:,.0f} rows/sec ({best * 1000:.0f}ms)')
+        finally:
+            if options['cleanup']:
+                delete_seeded()
+
+    def time(self, function):
+        started = time.perf_counter()
+        function()
+        return time.perf_counter() - started
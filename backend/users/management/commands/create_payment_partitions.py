@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from users.ledger import create_payment_partitions, payment_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly payment ledger partitions (PostgreSQL) for this month and the months ahead'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stdout.write('The payment ledger is only partitioned on PostgreSQL')
+            return
+        created = create_payment_partitions(timezone.now(), options['months_ahead'] + 1)
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(created)} partitions created, {len(payment_partitions())} monthly partitions in total'
+        ))
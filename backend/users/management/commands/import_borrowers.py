@@ -0,0 +1,41 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk_import import DEFAULT_BATCH_SIZE, BorrowerImporter, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import borrowers from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or a JSON list of objects')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=None, help='Password hashing processes (default: CPU count)')
+        parser.add_argument('--invite', action='store_true', help='Create invitation accounts with unusable passwords')
+        parser.add_argument('--report', help='Write the full JSON report (errors and invitation tokens) to this path')
+
+    def handle(self, *args, **options):
+        importer = BorrowerImporter(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            invite=options['invite'],
+        )
+        with open(options['path'], 'rb') as upload:
+            try:
+                report = importer.run(read_rows(upload, options['path']))
+            except ValueError as e:
+                raise CommandError(e) from e
+
+        if options['report']:
+            with open(options['report'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        for error in report['errors'][:20]:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        if report['failed'] > 20:
+            self.stderr.write(f"... and {report['failed'] - 20} more, see --report")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} borrowers, {report['failed']} rows failed"
+        ))
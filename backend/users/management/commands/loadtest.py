@@ -0,0 +1,185 @@
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.benchmarking import summarize_latencies
+from users.models import CustomUser
+from users.renderers import FastJSONRenderer
+
+EMAIL = 'loadtest@example.com'
+PASSWORD = 'Load-test-pass-1'
+HOST = 'testserver'
+
+ENDPOINTS = {
+    # name: (method, sync path, async path)
+    'profile': ('GET', '/api/auth/profile/', '/api/async/auth/profile/'),
+    'refresh': ('POST', '/api/auth/refresh_token/', '/api/async/auth/refresh_token/'),
+    'login': ('POST', '/api/auth/login/', '/api/async/auth/login/'),
+}
+
+
+class WSGIServer:
+    """
+    A threaded WSGI worker: requests wait for one of `threads` threads, which
+    stays busy until the slow client has read the whole response
+    """
+    def __init__(self, threads, client_delay):
+        self.app = get_wsgi_application()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.client_delay = client_delay
+
+    def _call(self, method, path, headers, body):
+        environ = {
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False, 'CONTENT_LENGTH': str(len(body)), 'CONTENT_TYPE': 'application/json',
+        }
+        for name, value in headers.items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+        statuses = []
+        result = self.app(environ, lambda status, response_headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in result:
+                time.sleep(self.client_delay)
+        finally:
+            result.close()
+        return int(statuses[0].split()[0])
+
+    async def request(self, method, path, headers, body):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._call, method, path, headers, body)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class ASGIServer:
+    """
+    A single ASGI event loop: slow clients are awaited, not waited on by a thread
+    """
+    def __init__(self, client_delay):
+        self.app = get_asgi_application()
+        self.client_delay = client_delay
+
+    async def request(self, method, path, headers, body):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [
+                (b'host', HOST.encode()), (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+            ]
+            + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+            'client': ('127.0.0.1', 50000), 'server': (HOST, 80),
+        }
+        finished = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        statuses = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Django listens for a disconnect until the response is sent
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+            elif message['type'] == 'http.response.body':
+                await asyncio.sleep(self.client_delay)
+                if not message.get('more_body'):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        finished.set()
+        return statuses[0]
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/sec of the sync auth views under a threaded WSGI worker with the async '
+        'views under one ASGI event loop, with slow clients that take --client-delay ms to read a response'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='profile')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50, help='Clients with a request in flight')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--client-delay', type=float, default=20, help='Milliseconds per response read')
+
+    def handle(self, *args, **options):
+        CustomUser.objects.filter(email=EMAIL).delete()
+        user = CustomUser.objects.create_user(email=EMAIL, username='loadtest', password=PASSWORD)
+        try:
+            self.run(user, options)
+        finally:
+            CustomUser.objects.filter(email=EMAIL).delete()
+
+    def run(self, user, options):
+        method, sync_path, async_path = ENDPOINTS[options['endpoint']]
+        refresh = RefreshToken.for_user(user)
+        headers = {'Authorization': f'Bearer {refresh.access_token}'}
+        payload = {
+            'profile': None,
+            'refresh': {'refresh': str(refresh)},
+            'login': {'email': EMAIL, 'password': PASSWORD},
+        }[options['endpoint']]
+        body = b'' if payload is None else FastJSONRenderer().render(payload)
+        delay = options['client_delay'] / 1000
+
+        self.stdout.write(
+            f"{options['requests']} {method} requests, {options['concurrency']} concurrent clients, "
+            f"{options['client_delay']:g}ms per response read"
+        )
+        runs = (
+            (f"WSGI, {options['threads']} threads, sync views", WSGIServer(options['threads'], delay), sync_path),
+            ('ASGI, 1 event loop, sync views', ASGIServer(delay), sync_path),
+            ('ASGI, 1 event loop, async views', ASGIServer(delay), async_path),
+        )
+        for label, server, path in runs:
+            try:
+                elapsed, latencies, failures = asyncio.run(
+                    self.drive(server, method, path, headers, body, options['requests'], options['concurrency'])
+                )
+            finally:
+                server.close()
+            summary = summarize_latencies(latencies)
+            self.stdout.write(
+                f"{label:>36}: {len(latencies) / elapsed:8.1f} req/s, p50 {summary['p50_ms']}ms, "
+                f"p99 {summary['p99_ms']}ms, {failures} failed"
+            )
+
+    async def drive(self, server, method, path, headers, body, count, concurrency):
+        """
+        Closed loop: each client sends its next request as soon as the previous one is read
+        """
+        remaining = iter(range(count))
+        latencies = []
+        failures = 0
+
+        async def client():
+            nonlocal failures
+            for _ in remaining:
+                started = time.perf_counter()
+                status = await server.request(method, path, headers, body)
+                latencies.append(time.perf_counter() - started)
+                if status >= 400:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return time.perf_counter() - started, latencies, failures
@@ -0,0 +1,163 @@
+import asyncio
+import random
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.asgi import application
+from users.benchmarking import delete_seeded, seed_borrowers, seeded_users, summarize_latencies
+from users.notifications import get_hub, notify, notification_options, renderer
+
+
+class Deliveries:
+    """
+    Counts the sockets each published text reached, and how long the last one took
+    """
+    def __init__(self):
+        self.pending = {}
+        self.latencies = []
+        self.frames = 0
+
+    def expect(self, text, sockets):
+        entry = [sockets, None, asyncio.get_running_loop().create_future()]
+        self.pending[text] = entry
+        return entry
+
+    def received(self, text):
+        self.frames += 1
+        entry = self.pending.get(text)
+        if entry is None:
+            return
+        entry[0] -= 1
+        if not entry[0]:
+            self.latencies.append(time.perf_counter() - entry[1])
+            entry[2].set_result(None)
+            del self.pending[text]
+
+
+class MemorySocket:
+    """
+    A WebSocket client talking to the ASGI application in process
+    """
+    def __init__(self, token, deliveries):
+        self.scope = {
+            'type': 'websocket', 'asgi': {'version': '3.0'}, 'scheme': 'ws', 'http_version': '1.1',
+            'path': notification_options()['PATH'], 'query_string': f'token={token}'.encode(),
+            'headers': [], 'subprotocols': [],
+        }
+        self.deliveries = deliveries
+        self.incoming = asyncio.Queue()
+        self.accepted = asyncio.get_running_loop().create_future()
+        self.close_code = None
+        self.task = None
+
+    async def open(self):
+        self.task = asyncio.ensure_future(application(self.scope, self.incoming.get, self.send))
+        await self.incoming.put({'type': 'websocket.connect'})
+        return await self.accepted
+
+    async def send(self, message):
+        if message['type'] == 'websocket.send':
+            self.deliveries.received(message['text'])
+        elif message['type'] == 'websocket.accept':
+            self.accepted.set_result(True)
+        elif message['type'] == 'websocket.close':
+            self.close_code = message['code']
+            if not self.accepted.done():
+                self.accepted.set_result(False)
+
+    async def close(self):
+        await self.incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+class Command(BaseCommand):
+    help = (
+        'Open --sockets notification WebSockets for --users seeded borrowers on one in-process ASGI '
+        'event loop, then measure how long events published from another thread take to reach them'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=1000, help='Events to one user, published in a burst')
+        parser.add_argument('--broadcasts', type=int, default=20, help='Events to every socket, one at a time')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded users afterwards')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {options['users']} users...")
+        seed_borrowers(options['users'])
+        try:
+            users = list(seeded_users('b').order_by('pk')[:options['users']])
+            tokens = {user.pk: str(AccessToken.for_user(user)) for user in users}
+            asyncio.run(self.run(tokens, options))
+        finally:
+            if options['cleanup']:
+                delete_seeded()
+
+    async def run(self, tokens, options):
+        rng = random.Random(options['seed'])
+        deliveries = Deliveries()
+        user_ids = list(tokens)
+        owners = [user_ids[index % len(user_ids)] for index in range(options['sockets'])]
+        sockets_of = Counter(owners)
+
+        started = time.perf_counter()
+        sockets = [MemorySocket(tokens[user_id], deliveries) for user_id in owners]
+        accepted = await asyncio.gather(*(socket.open() for socket in sockets))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{sum(accepted)}/{len(sockets)} sockets open for {len(user_ids)} users in {elapsed:.2f}s, '
+            f'{get_hub().count} registered'
+        )
+
+        try:
+            targets = [rng.choice(user_ids) for _ in range(options['events'])]
+            events = [{'type': 'loadtest', 'n': index} for index in range(options['events'])]
+            summary, elapsed = await self.publish(deliveries, [(
+                [user_id], event, sockets_of[user_id]) for user_id, event in zip(targets, events)
+            ])
+            self.report('user events', summary, elapsed, options['events'], 'events')
+
+            for index in range(options['broadcasts']):
+                broadcast = [(None, {'type': 'loadtest', 'broadcast': index}, len(sockets))]
+                await self.publish(deliveries, broadcast)
+            summary = summarize_latencies(deliveries.latencies[-options['broadcasts']:])
+            elapsed = sum(deliveries.latencies[-options['broadcasts']:])
+            self.report('broadcasts', summary, elapsed, options['broadcasts'] * len(sockets), 'deliveries')
+        finally:
+            await asyncio.gather(*(socket.close() for socket in sockets))
+
+        dropped = sum(socket.close_code is not None for socket in sockets)
+        self.stdout.write(f'{deliveries.frames} frames received, {dropped} sockets closed by the server')
+
+    async def publish(self, deliveries, batch):
+        """
+        Publish (user_ids, event, expected sockets) triples from a worker thread, as tasks do,
+        and wait until every socket got its copy
+        """
+        entries = []
+        published = []
+        for user_ids, event, sockets in batch:
+            entries.append(deliveries.expect(renderer.render(event).decode(), sockets))
+            published.append((user_ids, event))
+
+        def send():
+            for entry, (user_ids, event) in zip(entries, published):
+                entry[1] = time.perf_counter()
+                notify(user_ids, event)
+
+        started = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(None, send)
+        await asyncio.gather(*(entry[2] for entry in entries))
+        elapsed = time.perf_counter() - started
+        return summarize_latencies(deliveries.latencies[-len(batch):]), elapsed
+
+    def report(self, label, summary, elapsed, count, unit):
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: publish to last socket p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, "
+            f"p99 {summary['p99_ms']}ms, {count / elapsed:,.0f} {unit}/s"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users.client_search import rebuild_search_documents
+from users.models import Client
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute Client.search_document, e.g. after QuerySet.update() calls on names, '
+        'emails, phone numbers or addresses, which bypass the signals that maintain it'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        changed = rebuild_search_documents(Client.objects.all(), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated {changed} search documents'))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from users.task_queue import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run tasks queued by the database task queue backend (TASK_QUEUE_BACKEND=database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            # Like a request boundary: replace a broken or expired connection between batches
+            close_old_connections()
+            ran = run_pending(options['batch_size'])
+            total += ran
+            if ran:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} tasks'))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.credit_scoring import CHUNK_SIZE, score_clients
+
+
+class Command(BaseCommand):
+    help = (
+        'Score clients whose income, employment, marital status, region or loans changed since '
+        'they were last scored (run nightly); --full reads every client'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Read every client, e.g. after a model change')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = score_clients(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {result['read']} clients, wrote {result['written']} scores "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:45
+
+from django.db import migrations
+
+
+def create_products_gin_index(apps, schema_editor):
+    # jsonb containment (@>) is PostgreSQL-only; other backends scan the JSON text
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS company_products_gin_idx '
+            'ON "Company" USING gin (loan_products_offered jsonb_path_ops)'
+        )
+
+
+def drop_products_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS company_products_gin_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_products_gin_index, drop_products_gin_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:28
+
+import warnings
+
+from django.db import DatabaseError, migrations, models, transaction
+
+from users.client_search import rebuild_search_documents
+
+
+def build_search_documents(apps, schema_editor):
+    Client = apps.get_model('users', 'Client')
+    rebuild_search_documents(Client.objects.using(schema_editor.connection.alias))
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    # The expression of users.client_search.search_vector(), which the planner must match exactly
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS client_search_vector_idx ON "Client" '
+        "USING gin (to_tsvector('simple'::regconfig, COALESCE(search_document, '')))"
+    )
+    # pg_trgm ships with PostgreSQL's contrib package; without it (or the privilege to
+    # create it) client search still works, without fuzzy matching
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        available = cursor.fetchone() is not None
+    if available:
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            available = False
+    if not available:
+        warnings.warn('pg_trgm is not available: client search will match word prefixes only')
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS client_search_trgm_idx '
+        'ON "Client" USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS client_search_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS client_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_task_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_document',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.RunPython(build_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
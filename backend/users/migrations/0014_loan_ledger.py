@@ -0,0 +1,89 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_client_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoanApplication',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product', models.CharField(choices=[('personal', 'Personal Loans'), ('business', 'Business Loans'), ('salary', 'Salary Loans'), ('vehicle', 'Vehicle Loans'), ('housing', 'Housing Loans'), ('payday', 'Payday Loans'), ('collateral', 'Collateral Loans'), ('sme', 'SME Loans')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('term_months', models.PositiveSmallIntegerField()),
+                ('method', models.CharField(choices=[('equal', 'Equal installment'), ('diminishing', 'Diminishing balance'), ('add_on', 'Add-on (flat) rate')], default='equal', max_length=20)),
+                ('purpose', models.TextField(blank=True, default='')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('withdrawn', 'Withdrawn')], default='pending', max_length=10)),
+                ('decided_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='loan_applications', to='users.client')),
+                ('company', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='loan_applications', to='users.company')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Loan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('principal', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('monthly_rate', models.DecimalField(decimal_places=2, help_text='Monthly interest rate (%)', max_digits=5)),
+                ('method', models.CharField(choices=[('equal', 'Equal installment'), ('diminishing', 'Diminishing balance'), ('add_on', 'Add-on (flat) rate')], default='equal', max_length=20)),
+                ('term_months', models.PositiveSmallIntegerField()),
+                ('processing_fee', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('installment', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_payable', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('released_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('maturity_date', models.DateField()),
+                ('outstanding_balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('last_payment_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('paid', 'Paid'), ('defaulted', 'Defaulted')], default='active', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='loans', to='users.client')),
+                ('company', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='loans', to='users.company')),
+                ('application', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='loan', to='users.loanapplication')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paid_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('channel', models.CharField(choices=[('bank_transfer', 'Bank Transfer'), ('gcash', 'GCash'), ('maya', 'Maya'), ('over_the_counter', 'Over the Counter'), ('cash', 'Cash')], default='bank_transfer', max_length=20)),
+                ('reference', models.CharField(blank=True, default='', help_text='Receipt or transaction number', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='users.loan')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['company', 'status', 'created_at'], name='loanapp_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanapplication',
+            index=models.Index(fields=['client', 'created_at'], name='loanapp_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['client', 'status'], name='loan_client_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['company', 'status', 'released_at'], name='loan_company_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['loan', 'paid_at'], name='payment_loan_paid_idx'),
+        ),
+    ]
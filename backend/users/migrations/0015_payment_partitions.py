@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:52
+
+from django.db import migrations
+from django.utils import timezone
+
+from users.ledger import create_payment_partitions
+
+
+def partition_payments(apps, schema_editor):
+    # The table is new and empty: recreate it as a table partitioned by month of paid_at.
+    # The primary key has to include the partition key; ids stay unique through the identity
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'users_payment'")
+        if cursor.fetchone()[0] == 'p':
+            return
+    schema_editor.execute('DROP TABLE "users_payment"')
+    schema_editor.execute(
+        'CREATE TABLE "users_payment" ('
+        '"id" bigint NOT NULL GENERATED BY DEFAULT AS IDENTITY, '
+        '"amount" numeric(12, 2) NOT NULL, '
+        '"paid_at" timestamp with time zone NOT NULL, '
+        '"channel" varchar(20) NOT NULL, '
+        '"reference" varchar(100) NOT NULL, '
+        '"created_at" timestamp with time zone NOT NULL, '
+        '"loan_id" bigint NOT NULL, '
+        'PRIMARY KEY ("id", "paid_at")'
+        ') PARTITION BY RANGE ("paid_at")'
+    )
+    schema_editor.execute('CREATE INDEX "payment_loan_paid_idx" ON "users_payment" ("loan_id", "paid_at")')
+    schema_editor.execute(
+        'ALTER TABLE "users_payment" ADD CONSTRAINT "users_payment_loan_id_ac72bdd2_fk_users_loan_id" '
+        'FOREIGN KEY ("loan_id") REFERENCES "users_loan" ("id") DEFERRABLE INITIALLY DEFERRED'
+    )
+    schema_editor.execute('CREATE TABLE "users_payment_default" PARTITION OF "users_payment" DEFAULT')
+    # This month and the next three; manage.py create_payment_partitions keeps ahead after that
+    create_payment_partitions(timezone.now(), 4, using=connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_loan_ledger'),
+    ]
+
+    operations = [
+        # Unapplying leaves the partitioned table; unapplying 0014 drops it with its partitions
+        migrations.RunPython(partition_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_payment_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='credit_score',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='credit_score_inputs',
+            field=models.CharField(default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='credit_scored_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 12:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_client_credit_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rollup', models.CharField(max_length=40)),
+                ('bucket', models.CharField(max_length=40)),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('rollup', 'bucket'), name='dashboard_count_bucket_uniq')],
+            },
+        ),
+    ]
@@ -1,21 +1,29 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .choices import (
+    AMORTIZATION_METHODS, EMPLOYMENT_STATUSES, GENDERS, LOAN_APPLICATION_STATUSES, LOAN_PRODUCTS, LOAN_STATUSES,
+    MARITAL_STATUSES, PAYMENT_CHANNELS, REGIONS, ROLES, TASK_STATUSES, USER_TYPES
+)
+from .client_search import document_for
+
+
+def format_address(street, barangay, city, region):
+    return f"{street}, {barangay}, {city}, {REGIONS.label(region)}"
+
+
+def loan_products_display(products):
+    return [LOAN_PRODUCTS.label(product) for product in products]
+
 
 class CustomUser(AbstractUser):
     """
     Custom user model for the Lending Management System
     """
-    USER_TYPE_CHOICES = [
-        ('borrower', 'Borrower'),
-        ('lending_company', 'Lending Company'),
-    ]
+    USER_TYPE_CHOICES = USER_TYPES
     
-    ROLE_CHOICES = [
-        ('admin', 'Admin'),
-        ('manager', 'Manager'),
-        ('employee', 'Employee'),
-        ('borrower', 'Borrower'),
-    ]
+    ROLE_CHOICES = ROLES
     
     email = models.EmailField(unique=True)
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES, default='borrower')
@@ -34,6 +42,20 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination order, see users.pagination
+            models.Index(fields=['created_at', 'id'], name='customuser_created_id_idx'),
+            # Role based filtering in the viewsets and admin dashboards
+            models.Index(fields=['user_type', 'role'], name='customuser_type_role_idx'),
+            # Borrower listings only; lenders are a small fraction of users
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(user_type='borrower'),
+                name='customuser_borrower_idx',
+            ),
+        ]
+    
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})" if self.first_name else self.email
     
@@ -45,37 +67,10 @@ class Company(models.Model):
     Enhanced model for lending companies with Philippine business requirements
     """
     # Loan Product Choices
-    LOAN_PRODUCT_CHOICES = [
-        ('personal', 'Personal Loans'),
-        ('business', 'Business Loans'),
-        ('salary', 'Salary Loans'),
-        ('vehicle', 'Vehicle Loans'),
-        ('housing', 'Housing Loans'),
-        ('payday', 'Payday Loans'),
-        ('collateral', 'Collateral Loans'),
-        ('sme', 'SME Loans'),
-    ]
+    LOAN_PRODUCT_CHOICES = LOAN_PRODUCTS
     
     # Philippine Regions
-    REGION_CHOICES = [
-        ('ncr', 'National Capital Region (NCR)'),
-        ('car', 'Cordillera Administrative Region (CAR)'),
-        ('region1', 'Ilocos Region (Region I)'),
-        ('region2', 'Cagayan Valley (Region II)'),
-        ('region3', 'Central Luzon (Region III)'),
-        ('region4a', 'CALABARZON (Region IV-A)'),
-        ('region4b', 'MIMAROPA (Region IV-B)'),
-        ('region5', 'Bicol Region (Region V)'),
-        ('region6', 'Western Visayas (Region VI)'),
-        ('region7', 'Central Visayas (Region VII)'),
-        ('region8', 'Eastern Visayas (Region VIII)'),
-        ('region9', 'Zamboanga Peninsula (Region IX)'),
-        ('region10', 'Northern Mindanao (Region X)'),
-        ('region11', 'Davao Region (Region XI)'),
-        ('region12', 'SOCCSKSARGEN (Region XII)'),
-        ('region13', 'Caraga (Region XIII)'),
-        ('barmm', 'Bangsamoro Autonomous Region in Muslim Mindanao (BARMM)'),
-    ]
+    REGION_CHOICES = REGIONS
     
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='company_profile')
     
@@ -130,59 +125,36 @@ class Company(models.Model):
         db_table = 'Company'
         verbose_name = 'Company'
         verbose_name_plural = 'Companies'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='company_created_id_idx'),
+            # Lender search pages walk one region newest first (see LenderSearchPagination);
+            # loan_products_offered has a PostgreSQL GIN index (migration 0011)
+            models.Index(fields=['business_region', 'created_at', 'id'], name='company_region_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.company_name} ({self.sec_registration_number})"
     
     def get_full_address(self):
-        return f"{self.business_street}, {self.business_barangay}, {self.business_city}, {self.get_business_region_display()}"
+        return format_address(self.business_street, self.business_barangay, self.business_city, self.business_region)
     
     def get_loan_products_display(self):
         """Get display names for loan products"""
-        product_dict = dict(self.LOAN_PRODUCT_CHOICES)
-        return [product_dict.get(product, product) for product in self.loan_products_offered]
+        return loan_products_display(self.loan_products_offered)
 
 class Client(models.Model):
     """
     Model for borrowers/clients with comprehensive personal and financial information
     """
     # Philippine Regions (same as Company model)
-    REGION_CHOICES = [
-        ('ncr', 'National Capital Region (NCR)'),
-        ('car', 'Cordillera Administrative Region (CAR)'),
-        ('region1', 'Ilocos Region (Region I)'),
-        ('region2', 'Cagayan Valley (Region II)'),
-        ('region3', 'Central Luzon (Region III)'),
-        ('region4a', 'CALABARZON (Region IV-A)'),
-        ('region4b', 'MIMAROPA (Region IV-B)'),
-        ('region5', 'Bicol Region (Region V)'),
-        ('region6', 'Western Visayas (Region VI)'),
-        ('region7', 'Central Visayas (Region VII)'),
-        ('region8', 'Eastern Visayas (Region VIII)'),
-        ('region9', 'Zamboanga Peninsula (Region IX)'),
-        ('region10', 'Northern Mindanao (Region X)'),
-        ('region11', 'Davao Region (Region XI)'),
-        ('region12', 'SOCCSKSARGEN (Region XII)'),
-        ('region13', 'Caraga (Region XIII)'),
-        ('barmm', 'Bangsamoro Autonomous Region in Muslim Mindanao (BARMM)'),
-    ]
+    REGION_CHOICES = REGIONS
     
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='client_profile')
     
     # Personal Information
     middle_name = models.CharField(max_length=100, blank=True, null=True)
-    gender = models.CharField(max_length=10, default='' , choices=[
-        ('male', 'Male'),
-        ('female', 'Female'),
-        ('other', 'Other')
-    ])
-    marital_status = models.CharField(max_length=20, blank=True, null=True, choices=[
-        ('single', 'Single'),
-        ('married', 'Married'),
-        ('divorced', 'Divorced'),
-        ('widowed', 'Widowed'),
-        ('separated', 'Separated')
-    ])
+    gender = models.CharField(max_length=10, default='' , choices=GENDERS)
+    marital_status = models.CharField(max_length=20, blank=True, null=True, choices=MARITAL_STATUSES)
     
     # Current Address
     current_street = models.CharField(max_length=255, help_text="Building No., Street Name", default="")
@@ -197,13 +169,7 @@ class Client(models.Model):
     permanent_region = models.CharField(max_length=20, choices=REGION_CHOICES, default='ncr')
     
     # Employment Information
-    employment_status = models.CharField(max_length=20, default='' , choices=[
-        ('employed', 'Employed'),
-        ('self_employed', 'Self-Employed'),
-        ('unemployed', 'Unemployed'),
-        ('retired', 'Retired'),
-        ('student', 'Student')
-    ])
+    employment_status = models.CharField(max_length=20, default='' , choices=EMPLOYMENT_STATUSES)
     company_name = models.CharField(max_length=200, blank=True, null=True)
     job_title = models.CharField(max_length=150, blank=True, null=True)
     monthly_income = models.DecimalField(max_digits=12, decimal_places=2, blank=True, null=True)
@@ -214,22 +180,218 @@ class Client(models.Model):
     bank_account_number = models.CharField(max_length=50, default="")
     bank_account_name = models.CharField(max_length=200, help_text="Account holder name", default="")
     
+    # Name, contact and location words for staff search, see users/client_search.py
+    search_document = models.TextField(default="", editable=False)
+    
+    # Batch credit score (300-850) and a hash of the inputs it was computed from, see users/credit_scoring.py
+    credit_score = models.PositiveSmallIntegerField(blank=True, null=True, editable=False)
+    credit_score_inputs = models.CharField(max_length=16, default="", editable=False)
+    credit_scored_at = models.DateTimeField(blank=True, null=True, editable=False)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    SEARCH_FIELDS = frozenset({'middle_name', 'current_city', 'current_barangay'})
+    # Inputs of the credit score; saving one moves updated_at, which marks the client for re-scoring
+    SCORE_FIELDS = frozenset({'monthly_income', 'employment_status', 'marital_status', 'current_region'})
+    
     class Meta:
         db_table = 'Client'
         verbose_name = 'Client'
         verbose_name_plural = 'Clients'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='client_created_id_idx'),
+            # Dashboard filters; the region-first composite also serves region-only filters
+            models.Index(fields=['current_region', 'employment_status'], name='client_region_employment_idx'),
+            models.Index(fields=['employment_status'], name='client_employment_idx'),
+            models.Index(
+                fields=['current_region', 'monthly_income'],
+                condition=models.Q(employment_status__in=['employed', 'self_employed']),
+                name='client_employed_income_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} ({self.user.email})"
     
     @property
     def full_current_address(self):
-        return f"{self.current_street}, {self.current_barangay}, {self.current_city}, {self.get_current_region_display()}"
+        return format_address(self.current_street, self.current_barangay, self.current_city, self.current_region)
     
     @property
     def full_permanent_address(self):
-        return f"{self.permanent_street}, {self.permanent_barangay}, {self.permanent_city}, {self.get_permanent_region_display()}"
\ No newline at end of file
+        return format_address(self.permanent_street, self.permanent_barangay, self.permanent_city, self.permanent_region)
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.SEARCH_FIELDS.intersection(update_fields):
+            self.search_document = document_for(self)
+            if update_fields is not None:
+                kwargs['update_fields'] = update_fields = {*update_fields, 'search_document'}
+        if update_fields is not None and self.SCORE_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'updated_at'}
+        super().save(*args, **kwargs)
+
+
+class Task(models.Model):
+    """
+    A deferred call queued by the database task queue backend (see users/task_queue.py)
+    """
+    STATUS_CHOICES = TASK_STATUSES
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim due pending tasks in run_after order
+            models.Index(fields=['status', 'run_after'], name='task_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class DashboardCount(models.Model):
+    """
+    One bucket of a dashboard rollup, e.g. clients in one region (see users/dashboards.py)
+    """
+    rollup = models.CharField(max_length=40)
+    bucket = models.CharField(max_length=40)
+    count = models.BigIntegerField(default=0)
+    # Sum of the monthly incomes of the counted clients
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    # Last full rebuild; None until the first one
+    refreshed_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['rollup', 'bucket'], name='dashboard_count_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.rollup}/{self.bucket}: {self.count}"
+
+
+class LoanApplication(models.Model):
+    """
+    A borrower's request for a loan from one lending company
+    """
+    STATUS_CHOICES = LOAN_APPLICATION_STATUSES
+
+    # Both foreign keys lead a composite index below, so they skip their own index
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='loan_applications', db_index=False)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='loan_applications', db_index=False)
+    product = models.CharField(max_length=20, choices=LOAN_PRODUCTS)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    term_months = models.PositiveSmallIntegerField()
+    method = models.CharField(max_length=20, choices=AMORTIZATION_METHODS, default='equal')
+    purpose = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    decided_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # A lender's queue of applications by status, newest first
+            models.Index(fields=['company', 'status', 'created_at'], name='loanapp_company_status_idx'),
+            models.Index(fields=['client', 'created_at'], name='loanapp_client_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Application {self.pk} ({self.status})"
+
+
+class Loan(models.Model):
+    """
+    The loan released for an approved application. The balance and payment totals are
+    running aggregates applied with each payment (see users/ledger.py), never sums of the ledger
+    """
+    STATUS_CHOICES = LOAN_STATUSES
+
+    application = models.OneToOneField(LoanApplication, on_delete=models.PROTECT, related_name='loan')
+    client = models.ForeignKey(Client, on_delete=models.PROTECT, related_name='loans', db_index=False)
+    company = models.ForeignKey(Company, on_delete=models.PROTECT, related_name='loans', db_index=False)
+
+    # Terms, fixed at release
+    principal = models.DecimalField(max_digits=12, decimal_places=2)
+    monthly_rate = models.DecimalField(max_digits=5, decimal_places=2, help_text="Monthly interest rate (%)")
+    method = models.CharField(max_length=20, choices=AMORTIZATION_METHODS, default='equal')
+    term_months = models.PositiveSmallIntegerField()
+    processing_fee = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    installment = models.DecimalField(max_digits=12, decimal_places=2)
+    total_payable = models.DecimalField(max_digits=12, decimal_places=2)
+    released_at = models.DateTimeField(default=timezone.now)
+    maturity_date = models.DateField()
+
+    # Running aggregates
+    outstanding_balance = models.DecimalField(max_digits=12, decimal_places=2)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    payments_count = models.PositiveIntegerField(default=0)
+    last_payment_at = models.DateTimeField(blank=True, null=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'status'], name='loan_client_status_idx'),
+            models.Index(fields=['company', 'status', 'released_at'], name='loan_company_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Loan {self.pk} ({self.status})"
+
+
+class PaymentQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise TypeError('Payments are append-only; record a reversal instead')
+
+    def delete(self):
+        raise TypeError('Payments are append-only; record a reversal instead')
+
+
+class Payment(models.Model):
+    """
+    One entry in the append-only payment ledger: rows are never updated or deleted,
+    a reversal is a new row with the negative amount. On PostgreSQL the table is
+    partitioned by month of paid_at (migration 0014, users/ledger.py)
+    """
+    CHANNEL_CHOICES = PAYMENT_CHANNELS
+
+    loan = models.ForeignKey(Loan, on_delete=models.PROTECT, related_name='payments', db_index=False)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    paid_at = models.DateTimeField(default=timezone.now)
+    channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default='bank_transfer')
+    reference = models.CharField(max_length=100, blank=True, default='', help_text="Receipt or transaction number")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PaymentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # A loan's history, and duplicate reference checks within a paid_at window
+            models.Index(fields=['loan', 'paid_at'], name='payment_loan_paid_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payment {self.pk} of {self.amount} on loan {self.loan_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError('Payments are append-only; record a reversal instead')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('Payments are append-only; record a reversal instead')
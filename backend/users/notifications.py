@@ -0,0 +1,355 @@
+"""
+Real-time notifications over WebSockets.
+
+Clients connect to ``NOTIFICATIONS['PATH']`` (``/ws/notifications/``) on the
+ASGI application (backend/asgi.py). They pass their JWT access token as
+``?token=`` (browsers cannot set headers on a WebSocket) or in an
+``Authorization: Bearer`` header. The token is checked once, with the same
+SIMPLE_JWT settings and user cache as the API, and the socket is closed with
+code 4401 when it expires. Clients then reconnect with a fresh token.
+
+Server code calls ``notify(user_ids, event)`` (or ``broadcast(event)``),
+usually from a task (users/tasks.py). The event is encoded once and
+published on the broker. Every ASGI process subscribed to it looks the users
+up in its registry of open sockets and queues the text on each of them, so a
+fan-out makes no database queries whatever the number of sockets. Each
+socket has a writer task draining its queue; a client that lets ``QUEUE``
+events pile up is closed with code 4008 rather than buffered without bound.
+
+Brokers, picked by ``NOTIFICATIONS['BROKER']``:
+
+* ``local`` (default) reaches the sockets of the publishing process only:
+  one ASGI worker running the thread or immediate task queue, tests and
+  ``manage.py loadtest_notifications``.
+* ``redis`` publishes on a Redis pub/sub channel that every ASGI worker
+  subscribes to. It is needed with several workers or with the database
+  task queue, whose tasks run in ``run_tasks`` processes. It requires the
+  redis package.
+
+Delivery is best effort: events published while a client is disconnected
+are not replayed, so clients should reload what they show after reconnecting.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import CachedJWTAuthentication
+from .renderers import FastJSONRenderer
+
+logger = logging.getLogger(__name__)
+
+# Close codes (4000-4999 are left to applications)
+UNAUTHORIZED = 4401
+NOT_FOUND = 4404
+TOO_SLOW = 4008
+
+RECONNECT_DELAY = 1
+PONG = '{"type":"pong"}'
+
+authenticator = CachedJWTAuthentication()
+renderer = FastJSONRenderer()
+
+
+def notification_options():
+    options = getattr(settings, 'NOTIFICATIONS', {})
+    return {
+        'BROKER': options.get('BROKER', 'local'),
+        'REDIS_URL': options.get('REDIS_URL', ''),
+        'CHANNEL': options.get('CHANNEL', 'avendro:notifications'),
+        'PATH': options.get('PATH', '/ws/notifications/'),
+        'QUEUE': options.get('QUEUE', 100),
+    }
+
+
+class Connection:
+    """
+    One open socket: events wait in a queue for its writer task, up to `limit` of them
+    """
+    def __init__(self, user_id, limit):
+        self.user_id = user_id
+        self.limit = limit
+        self.queue = asyncio.Queue()
+        self.closing = False
+
+    def deliver(self, text):
+        if self.closing:
+            return
+        if self.queue.qsize() >= self.limit:
+            logger.warning('Closing the notification socket of user %s, %d events behind', self.user_id, self.limit)
+            self.close(TOO_SLOW)
+            return
+        self.queue.put_nowait(text)
+
+    def close(self, code):
+        # Sent after the events already queued
+        if not self.closing:
+            self.closing = True
+            self.queue.put_nowait(code)
+
+    async def write(self, send):
+        while True:
+            item = await self.queue.get()
+            if isinstance(item, int):
+                await send({'type': 'websocket.close', 'code': item})
+                return
+            await send({'type': 'websocket.send', 'text': item})
+
+
+class LocalBroker:
+    """
+    Hands events to the subscribers of this process, on their event loops
+    """
+    def __init__(self, options):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user_ids, text):
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for key, (loop, callback) in subscribers:
+            try:
+                loop.call_soon_threadsafe(callback, user_ids, text)
+            except RuntimeError:
+                # The loop is closed
+                self._unsubscribe(key)
+
+    def subscribe(self, callback):
+        """
+        Call callback(user_ids, text) on the running loop for every event; returns the unsubscribe function
+        """
+        key = object()
+        with self._lock:
+            self._subscribers[key] = (asyncio.get_running_loop(), callback)
+        return lambda: self._unsubscribe(key)
+
+    def _unsubscribe(self, key):
+        with self._lock:
+            self._subscribers.pop(key, None)
+
+
+class RedisBroker:
+    """
+    Publishes events on a Redis pub/sub channel, so every ASGI worker gets them
+    """
+    def __init__(self, options):
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError as e:
+            raise ImproperlyConfigured('The redis notifications broker requires the redis package') from e
+        if not options['REDIS_URL']:
+            raise ImproperlyConfigured("NOTIFICATIONS['REDIS_URL'] is required by the redis broker")
+        self.url = options['REDIS_URL']
+        self.channel = options['CHANNEL']
+        self._redis = redis
+        self._client = redis.Redis.from_url(self.url)
+
+    def publish(self, user_ids, text):
+        self._client.publish(self.channel, json.dumps({'users': user_ids, 'text': text}))
+
+    def subscribe(self, callback):
+        listener = asyncio.get_running_loop().create_task(self._listen(callback))
+        return listener.cancel
+
+    async def _listen(self, callback):
+        while True:
+            client = self._redis.asyncio.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            envelope = json.loads(message['data'])
+                            callback(envelope['users'], envelope['text'])
+            except (self._redis.ConnectionError, OSError) as e:
+                # Events published meanwhile are lost, like those sent to a closed socket
+                logger.warning('Notification channel lost (%s), reconnecting', e)
+                await asyncio.sleep(RECONNECT_DELAY)
+            finally:
+                await client.aclose()
+
+
+BROKERS = {
+    'local': LocalBroker,
+    'redis': RedisBroker,
+}
+
+
+class NotificationHub:
+    """
+    The open sockets of this process by user id, subscribed to the broker while there are any
+    """
+    def __init__(self, broker):
+        self.broker = broker
+        self.users = defaultdict(set)
+        self.count = 0
+        self._unsubscribe = None
+
+    def add(self, connection):
+        if self._unsubscribe is None:
+            self._unsubscribe = self.broker.subscribe(self.dispatch)
+        self.users[connection.user_id].add(connection)
+        self.count += 1
+
+    def remove(self, connection):
+        sockets = self.users.get(connection.user_id)
+        if not sockets or connection not in sockets:
+            return
+        sockets.discard(connection)
+        if not sockets:
+            del self.users[connection.user_id]
+        self.count -= 1
+        if not self.count:
+            unsubscribe, self._unsubscribe = self._unsubscribe, None
+            unsubscribe()
+
+    def dispatch(self, user_ids, text):
+        if user_ids is None:
+            targets = [connection for sockets in self.users.values() for connection in sockets]
+        else:
+            targets = [connection for user_id in user_ids for connection in self.users.get(user_id, ())]
+        for connection in targets:
+            connection.deliver(text)
+
+
+_hubs_lock = threading.Lock()
+_hubs = {}
+
+
+def get_hub():
+    options = notification_options()
+    key = (options['BROKER'], options['REDIS_URL'], options['CHANNEL'])
+    with _hubs_lock:
+        if key not in _hubs:
+            _hubs[key] = NotificationHub(BROKERS[options['BROKER']](options))
+        return _hubs[key]
+
+
+def notify(user_ids, event):
+    """
+    Send event (a JSON-serializable dict) to every open socket of user_ids; None sends it to every socket
+    """
+    text = renderer.render(event).decode()
+    get_hub().broker.publish(None if user_ids is None else sorted(set(user_ids)), text)
+
+
+def notify_user(user_id, event):
+    notify([user_id], event)
+
+
+def broadcast(event):
+    notify(None, event)
+
+
+def raw_token(scope):
+    token = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('token')
+    if token:
+        return token[0].encode()
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            return authenticator.get_raw_token(value)
+    return None
+
+
+async def authenticate(scope):
+    """
+    The (user, validated token) of the socket's access token; raises AuthenticationFailed (InvalidToken included)
+    """
+    token = raw_token(scope)
+    if token is None:
+        raise InvalidToken('No access token')
+    validated_token = authenticator.get_validated_token(token)
+    return await socket_user(validated_token), validated_token
+
+
+# User lookups in flight by user id
+_lookups = {}
+
+
+async def socket_user(validated_token):
+    """
+    aget_user(), shared by the sockets of a user connecting at once: after a deploy every
+    client reconnects, and each of a user's tabs would miss the cache and query the user
+    """
+    user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+    lookup = _lookups.get(user_id)
+    if lookup is None:
+        lookup = asyncio.ensure_future(authenticator.aget_user(validated_token))
+        _lookups[user_id] = lookup
+        lookup.add_done_callback(lambda _: _lookups.pop(user_id, None))
+    # A client leaving mid-lookup must not cancel it for the others
+    return await asyncio.shield(lookup)
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI application for the notification sockets
+    """
+    options = notification_options()
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    if scope['path'] != options['PATH']:
+        await send({'type': 'websocket.close', 'code': NOT_FOUND})
+        return
+    try:
+        user, validated_token = await authenticate(scope)
+    except AuthenticationFailed:
+        # Accepted first, as browsers only see the close code of an open socket
+        await send({'type': 'websocket.accept'})
+        await send({'type': 'websocket.close', 'code': UNAUTHORIZED})
+        return
+
+    await send({'type': 'websocket.accept'})
+    connection = Connection(user.pk, options['QUEUE'])
+    hub = get_hub()
+    hub.add(connection)
+    try:
+        await serve(connection, receive, send, validated_token['exp'] - time.time())
+    finally:
+        hub.remove(connection)
+
+
+async def serve(connection, receive, send, expires_in):
+    """
+    Run the socket's writer and answer pings until the client leaves, the token expires or the writer closes it
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + expires_in
+    writer = asyncio.ensure_future(connection.write(send))
+    try:
+        while True:
+            incoming = asyncio.ensure_future(receive())
+            done, _ = await asyncio.wait(
+                {incoming, writer}, timeout=max(deadline - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED,
+            )
+            if incoming not in done:
+                incoming.cancel()
+                if writer not in done:
+                    connection.close(UNAUTHORIZED)
+                    await writer
+                return
+            message = incoming.result()
+            if message['type'] == 'websocket.disconnect':
+                return
+            if is_ping(message):
+                connection.deliver(PONG)
+    finally:
+        writer.cancel()
+
+
+def is_ping(message):
+    try:
+        return json.loads(message.get('text') or 'null') == {'type': 'ping'}
+    except ValueError:
+        return False
@@ -0,0 +1,115 @@
+"""
+Keyset pagination for the list endpoints.
+
+Pages are addressed by the ``(created_at, id)`` of the row at the page edge
+rather than by an OFFSET, so fetching page 10,000 costs the same index range
+scan as fetching page one.
+"""
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a composite, strictly unique key (newest first)
+    """
+    keyset = ('created_at', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        if self.cursor and self.cursor.position is not None:
+            values = self._decode_position(queryset.model, self.cursor.position)
+            queryset = queryset.filter(self._keyset_filter(values, after=reverse))
+
+        # Newest first; a reverse cursor walks back towards newer rows
+        direction = '' if reverse else '-'
+        queryset = queryset.order_by(*(direction + field for field in self.keyset))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        has_cursor = self.cursor is not None and self.cursor.position is not None
+        if reverse:
+            self.has_next, self.has_previous = has_cursor, has_more
+        else:
+            self.has_next, self.has_previous = has_more, has_cursor
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._encode_position(self.page[-1])
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._encode_position(self.page[0])
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _keyset_filter(self, values, after):
+        """
+        Rows strictly past the keyset position, written as
+        ``k1 <= v1 AND (k1 < v1 OR (k2 <= v2 AND (...)))`` so the leading
+        column bounds an index range scan
+        """
+        lookup = 'gt' if after else 'lt'
+        bound = 'gte' if after else 'lte'
+        condition = None
+        for field, value in reversed(list(zip(self.keyset, values))):
+            strict = Q(**{f'{field}__{lookup}': value})
+            if condition is None:
+                condition = strict
+            else:
+                condition = Q(**{f'{field}__{bound}': value}) & (strict | condition)
+        return condition
+
+    def _get_position_value(self, item, field):
+        return item[field] if isinstance(item, dict) else getattr(item, field)
+
+    def _encode_position(self, item):
+        values = []
+        for field in self.keyset:
+            value = self._get_position_value(item, field)
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                value = value.isoformat()
+            values.append(str(value))
+        return json.dumps(values)
+
+    def _decode_position(self, model, position):
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.keyset):
+                raise ValueError(position)
+            return [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.keyset, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class LenderSearchPagination(KeysetCursorPagination):
+    """
+    Newest first within each region, so a region-filtered search walks
+    ``company_region_created_idx`` instead of every company
+    """
+    keyset = ('business_region', 'created_at', 'id')
@@ -0,0 +1,28 @@
+from rest_framework import permissions
+
+from .authentication import MetricsTokenAuthentication
+
+
+class IsAdminRole(permissions.BasePermission):
+    """
+    Allow access only to authenticated users with the admin role
+    """
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role == 'admin')
+
+
+class IsLenderStaff(permissions.BasePermission):
+    """
+    Allow lending company users and admins
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and (user.user_type == 'lending_company' or user.role == 'admin'))
+
+
+class IsMetricsScraper(permissions.BasePermission):
+    """
+    Allow requests authenticated with the METRICS_TOKEN
+    """
+    def has_permission(self, request, view):
+        return isinstance(request.successful_authenticator, MetricsTokenAuthentication)
@@ -0,0 +1,94 @@
+"""
+Pre-rendered payloads for ``GET /api/auth/profile/``.
+
+Each user's profile is rendered to JSON once and kept in the shared cache
+together with its ETag, so a repeat fetch costs one cache read (and a
+matching ``If-None-Match`` gets a 304 with no body). Saving or deleting the
+user, their Company or their Client drops the entry (see users/signals.py).
+Bulk ``QuerySet.update()`` calls bypass the signals, so call
+``profile_cache.invalidate()`` after them. The ``a``-prefixed methods are the
+same operations for async views.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+from .models import CustomUser
+from .renderers import FastJSONRenderer
+from .serializers import UserProfileSerializer
+
+
+class ProfileCache:
+    """
+    Rendered profile JSON and its ETag in the shared cache, keyed by user id
+    """
+    key_prefix = 'profile'
+
+    def __init__(self, options):
+        self.alias = options.get('ALIAS', 'default')
+        self.ttl = options.get('TTL', 300)
+
+    def _key(self, user_id):
+        return f'{self.key_prefix}:{user_id}'
+
+    def get(self, user_id):
+        """
+        Return (etag, body) for user_id, rendering and caching it on a miss
+        """
+        entry = caches[self.alias].get(self._key(user_id))
+        if entry is None:
+            entry = self.render(user_id)
+            caches[self.alias].set(self._key(user_id), entry, self.ttl)
+        return entry
+
+    async def aget(self, user_id):
+        entry = await caches[self.alias].aget(self._key(user_id))
+        if entry is None:
+            entry = await self.arender(user_id)
+            await caches[self.alias].aset(self._key(user_id), entry, self.ttl)
+        return entry
+
+    def render(self, user_id):
+        # Load fresh rows: the authenticated user may be a cached snapshot
+        return self._render(self._queryset().get(pk=user_id))
+
+    async def arender(self, user_id):
+        return self._render(await self._queryset().aget(pk=user_id))
+
+    def _queryset(self):
+        # Both profiles are joined, so serializing needs no further queries
+        return CustomUser.objects.select_related('company_profile', 'client_profile')
+
+    def _render(self, user):
+        body = FastJSONRenderer().render(UserProfileSerializer(user).data)
+        return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body
+
+    def invalidate(self, user_id):
+        caches[self.alias].delete(self._key(user_id))
+
+    def response(self, request):
+        """
+        The profile of request.user as a JSON response, or 304 when the client's copy is current
+        """
+        return self._response(request, *self.get(request.user.pk))
+
+    async def aresponse(self, request):
+        return self._response(request, *await self.aget(request.user.pk))
+
+    def _response(self, request, etag, body):
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        # Browsers must revalidate; shared caches must not keep per-user payloads
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+profile_cache = ProfileCache(getattr(settings, 'PROFILE_CACHE', {}))
@@ -0,0 +1,89 @@
+"""
+Query planning for serializer-backed viewsets.
+
+Serializers declare the relations their representation walks through
+``Meta.select_related`` and any columns read by computed fields through
+``Meta.query_sources``. The plan built from those declarations joins the
+relations up front and prunes every column the serializer never reads, so
+list endpoints run a fixed number of queries whatever the page size.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions
+
+
+class QueryPlan:
+    """
+    Relations to join and columns to load for a serializer
+    """
+    def __init__(self, select_related=(), only=()):
+        self.select_related = tuple(select_related)
+        self.only = tuple(only)
+
+    def apply(self, queryset, prune=True):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if prune and self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _column_for_source(model, source_attrs, select_related):
+    """
+    Resolve a dotted serializer source to an ORM lookup, or None when the
+    source is a method/property that must be covered by ``query_sources``
+    """
+    prefix = []
+    for index, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+
+        lookup = '__'.join(prefix + [attr])
+        is_last = index == len(source_attrs) - 1
+        if field.is_relation and not is_last and lookup in select_related:
+            prefix.append(attr)
+            model = field.related_model
+            continue
+        if field.concrete and is_last:
+            return lookup
+        return None
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_query_plan(serializer_class):
+    """
+    Build (once per serializer class) the query plan declared on its Meta
+    """
+    meta = getattr(serializer_class, 'Meta', None)
+    select_related = tuple(getattr(meta, 'select_related', ()))
+    query_sources = tuple(getattr(meta, 'query_sources', ()))
+    if not select_related and not query_sources:
+        return QueryPlan()
+
+    # Relations traversed by select_related must never be deferred
+    columns = set(select_related) | set(query_sources)
+    for field in serializer_class().fields.values():
+        if field.write_only or not field.source_attrs:
+            continue
+        column = _column_for_source(meta.model, field.source_attrs, select_related)
+        if column:
+            columns.add(column)
+
+    return QueryPlan(select_related=select_related, only=sorted(columns))
+
+
+class QueryPlanMixin:
+    """
+    Apply the serializer's query plan to every queryset the viewset filters.
+
+    Column pruning is limited to safe methods so updates always save a fully
+    loaded instance.
+    """
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        plan = get_query_plan(self.get_serializer_class())
+        return plan.apply(queryset, prune=self.request.method in permissions.SAFE_METHODS)
@@ -0,0 +1,45 @@
+"""
+JSON rendering through orjson, falling back to DRF's stdlib renderer.
+
+Output matches ``rest_framework.renderers.JSONRenderer`` byte for byte for
+the default settings (compact, UTF-8, strict). Anything orjson cannot
+encode natively, including datetimes and Decimals, is handed to DRF's
+``JSONEncoder.default()``. Serializers already turn Decimals into strings,
+so the wire format is unchanged. Indented output (the browsable API, or
+``Accept: application/json; indent=4``) and non-default JSON settings go
+through the stdlib path.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. non-string dict keys, which OPT_NON_STR_KEYS would allow at a cost on every dict
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping of U+2028/U+2029 as the stdlib renderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
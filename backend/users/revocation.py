@@ -0,0 +1,165 @@
+"""
+Refresh token revocation: fast lookups and pruning of the blacklist tables.
+
+Every process keeps a Bloom filter of blacklisted JTIs. A refresh token whose
+JTI is not in the filter is definitely not revoked, so only filter hits (real
+revocations plus ~1% false positives) reach ``token_blacklist_blacklistedtoken``.
+Blacklisting a token bumps a generation counter in the shared cache once the
+transaction commits; a process that sees a new generation pulls the rows added
+since its last sync before answering, so revocations are honored across workers
+immediately.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+from .tasks import outstand_refresh_token
+
+GENERATION_KEY = 'token-revocations:generation'
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def _new_generation():
+    # Never reuse a number a process may already have synced to
+    return time.time_ns()
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings using double hashing
+    """
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationFilter:
+    """
+    Per-process Bloom filter of blacklisted JTIs kept in sync through the shared cache
+    """
+    def __init__(self, capacity=100_000, error_rate=0.01, alias='default'):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self, capacity=None):
+        self.bloom = BloomFilter(capacity or self.capacity, self.error_rate)
+        self.generation = None
+        self.synced_at = None
+
+    def might_be_revoked(self, jti):
+        """
+        False means the JTI is certainly not blacklisted
+        """
+        generation = caches[self.alias].get(GENERATION_KEY)
+        if generation is None:
+            # First process up (or the cache was flushed): start a generation
+            caches[self.alias].add(GENERATION_KEY, _new_generation())
+            generation = caches[self.alias].get(GENERATION_KEY)
+        if generation != self.generation:
+            self.sync(generation)
+        return jti in self.bloom
+
+    def sync(self, generation=None):
+        """
+        Add tokens blacklisted since the last sync, rebuilding when the filter is full
+        """
+        with self._lock:
+            started = timezone.now()
+            if self.bloom.count >= self.bloom.capacity:
+                # Room for as many again, or a blacklist past capacity would be reread on every sync
+                live = BlacklistedToken.objects.filter(token__expires_at__gt=started).count()
+                self._reset(max(self.capacity, 2 * live))
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+            if self.synced_at is not None:
+                # Overlap the previous sync so rows from slow transactions are not missed
+                rows = rows.filter(blacklisted_at__gte=self.synced_at - SYNC_OVERLAP)
+            for jti in rows.values_list('token__jti', flat=True).iterator(chunk_size=2000):
+                self.bloom.add(jti)
+            self.synced_at = started
+            self.generation = generation
+
+    def bump_generation(self):
+        """
+        Tell every process to sync before its next check
+        """
+        cache = caches[self.alias]
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, _new_generation())
+
+
+revocation_filter = RevocationFilter(**getattr(settings, 'TOKEN_REVOCATION_FILTER', {}))
+
+
+class FastRevocationRefreshToken(RefreshToken):
+    """
+    RefreshToken that checks the revocation filter before the blacklist table
+    """
+    def check_blacklist(self):
+        if revocation_filter.might_be_revoked(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class DeferredRefreshToken(FastRevocationRefreshToken):
+    """
+    RefreshToken whose OutstandingToken row is written by the task queue after the request
+    """
+    @classmethod
+    def for_user(cls, user):
+        # Token.for_user, skipping BlacklistMixin's OutstandingToken insert; blacklisting the
+        # token before the task has run still works, blacklist() creates the row if it is missing
+        token = Token.for_user.__func__(cls, user)
+        outstand_refresh_token.defer(str(token))
+        return token
+
+
+def prune_expired_tokens(batch_size=1000, pause=0, now=None):
+    """
+    Delete expired outstanding tokens (and their blacklist rows) in bounded batches.
+    Returns the number of outstanding tokens removed.
+    """
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        batch = list(
+            OutstandingToken.objects
+            .filter(expires_at__lte=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        OutstandingToken.objects.filter(id__in=batch).delete()
+        deleted += len(batch)
+        if pause:
+            time.sleep(pause)
@@ -1,33 +1,79 @@
+from decimal import Decimal
+from functools import lru_cache
+
 from rest_framework import serializers
-from django.contrib.auth import authenticate
+from django.contrib.auth import aauthenticate, authenticate
+from django.db import IntegrityError, connection, transaction
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
 from django.contrib.auth.password_validation import validate_password
-from .models import CustomUser, Company, Client
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from .choices import AMORTIZATION_METHODS, EMPLOYMENT_STATUSES, GENDERS, LOAN_PRODUCTS, MARITAL_STATUSES, REGIONS
+from .client_search import DEFAULT_LIMIT, MAX_LIMIT
+from .instrumentation import MeasuredSerializerMixin
+from .loan_quotes import MAX_TERM
+from .models import CustomUser, Company, Client, format_address, loan_products_display
+
+
+class ChoiceDisplayField(serializers.Field):
+    """
+    Read-only display label of a choice code, looked up in the registry's
+    precomputed map (see users/choices.py)
+    """
+    def __init__(self, choices, **kwargs):
+        self.labels = choices.labels
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
 
+    def to_representation(self, value):
+        return self.labels.get(value, value)
 
 
-# At the top of the file, add:
-REGION_CHOICES = [
-    ('ncr', 'National Capital Region (NCR)'),
-    ('car', 'Cordillera Administrative Region (CAR)'),
-    ('region1', 'Ilocos Region (Region I)'),
-    ('region2', 'Cagayan Valley (Region II)'),
-    ('region3', 'Central Luzon (Region III)'),
-    ('region4a', 'CALABARZON (Region IV-A)'),
-    ('region4b', 'MIMAROPA (Region IV-B)'),
-    ('region5', 'Bicol Region (Region V)'),
-    ('region6', 'Western Visayas (Region VI)'),
-    ('region7', 'Central Visayas (Region VII)'),
-    ('region8', 'Eastern Visayas (Region VIII)'),
-    ('region9', 'Zamboanga Peninsula (Region IX)'),
-    ('region10', 'Northern Mindanao (Region X)'),
-    ('region11', 'Davao Region (Region XI)'),
-    ('region12', 'SOCCSKSARGEN (Region XII)'),
-    ('region13', 'Caraga (Region XIII)'),
-    ('barmm', 'Bangsamoro Autonomous Region in Muslim Mindanao (BARMM)'),
-]
+@lru_cache(maxsize=None)
+def unique_columns(models):
+    """
+    {constraint name or (table, column): field name} for the single-column unique
+    constraints of models, with the names read from the database
+    """
+    names = {}
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if field.unique and not field.primary_key:
+                names[model._meta.db_table, field.column] = field.name
+    if connection.vendor != 'postgresql':
+        # Only psycopg reports the violated constraint's name
+        return names
+    with connection.cursor() as cursor:
+        for model in models:
+            table = model._meta.db_table
+            fields = {field.column: field.name for field in model._meta.concrete_fields}
+            for name, constraint in connection.introspection.get_constraints(cursor, table).items():
+                columns = constraint['columns']
+                if constraint['unique'] and not constraint['primary_key'] and len(columns) == 1 and columns[0] in fields:
+                    names[name] = fields[columns[0]]
+    return names
 
 
-class BorrowerRegistrationSerializer(serializers.ModelSerializer):
+def unique_violation_errors(exc, messages, models):
+    """
+    Map a unique constraint IntegrityError on one of models to field errors, re-raising anything else
+    """
+    names = unique_columns(tuple(models))
+    # psycopg exposes the violated constraint; SQLite only names "table.column" in the message
+    constraint = getattr(getattr(exc.__cause__, 'diag', None), 'constraint_name', None)
+    if constraint:
+        fields = [names.get(constraint)]
+    else:
+        failed = str(exc).partition('UNIQUE constraint failed: ')[2]
+        fields = [names.get(tuple(column.split('.', 1))) for column in failed.split(', ') if '.' in column]
+    for field in fields:
+        if field in messages:
+            return {field: [messages[field]]}
+    raise exc
+
+
+class BorrowerRegistrationSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for comprehensive borrower registration
     """
@@ -36,19 +82,9 @@ class BorrowerRegistrationSerializer(serializers.ModelSerializer):
     
     # Client profile fields
     middle_name = serializers.CharField(max_length=100, required=False, allow_blank=True)
-    gender = serializers.ChoiceField(choices=[
-        ('male', 'Male'),
-        ('female', 'Female'),
-        ('other', 'Other')
-    ])
+    gender = serializers.ChoiceField(choices=GENDERS)
     marital_status = serializers.ChoiceField(
-        choices=[
-            ('single', 'Single'),
-            ('married', 'Married'),
-            ('divorced', 'Divorced'),
-            ('widowed', 'Widowed'),
-            ('separated', 'Separated')
-        ],
+        choices=MARITAL_STATUSES,
         required=False,
         allow_blank=True
     )
@@ -57,23 +93,17 @@ class BorrowerRegistrationSerializer(serializers.ModelSerializer):
     current_street = serializers.CharField(max_length=255)
     current_barangay = serializers.CharField(max_length=100)
     current_city = serializers.CharField(max_length=100)
-    current_region = serializers.ChoiceField(choices=REGION_CHOICES)
+    current_region = serializers.ChoiceField(choices=REGIONS)
 
     
     # Permanent Address
     permanent_street = serializers.CharField(max_length=255)
     permanent_barangay = serializers.CharField(max_length=100)
     permanent_city = serializers.CharField(max_length=100)
-    permanent_region = serializers.ChoiceField(choices=REGION_CHOICES)
+    permanent_region = serializers.ChoiceField(choices=REGIONS)
     
     # Employment Information
-    employment_status = serializers.ChoiceField(choices=[
-        ('employed', 'Employed'),
-        ('self_employed', 'Self-Employed'),
-        ('unemployed', 'Unemployed'),
-        ('retired', 'Retired'),
-        ('student', 'Student')
-    ])
+    employment_status = serializers.ChoiceField(choices=EMPLOYMENT_STATUSES)
     company_name = serializers.CharField(max_length=200, required=False, allow_blank=True)
     job_title = serializers.CharField(max_length=150, required=False, allow_blank=True)
     monthly_income = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, allow_null=True)
@@ -136,7 +166,11 @@ class BorrowerRegistrationSerializer(serializers.ModelSerializer):
         
         return attrs
     
-    def create(self, validated_data):
+    @staticmethod
+    def split_validated_data(validated_data):
+        """
+        Split validated data into CustomUser and Client keyword arguments
+        """
         # Separate user fields from client profile fields
         client_fields = [
             'middle_name', 'gender', 'marital_status',
@@ -165,19 +199,55 @@ class BorrowerRegistrationSerializer(serializers.ModelSerializer):
             client_data['source_of_income'] = None
         
         # Remove password confirmation and set user type
-        validated_data.pop('password_confirm')
+        validated_data.pop('password_confirm', None)
         validated_data['user_type'] = 'borrower'
         validated_data['role'] = 'borrower'
         
-        # Create user
-        user = CustomUser.objects.create_user(**validated_data)
+        return validated_data, client_data
+    
+    def create(self, validated_data):
+        validated_data, client_data = self.split_validated_data(validated_data)
         
-        # Create Client profile with the extracted data
-        Client.objects.create(user=user, **client_data)
+        # One transaction: a single commit, and no user without a Client profile
+        with transaction.atomic():
+            # Create user
+            user = CustomUser.objects.create_user(**validated_data)
+            
+            # Create Client profile with the extracted data
+            Client.objects.create(user=user, **client_data)
         
         return user
 
-class LendingCompanyRegistrationSerializer(serializers.ModelSerializer):
+class BorrowerImportSerializer(BorrowerRegistrationSerializer):
+    """
+    Row validation for bulk borrower imports.
+
+    Uniqueness of email and username is checked once per batch by the importer
+    instead of with two queries per row. With ``context={'invite': True}`` rows
+    carry no password and the borrower sets one from their invitation
+    (AcceptInvitationSerializer, ``POST /api/auth/accept_invitation/``).
+    """
+    class Meta(BorrowerRegistrationSerializer.Meta):
+        extra_kwargs = {
+            'email': {'validators': []},
+            'username': {'validators': [UnicodeUsernameValidator()]},
+        }
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('invite'):
+            del fields['password'], fields['password_confirm']
+        return fields
+    
+    def validate(self, attrs):
+        if not self.context.get('invite'):
+            return super().validate(attrs)
+        
+        attrs = super().validate({**attrs, 'password': None, 'password_confirm': None})
+        del attrs['password'], attrs['password_confirm']
+        return attrs
+
+class LendingCompanyRegistrationSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Enhanced serializer for lending company registration with Philippine requirements
     """
@@ -191,7 +261,7 @@ class LendingCompanyRegistrationSerializer(serializers.ModelSerializer):
     business_street = serializers.CharField(max_length=255)
     business_barangay = serializers.CharField(max_length=100)
     business_city = serializers.CharField(max_length=100)
-    business_region = serializers.ChoiceField(choices=Company.REGION_CHOICES)
+    business_region = serializers.ChoiceField(choices=REGIONS)
     
     # Contact Information
     contact_person_name = serializers.CharField(max_length=200)
@@ -209,7 +279,7 @@ class LendingCompanyRegistrationSerializer(serializers.ModelSerializer):
     
     # Business Operations
     loan_products_offered = serializers.ListField(
-        child=serializers.ChoiceField(choices=Company.LOAN_PRODUCT_CHOICES),
+        child=serializers.ChoiceField(choices=LOAN_PRODUCTS),
         allow_empty=False
     )
     minimum_interest_rate = serializers.DecimalField(max_digits=5, decimal_places=2)
@@ -246,6 +316,20 @@ class LendingCompanyRegistrationSerializer(serializers.ModelSerializer):
             'loan_term_maximum_months', 'bank_name', 'bank_account_number', 
             'bank_account_name', 'bank_branch'
         )
+        # Checked by the unique constraints on insert instead of a query each
+        extra_kwargs = {
+            'email': {'validators': []},
+            'username': {'validators': [UnicodeUsernameValidator()]},
+        }
+    
+    # Unique columns checked by the database, with the error reported for each
+    unique_error_messages = {
+        'email': 'user with this email already exists.',
+        'username': 'user with this username already exists.',
+        'sec_registration_number': 'This SEC registration number already exists.',
+        'company_tin': 'This TIN already exists.',
+        'company_name': 'This company name already exists.',
+    }
     
     def validate(self, attrs):
         if attrs['password'] != attrs['password_confirm']:
@@ -269,16 +353,6 @@ class LendingCompanyRegistrationSerializer(serializers.ModelSerializer):
         
         return attrs
     
-    def validate_sec_registration_number(self, value):
-        if Company.objects.filter(sec_registration_number=value).exists():
-            raise serializers.ValidationError("This SEC registration number already exists.")
-        return value
-    
-    def validate_company_tin(self, value):
-        if Company.objects.filter(company_tin=value).exists():
-            raise serializers.ValidationError("This TIN already exists.")
-        return value
-    
     def create(self, validated_data):
         # Extract company data
         company_fields = [
@@ -302,14 +376,19 @@ class LendingCompanyRegistrationSerializer(serializers.ModelSerializer):
         validated_data['user_type'] = 'lending_company'
         validated_data['role'] = 'admin'
         
-        user = CustomUser.objects.create_user(**validated_data)
-        
-        # Create Company profile
-        Company.objects.create(user=user, **company_data)
+        # Uniqueness is enforced by the database constraints inside one transaction
+        try:
+            with transaction.atomic():
+                user = CustomUser.objects.create_user(**validated_data)
+                
+                # Create Company profile
+                Company.objects.create(user=user, **company_data)
+        except IntegrityError as exc:
+            raise serializers.ValidationError(unique_violation_errors(exc, self.unique_error_messages, (CustomUser, Company)))
         
         return user
 
-class LoginSerializer(serializers.Serializer):
+class LoginSerializer(MeasuredSerializerMixin, serializers.Serializer):
     """
     Serializer for user login (both borrowers and lending companies)
     """
@@ -322,17 +401,70 @@ class LoginSerializer(serializers.Serializer):
         
         if email and password:
             user = authenticate(username=email, password=password)
-            if not user:
-                raise serializers.ValidationError('Invalid email or password.')
-            if not user.is_active:
-                raise serializers.ValidationError('User account is disabled.')
-            
-            attrs['user'] = user
+            attrs['user'] = self.check_user(user)
             return attrs
         else:
             raise serializers.ValidationError('Must include email and password.')
 
-class UserProfileSerializer(serializers.ModelSerializer):
+    @staticmethod
+    def check_user(user):
+        if not user:
+            raise serializers.ValidationError('Invalid email or password.')
+        if not user.is_active:
+            raise serializers.ValidationError('User account is disabled.')
+        return user
+
+class AsyncLoginSerializer(LoginSerializer):
+    """
+    LoginSerializer for async views: await ais_valid() instead of calling is_valid()
+    """
+    def validate(self, attrs):
+        # The credentials are checked in ais_valid() through the async backend API
+        return attrs
+
+    async def ais_valid(self):
+        if not self.is_valid():
+            return False
+        data = self.validated_data
+        try:
+            user = await aauthenticate(username=data['email'], password=data['password'])
+            data['user'] = self.check_user(user)
+        except serializers.ValidationError as exc:
+            self._validated_data = {}
+            self._errors = serializers.as_serializer_error(exc)
+            return False
+        return True
+
+class AcceptInvitationSerializer(MeasuredSerializerMixin, serializers.Serializer):
+    """
+    An invited borrower's first password, with the uid and token from their
+    invitation (see BorrowerImporter); the token stops working once it is set
+    """
+    uid = serializers.CharField()
+    token = serializers.CharField()
+    password = serializers.CharField(write_only=True, validators=[validate_password])
+    password_confirm = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        try:
+            user = CustomUser.objects.get(pk=force_str(urlsafe_base64_decode(attrs['uid'])))
+        except (ValueError, OverflowError, CustomUser.DoesNotExist):
+            user = None
+        # Tokens hash the password, so accounts that already set one fail here too
+        if user is None or user.has_usable_password() or not default_token_generator.check_token(user, attrs['token']):
+            raise serializers.ValidationError('Invalid or expired invitation.')
+        if attrs['password'] != attrs['password_confirm']:
+            raise serializers.ValidationError("Passwords don't match.")
+        attrs['user'] = user
+        return attrs
+
+    def save(self):
+        user = self.validated_data['user']
+        user.set_password(self.validated_data['password'])
+        user.save(update_fields=['password'])
+        return user
+
+class UserProfileSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for user profile (read-only for sensitive info)
     """
@@ -349,6 +481,8 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'is_verified', 'created_at', 'company_profile', 'client_profile'
         )
         read_only_fields = ('id', 'email', 'user_type', 'created_at')
+        # Nested profiles are rendered from the joined rows, see query_planning
+        select_related = ('company_profile', 'client_profile')
     
     def get_company_profile(self, obj):
         if obj.user_type == 'lending_company' and hasattr(obj, 'company_profile'):
@@ -360,7 +494,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             return ClientSerializer(obj.client_profile).data
         return None
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Company model
     """
@@ -371,8 +505,74 @@ class CompanySerializer(serializers.ModelSerializer):
         model = Company
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at', 'full_address', 'loan_products_display')
+        # Computed fields rebuilt from row columns by the fast list path, see fast_serialization
+        fast_fields = {
+            'full_address': (format_address, (
+                'business_street', 'business_barangay', 'business_city', 'business_region',
+            )),
+            'loan_products_display': (loan_products_display, ('loan_products_offered',)),
+        }
+
+class LenderSearchResultSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """
+    A lender as borrowers see it in search results: terms and products, no
+    registration numbers, bank details or contacts
+    """
+    loan_products_display = serializers.CharField(source='get_loan_products_display', read_only=True)
+
+    class Meta:
+        model = Company
+        fields = (
+            'id', 'company_name', 'business_region', 'minimum_interest_rate', 'maximum_interest_rate',
+            'minimum_loan_amount', 'maximum_loan_amount', 'loan_term_minimum_months',
+            'loan_term_maximum_months', 'loan_products_offered', 'loan_products_display', 'processing_fee',
+        )
+        read_only_fields = fields
+
+class LenderSearchSerializer(MeasuredSerializerMixin, serializers.Serializer):
+    """
+    Query parameters for matching lenders to a borrower's loan request
+    """
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False)
+    term = serializers.IntegerField(min_value=1, required=False, help_text="Loan term in months")
+    product = serializers.ChoiceField(choices=LOAN_PRODUCTS, required=False)
+    region = serializers.ChoiceField(choices=REGIONS, required=False)
+    rate = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False,
+        help_text="Highest acceptable interest rate (%)"
+    )
+
+class ClientSearchSerializer(MeasuredSerializerMixin, serializers.Serializer):
+    """
+    Query parameters for staff searches of clients
+    """
+    q = serializers.CharField(max_length=200, help_text="Name, email, phone, city or barangay")
+    limit = serializers.IntegerField(min_value=1, max_value=MAX_LIMIT, default=DEFAULT_LIMIT)
 
-class ClientSerializer(serializers.ModelSerializer):
+class LoanQuoteSerializer(MeasuredSerializerMixin, serializers.Serializer):
+    """
+    Body of a quote request: every amount and term, from every matching lender
+    """
+    amounts = serializers.ListField(
+        child=serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01')),
+        min_length=1, max_length=100,
+    )
+    terms = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=MAX_TERM), min_length=1, max_length=60,
+        help_text="Loan terms in months",
+    )
+    method = serializers.ChoiceField(choices=AMORTIZATION_METHODS, default='equal')
+    product = serializers.ChoiceField(choices=LOAN_PRODUCTS, required=False)
+    region = serializers.ChoiceField(choices=REGIONS, required=False)
+    companies = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=1000)
+    include_schedule = serializers.BooleanField(default=False)
+
+def client_full_name(first_name, middle_name, last_name, username):
+    if middle_name:
+        return f"{first_name} {middle_name} {last_name}".strip()
+    return f"{first_name} {last_name}".strip() or username
+
+class ClientSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Client model with full user information
     """
@@ -389,11 +589,11 @@ class ClientSerializer(serializers.ModelSerializer):
     full_permanent_address = serializers.ReadOnlyField()
     
     # Choice field display names
-    gender_display = serializers.CharField(source='get_gender_display', read_only=True)
-    marital_status_display = serializers.CharField(source='get_marital_status_display', read_only=True)
-    employment_status_display = serializers.CharField(source='get_employment_status_display', read_only=True)
-    current_region_display = serializers.CharField(source='get_current_region_display', read_only=True)
-    permanent_region_display = serializers.CharField(source='get_permanent_region_display', read_only=True)
+    gender_display = ChoiceDisplayField(GENDERS, source='gender')
+    marital_status_display = ChoiceDisplayField(MARITAL_STATUSES, source='marital_status')
+    employment_status_display = ChoiceDisplayField(EMPLOYMENT_STATUSES, source='employment_status')
+    current_region_display = ChoiceDisplayField(REGIONS, source='current_region')
+    permanent_region_display = ChoiceDisplayField(REGIONS, source='permanent_region')
     
     class Meta:
         model = Client
@@ -418,12 +618,26 @@ class ClientSerializer(serializers.ModelSerializer):
             # Bank Information
             'bank_name', 'bank_account_number', 'bank_account_name',
             
+            # Batch credit assessment
+            'credit_score', 'credit_scored_at',
+            
             # Timestamps
             'created_at', 'updated_at'
         ]
         read_only_fields = ('id', 'created_at', 'updated_at')
+        select_related = ('user',)
+        # get_full_name() falls back to the username
+        query_sources = ('user__username',)
+        fast_fields = {
+            'full_name': (client_full_name, ('user__first_name', 'middle_name', 'user__last_name', 'user__username')),
+            'full_current_address': (format_address, (
+                'current_street', 'current_barangay', 'current_city', 'current_region',
+            )),
+            'full_permanent_address': (format_address, (
+                'permanent_street', 'permanent_barangay', 'permanent_city', 'permanent_region',
+            )),
+        }
     
     def get_full_name(self, obj):
-        if obj.middle_name:
-            return f"{obj.user.first_name} {obj.middle_name} {obj.user.last_name}".strip()
-        return obj.user.get_full_name()
\ No newline at end of file
+        user = obj.user
+        return client_full_name(user.first_name, obj.middle_name, user.last_name, user.username)
\ No newline at end of file
@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .authentication import user_cache
+from .client_search import document_for
+from .dashboards import record_changes, saved_row, stored_row
+from .db_metrics import record_connection
+from .instrumentation import install_query_recorder
+from .models import CustomUser, Company, Client, LoanApplication, Payment
+from .profile_cache import profile_cache
+from .revocation import revocation_filter
+from .tasks import notify_application, notify_payment
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    user_cache.invalidate(user_id)
+    # As for profiles: a request may have cached the old role or is_active before the commit
+    transaction.on_commit(lambda: user_cache.invalidate(user_id))
+    invalidate_profile(user_id)
+
+
+# CustomUser fields that are part of Client.search_document
+USER_SEARCH_FIELDS = frozenset({'first_name', 'last_name', 'email', 'phone_number'})
+
+
+@receiver(post_save, sender=CustomUser)
+def refresh_client_search_document(sender, instance, created, update_fields=None, **kwargs):
+    # A new user has no Client yet; logins only save last_login
+    if created or instance.user_type != 'borrower':
+        return
+    if update_fields is not None and not USER_SEARCH_FIELDS.intersection(update_fields):
+        return
+    client = Client.objects.filter(user=instance).only('middle_name', 'current_city', 'current_barangay').first()
+    if client is not None:
+        Client.objects.filter(pk=client.pk).update(search_document=document_for(client, instance))
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
+
+
+def invalidate_profile(user_id):
+    profile_cache.invalidate(user_id)
+    # A request that read the old rows before the commit may have cached them again
+    transaction.on_commit(lambda: profile_cache.invalidate(user_id))
+
+
+@receiver(pre_save, sender=Company)
+@receiver(pre_save, sender=Client)
+def read_dashboard_row(sender, instance, update_fields=None, **kwargs):
+    # The buckets the row leaves, read before the save overwrites them
+    instance._dashboard_row = stored_row(instance, update_fields)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=Client)
+def count_saved_row(sender, instance, created, update_fields=None, **kwargs):
+    stored = instance.__dict__.pop('_dashboard_row', None)
+    if created:
+        record_changes(sender, added=[saved_row(instance)])
+    elif stored is not None:
+        record_changes(sender, [stored], [saved_row(instance, stored, update_fields)])
+
+
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=Client)
+def uncount_deleted_row(sender, instance, **kwargs):
+    record_changes(sender, removed=[saved_row(instance)])
+
+
+@receiver(pre_save, sender=LoanApplication)
+def read_application_status(sender, instance, update_fields=None, **kwargs):
+    # Compared after the save, so only status changes are announced
+    instance._stored_status = None
+    if not instance._state.adding and (update_fields is None or 'status' in update_fields):
+        instance._stored_status = LoanApplication.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=LoanApplication)
+def announce_application(sender, instance, created, **kwargs):
+    stored = instance.__dict__.pop('_stored_status', None)
+    if created or (stored is not None and stored != instance.status):
+        notify_application.defer(instance.pk)
+
+
+@receiver(post_save, sender=Payment)
+def announce_payment(sender, instance, created, **kwargs):
+    # The lookup and the fan-out run in the task, after the commit
+    if created:
+        notify_payment.defer(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def publish_revocation(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(revocation_filter.bump_generation)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    record_connection(connection)
+    install_query_recorder(connection)
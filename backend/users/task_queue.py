@@ -0,0 +1,202 @@
+"""
+A small task queue for follow-up work that should not hold up a response.
+
+Functions decorated with ``@task`` get a ``defer(*args, **kwargs)`` method.
+Arguments must be JSON-serializable (pass ids, not model instances), so a call
+behaves the same with every backend, picked by ``TASK_QUEUE['BACKEND']``:
+
+* ``thread`` (default) runs tasks in a small thread pool inside the web
+  process. Queued tasks die with the process, so use it for work that is safe
+  to lose (notifications, cache warm-up, audit lines). When the queue is full a
+  task runs inline instead of being dropped.
+* ``database`` stores tasks in the ``users_task`` table, inside the caller's
+  transaction, and ``manage.py run_tasks`` workers claim them with
+  ``SELECT ... FOR UPDATE SKIP LOCKED``. Failures are retried with exponential
+  backoff up to ``MAX_ATTEMPTS``, then kept with status ``failed``.
+* ``immediate`` runs tasks inline (tests, debugging).
+
+The thread and immediate backends hand tasks over on commit, so a task never
+reads rows its caller has not committed yet and is dropped with a rolled-back
+transaction. Failing tasks are logged on ``users.task_queue`` and never fail the
+request that queued them.
+"""
+import json
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def queue_options():
+    options = getattr(settings, 'TASK_QUEUE', {})
+    return {
+        'BACKEND': options.get('BACKEND', 'thread'),
+        'WORKERS': options.get('WORKERS', 2),
+        'QUEUE': options.get('QUEUE', 100),
+        'MAX_ATTEMPTS': options.get('MAX_ATTEMPTS', 5),
+        'RETRY_DELAY': options.get('RETRY_DELAY', 30),
+        'STALE_AFTER': options.get('STALE_AFTER', 600),
+    }
+
+
+def task(func):
+    """
+    Register func as a task; func.defer(*args, **kwargs) queues a call to it
+    """
+    name = f'{func.__module__}.{func.__name__}'
+    _registry[name] = func
+    func.task_name = name
+    func.defer = lambda *args, **kwargs: enqueue(name, *args, **kwargs)
+    return func
+
+
+def get_task(name):
+    if name not in _registry:
+        # A fresh worker process registers tasks by importing their module
+        import_module(name.rpartition('.')[0])
+    return _registry[name]
+
+
+def enqueue(name, *args, **kwargs):
+    # Round trip through JSON so every backend sees the same arguments
+    args, kwargs = json.loads(json.dumps([args, kwargs]))
+    get_backend().submit(name, args, kwargs)
+
+
+class ImmediateBackend:
+    def __init__(self, options):
+        pass
+
+    def submit(self, name, args, kwargs):
+        transaction.on_commit(lambda: get_task(name)(*args, **kwargs), robust=True)
+
+
+class ThreadPoolBackend:
+    """
+    Run tasks in WORKERS threads, with up to QUEUE tasks waiting per thread
+    """
+    def __init__(self, options):
+        self.executor = ThreadPoolExecutor(max_workers=options['WORKERS'], thread_name_prefix='task-queue')
+        self.slots = threading.BoundedSemaphore(options['WORKERS'] * options['QUEUE'])
+
+    def submit(self, name, args, kwargs):
+        transaction.on_commit(lambda: self._submit(name, args, kwargs))
+
+    def _submit(self, name, args, kwargs):
+        if not self.slots.acquire(blocking=False):
+            logger.warning('Task queue full, running %s inline', name)
+            try:
+                get_task(name)(*args, **kwargs)
+            except Exception:
+                logger.exception('Task %s failed', name)
+            return
+        self.executor.submit(self._run, name, args, kwargs)
+
+    def _run(self, name, args, kwargs):
+        try:
+            get_task(name)(*args, **kwargs)
+        except Exception:
+            logger.exception('Task %s failed', name)
+        finally:
+            self.slots.release()
+            # Idle task threads should not pin database connections (or pool slots)
+            connections.close_all()
+
+
+class DatabaseBackend:
+    def __init__(self, options):
+        pass
+
+    def submit(self, name, args, kwargs):
+        # Part of the caller's transaction: the task is stored if and only if its data is
+        Task.objects.create(name=name, args=args, kwargs=kwargs)
+
+
+BACKENDS = {
+    'immediate': ImmediateBackend,
+    'thread': ThreadPoolBackend,
+    'database': DatabaseBackend,
+}
+
+_backends_lock = threading.Lock()
+_backends = {}
+
+
+def get_backend():
+    options = queue_options()
+    key = (options['BACKEND'], options['WORKERS'], options['QUEUE'])
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = BACKENDS[options['BACKEND']](options)
+        return _backends[key]
+
+
+def requeue_stale(now=None):
+    """
+    Put back running tasks whose worker died (running longer than STALE_AFTER)
+    """
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=queue_options()['STALE_AFTER'])
+    return Task.objects.filter(status='running', updated_at__lt=stale).update(status='pending', updated_at=now)
+
+
+def claim_tasks(batch_size=100, now=None):
+    """
+    Mark up to batch_size due tasks as running and return them; concurrent workers skip each other's rows
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', run_after__lte=now)
+            .order_by('run_after')[:batch_size]
+        )
+        Task.objects.filter(pk__in=[queued.pk for queued in tasks]).update(
+            status='running', attempts=F('attempts') + 1, updated_at=now,
+        )
+    for queued in tasks:
+        queued.status = 'running'
+        queued.attempts += 1
+    return tasks
+
+
+def record_failure(queued, exc, now=None):
+    options = queue_options()
+    now = now or timezone.now()
+    queued.last_error = ''.join(traceback.format_exception(exc))
+    if queued.attempts >= options['MAX_ATTEMPTS']:
+        queued.status = 'failed'
+    else:
+        queued.status = 'pending'
+        queued.run_after = now + timedelta(seconds=options['RETRY_DELAY'] * 2 ** (queued.attempts - 1))
+    queued.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+
+
+def run_pending(batch_size=100):
+    """
+    Run one batch of due database tasks and return how many ran; finished tasks are deleted
+    """
+    requeue_stale()
+    tasks = claim_tasks(batch_size)
+    for queued in tasks:
+        try:
+            get_task(queued.name)(*queued.args, **queued.kwargs)
+        except Exception as exc:
+            logger.exception('Task %s (%s) failed, attempt %s', queued.name, queued.pk, queued.attempts)
+            record_failure(queued, exc)
+        else:
+            queued.delete()
+    return len(tasks)
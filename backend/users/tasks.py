@@ -0,0 +1,113 @@
+"""
+Follow-up work queued by registration and by loan events (see users/task_queue.py).
+
+Nothing here is needed to answer the request: the response carries the new
+user's tokens and profile, and these tasks run after the commit. Loan
+application and payment notifications are queued by users/signals.py and
+pushed to the users' open sockets (users/notifications.py).
+"""
+import logging
+
+from django.conf import settings
+from django.core.mail import send_mail
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import CustomUser, LoanApplication, Payment
+from .notifications import notify
+from .profile_cache import profile_cache
+from .task_queue import task
+
+audit_logger = logging.getLogger('users.audit')
+
+
+@task
+def outstand_refresh_token(token):
+    """
+    Record a refresh token issued without its OutstandingToken row (see DeferredRefreshToken)
+    """
+    # get_or_create: blacklisting the token first creates the row too
+    RefreshToken(token, verify=False).outstand()
+
+
+@task
+def send_welcome_email(user_id):
+    user = CustomUser.objects.filter(pk=user_id).only('email', 'first_name', 'last_name', 'username', 'user_type').first()
+    if user is None:
+        return
+    if user.user_type == 'lending_company':
+        next_step = 'Our team will review your company registration before you can publish loan offers.'
+    else:
+        next_step = 'You can now compare lenders and apply for a loan.'
+    send_mail(
+        'Welcome to Avendro',
+        f'Hi {user.get_full_name()},\n\nThank you for registering with Avendro. {next_step}\n',
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+    )
+
+
+@task
+def warm_profile_cache(user_id):
+    """
+    Render the profile so the new user's first GET /api/auth/profile/ is a cache hit
+    """
+    if CustomUser.objects.filter(pk=user_id).exists():
+        profile_cache.get(user_id)
+
+
+@task
+def record_audit_event(event, user_id, **details):
+    audit_logger.info('%s user=%s %s', event, user_id, ' '.join(f'{key}={value}' for key, value in sorted(details.items())))
+
+
+def after_registration(user, ip_address=None):
+    send_welcome_email.defer(user.pk)
+    warm_profile_cache.defer(user.pk)
+    record_audit_event.defer('registered', user.pk, user_type=user.user_type, ip=ip_address)
+
+
+# Applications in these statuses concern the borrower, the others the lender
+BORROWER_STATUSES = ('approved', 'rejected')
+
+
+@task
+def notify_application(application_id):
+    """
+    Tell the lender about a new or withdrawn application, and the borrower about a decision
+    """
+    application = LoanApplication.objects.filter(pk=application_id).values(
+        'status', 'product', 'amount', 'term_months', 'client__user_id', 'company__user_id',
+    ).first()
+    if application is None:
+        return
+    recipient = application['client__user_id' if application['status'] in BORROWER_STATUSES else 'company__user_id']
+    notify([recipient], {
+        'type': 'loan_application',
+        'id': application_id,
+        'status': application['status'],
+        'product': application['product'],
+        'amount': str(application['amount']),
+        'term_months': application['term_months'],
+    })
+
+
+@task
+def notify_payment(payment_id):
+    """
+    Tell the borrower and the lender about a payment and the loan's new balance
+    """
+    payment = Payment.objects.filter(pk=payment_id).values(
+        'loan_id', 'amount', 'paid_at', 'loan__outstanding_balance', 'loan__status',
+        'loan__client__user_id', 'loan__company__user_id',
+    ).first()
+    if payment is None:
+        return
+    notify([payment['loan__client__user_id'], payment['loan__company__user_id']], {
+        'type': 'payment',
+        'id': payment_id,
+        'loan': payment['loan_id'],
+        'amount': str(payment['amount']),
+        'paid_at': payment['paid_at'].isoformat(),
+        'outstanding_balance': str(payment['loan__outstanding_balance']),
+        'loan_status': payment['loan__status'],
+    })
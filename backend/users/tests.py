@@ -1,6 +1,119 @@
-from django.test import TestCase
-from .models import CustomUser
-from .serializers import UserSerializer
+import asyncio
+import csv
+import io
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from backend.asgi import application as asgi_application
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .api_benchmark import SCENARIOS, ApiBenchmark, borrower_registration, compare, find_baseline
+from .authentication import user_cache
+from .benchmarking import delete_seeded, seed_borrowers, seed_lenders, seeded_users
+from .bulk_import import BorrowerImporter
+from .choices import LOAN_PRODUCTS, REGIONS
+from .client_search import rebuild_search_documents
+from .credit_scoring import clients_to_score, score_clients
+from .dashboards import compute_rollups, dashboard_data, refresh_dashboards
+from .db_metrics import pool_metrics
+from .instrumentation import registry
+from .ledger import PaymentRejected, create_payment_partitions, open_loan, payment_partitions, record_payment, reverse_payment
+from .loan_quotes import ScheduleBatch
+from .models import CustomUser, Company, Client, DashboardCount, Loan, LoanApplication, Payment, Task
+from .notifications import broadcast, get_hub, notify
+from .parsers import FastJSONParser
+from .profile_cache import profile_cache
+from .renderers import FastJSONRenderer
+from .revocation import BloomFilter, RevocationFilter, prune_expired_tokens, revocation_filter
+from .serializers import ClientSerializer, LendingCompanyRegistrationSerializer
+from .task_queue import run_pending, task
+
+
+# Password hashing makes many test requests "slow": keep the slow request log (and its SQL)
+# out of the test output; RequestMetricsTestCase turns it back on where it is tested
+quiet_request_metrics = override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 10 ** 9, 'SLOW_REQUEST_QUERIES': 10 ** 9})
+
+
+def setUpModule():
+    quiet_request_metrics.enable()
+
+
+def tearDownModule():
+    quiet_request_metrics.disable()
+
+
+def create_borrower(index, **client_fields):
+    user = CustomUser.objects.create(
+        email=f'borrower{index}@example.com',
+        username=f'borrower{index}',
+        first_name='Juan',
+        last_name=f'Dela Cruz {index}',
+        user_type='borrower',
+        role='borrower',
+    )
+    client_fields.setdefault('gender', 'male')
+    client_fields.setdefault('employment_status', 'employed')
+    Client.objects.create(user=user, **client_fields)
+    return user
+
+
+def create_lender(index, **company_fields):
+    user = CustomUser.objects.create(
+        email=f'lender{index}@example.com',
+        username=f'lender{index}',
+        user_type='lending_company',
+        role='admin',
+    )
+    company_fields.setdefault('company_name', f'Lender {index}')
+    company_fields.setdefault('sec_registration_number', f'SEC-{index}')
+    company_fields.setdefault('company_tin', f'TIN-{index}')
+    company_fields.setdefault('loan_products_offered', ['personal'])
+    Company.objects.create(user=user, **company_fields)
+    return user
+
+
+class QueryCountAssertionsMixin:
+    """
+    Helpers for asserting that an endpoint's query count does not grow with its data
+    """
+    def assertConstantQueryCount(self, url, add_rows, sizes=(1, 5, 20)):
+        """
+        Grow the table with add_rows(count) and assert GET url costs the same each time
+        """
+        counts = []
+        total = 0
+        for size in sizes:
+            add_rows(range(total, size))
+            total = size
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f'Query count grew with row count: {dict(zip(sizes, counts))}')
+        return counts[0]
+
 
 class CustomUserTestCase(TestCase):
     def setUp(self):
@@ -14,4 +127,1357 @@ class CustomUserTestCase(TestCase):
     def test_user_creation(self):
         user = CustomUser.objects.create_user(**self.user_data)
         self.assertEqual(user.email, self.user_data['email'])
-        self.assertEqual(user.role, self.user_data['role'])
\ No newline at end of file
+        self.assertEqual(user.role, self.user_data['role'])
+
+
+class ChoicesRegistryTestCase(TestCase):
+    def test_maps_are_precomputed_and_read_only(self):
+        self.assertEqual(REGIONS.labels['region7'], 'Central Visayas (Region VII)')
+        self.assertEqual(REGIONS.codes['Central Visayas (Region VII)'], 'region7')
+        self.assertEqual(REGIONS.label('atlantis'), 'atlantis')
+        self.assertIs(Company.REGION_CHOICES, Client.REGION_CHOICES)
+        with self.assertRaises(TypeError):
+            REGIONS.labels['ncr'] = 'Metro Manila'
+
+    def test_display_fields_match_model_display(self):
+        user = create_borrower(1, marital_status='married', current_region='region7', permanent_region='barmm')
+        client = user.client_profile
+        row = ClientSerializer(client).data
+        for field in ('gender', 'marital_status', 'employment_status', 'current_region', 'permanent_region'):
+            self.assertEqual(row[f'{field}_display'], getattr(client, f'get_{field}_display')())
+        client.marital_status = None
+        self.assertIsNone(ClientSerializer(client).data['marital_status_display'])
+
+    def test_loan_products_display(self):
+        company = create_lender(1, loan_products_offered=['sme', 'unlisted']).company_profile
+        self.assertEqual(company.get_loan_products_display(), [LOAN_PRODUCTS.labels['sme'], 'unlisted'])
+
+
+class QueryPlanTestCase(QueryCountAssertionsMixin, TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(
+            email='admin@example.com', username='admin', role='admin', user_type='lending_company'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_borrowers(self, indexes):
+        for index in indexes:
+            create_borrower(index)
+
+    def add_users(self, indexes):
+        for index in indexes:
+            if index % 2:
+                create_lender(index)
+            else:
+                create_borrower(index)
+
+    def test_client_list_query_count_is_constant(self):
+        self.assertConstantQueryCount('/api/clients/', self.add_borrowers)
+
+    def test_user_list_query_count_is_constant(self):
+        self.assertConstantQueryCount('/api/users/', self.add_users)
+
+    def test_client_list_payload_includes_user_fields(self):
+        create_borrower(1, middle_name='Santos')
+        response = self.client.get('/api/clients/')
+        row = response.json()['results'][0]
+        self.assertEqual(row['email'], 'borrower1@example.com')
+        self.assertEqual(row['full_name'], 'Juan Santos Dela Cruz 1')
+
+    def test_user_list_payload_includes_profiles(self):
+        create_lender(1)
+        create_borrower(2)
+        rows = {row['email']: row for row in self.client.get('/api/users/').json()['results']}
+        self.assertEqual(rows['lender1@example.com']['company_profile']['company_name'], 'Lender 1')
+        self.assertIsNone(rows['lender1@example.com']['client_profile'])
+        self.assertEqual(rows['borrower2@example.com']['client_profile']['email'], 'borrower2@example.com')
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(
+            email='admin@example.com', username='admin', role='admin', user_type='lending_company'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        for index in range(7):
+            create_borrower(index)
+
+    def test_pages_walk_every_row_once_newest_first(self):
+        expected = list(Client.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        seen = []
+        url = '/api/clients/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            seen.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get('/api/clients/?page_size=3').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_deep_page_is_a_single_query(self):
+        url = self.client.get('/api/clients/?page_size=3').json()['next']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        sql = [query['sql'] for query in queries if 'FROM "Client"' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('OFFSET', sql[0])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get('/api/clients/?cursor=cD1nYXJiYWdl')
+        self.assertEqual(response.status_code, 404)
+
+
+class FastListSerializationTestCase(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(
+            email='admin@example.com', username='admin', role='admin', user_type='lending_company'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertSameResponses(self, url):
+        pages = 0
+        while url:
+            with override_settings(FAST_LIST_SERIALIZATION=False):
+                expected = self.client.get(url)
+            with override_settings(FAST_LIST_SERIALIZATION=True):
+                actual = self.client.get(url)
+            self.assertEqual(actual.status_code, 200)
+            self.assertEqual(actual.content, expected.content)
+            url = expected.json()['next']
+            pages += 1
+        return pages
+
+    def test_client_list_is_byte_identical(self):
+        for index in range(5):
+            create_borrower(
+                index,
+                middle_name='Santos' if index % 2 else None,
+                marital_status=None if index % 3 else 'married',
+                current_region='region7',
+                monthly_income='45250.50' if index % 2 else None,
+            )
+        CustomUser.objects.filter(email='borrower1@example.com').update(date_of_birth='1990-02-03', first_name='')
+        self.assertEqual(self.assertSameResponses('/api/clients/?page_size=2'), 3)
+
+    def test_company_list_is_byte_identical(self):
+        for index in range(3):
+            create_lender(
+                index,
+                loan_products_offered=['sme', 'personal'],
+                minimum_interest_rate='1.25',
+                maximum_loan_amount='250000.00' if index else None,
+                loan_term_minimum_months=3,
+            )
+        self.assertEqual(self.assertSameResponses('/api/companies/'), 1)
+
+
+class FastJSONTestCase(TestCase):
+    payload = {
+        'text': 'Señora \u2028 line \u2029 para',
+        'lazy': gettext_lazy('Borrower'),
+        'error': ErrorDetail('This field is required.', code='required'),
+        'created_at': datetime(2025, 3, 4, 5, 6, 7, 891011, tzinfo=dt_timezone.utc),
+        'date_of_birth': date(1990, 2, 3),
+        'rate': Decimal('1.25'),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'nested': [{'a': 1, 'b': None, 'c': [True, False, 1.5]}],
+        3: 'non-string key',
+    }
+
+    def test_renders_like_the_stdlib_renderer(self):
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+        indented = FastJSONRenderer().render(self.payload, 'application/json; indent=2')
+        self.assertEqual(indented, JSONRenderer().render(self.payload, 'application/json; indent=2'))
+
+    def test_parses_like_the_stdlib_parser(self):
+        body = b'{"amount": "1.50", "items": [1, 2.5, null], "big": 123456789012345678901234567890}'
+        self.assertEqual(FastJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body)))
+        for invalid in (b'{"a": ', b'{"a": NaN}'):
+            with self.assertRaises(ParseError):
+                FastJSONParser().parse(io.BytesIO(invalid))
+
+    def test_api_round_trip(self):
+        client = APIClient()
+        response = client.post('/api/auth/register_company/', company_payload(1), format='json')
+        self.assertEqual(response.status_code, 201)
+        client.force_authenticate(CustomUser.objects.get(email='company1@example.com'))
+        row = client.get('/api/companies/').json()['results'][0]
+        self.assertEqual(row['minimum_interest_rate'], '1.50')
+
+
+class StreamingExportTestCase(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create(
+            email='admin@example.com', username='admin', role='admin', user_type='lending_company'
+        )
+        self.borrower = create_borrower(1, monthly_income='25000.00')
+        create_borrower(2)
+        create_lender(3, loan_products_offered=['personal', 'sme'])
+        self.client = APIClient()
+
+    def export(self, user, url):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export_streams_one_row_per_line(self):
+        body = self.export(self.admin, '/api/clients/export/')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['borrower1@example.com', 'borrower2@example.com'])
+        self.assertEqual(rows[0]['monthly_income'], '25000.00')
+
+    def test_export_honors_role_filtering(self):
+        body = self.export(self.borrower, '/api/clients/export/')
+        self.assertEqual(len(body.splitlines()), 1)
+        self.assertEqual(self.export(self.borrower, '/api/companies/export/'), '')
+
+    def test_csv_export_writes_header_and_rows(self):
+        body = self.export(self.admin, '/api/companies/export/?export_format=csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['company_name'], 'Lender 3')
+        self.assertEqual(json.loads(rows[0]['loan_products_offered']), ['personal', 'sme'])
+
+    def test_unknown_format_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/clients/export/?export_format=xml')
+        self.assertEqual(response.status_code, 400)
+
+
+def borrower_row(index, **overrides):
+    row = {
+        'email': f'import{index}@example.com',
+        'username': f'import{index}',
+        'password': 'Sup3r-secret-pass',
+        'password_confirm': 'Sup3r-secret-pass',
+        'first_name': 'Maria',
+        'last_name': f'Clara {index}',
+        'gender': 'female',
+        'current_street': '1 Rizal St',
+        'current_barangay': 'San Roque',
+        'current_city': 'Quezon City',
+        'current_region': 'ncr',
+        'permanent_street': '1 Rizal St',
+        'permanent_barangay': 'San Roque',
+        'permanent_city': 'Quezon City',
+        'permanent_region': 'ncr',
+        'employment_status': 'student',
+        'source_of_income': 'Allowance',
+        'bank_name': 'BDO',
+        'bank_account_number': f'00{index}',
+        'bank_account_name': f'Maria Clara {index}',
+    }
+    row.update(overrides)
+    return row
+
+
+class BorrowerImportTestCase(TestCase):
+    def test_import_creates_users_and_clients_and_reports_bad_rows(self):
+        create_borrower(0, gender='male')
+        CustomUser.objects.filter(username='borrower0').update(email='import0@example.com')
+        rows = [
+            borrower_row(0),
+            borrower_row(1),
+            borrower_row(2, current_region='atlantis'),
+            borrower_row(3),
+            borrower_row(4, email='import1@example.com'),
+        ]
+        report = BorrowerImporter(batch_size=2, workers=1).run(rows)
+
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [1, 3, 5])
+        self.assertIn('current_region', report['errors'][1]['errors'])
+        user = CustomUser.objects.get(email='import1@example.com')
+        self.assertTrue(user.check_password('Sup3r-secret-pass'))
+        self.assertEqual(user.client_profile.source_of_income, 'Allowance')
+        self.assertIsNone(user.client_profile.company_name)
+
+    def test_invite_mode_sets_unusable_passwords_and_returns_tokens(self):
+        row = borrower_row(1)
+        del row['password'], row['password_confirm']
+        report = BorrowerImporter(workers=1, invite=True).run([row])
+
+        user = CustomUser.objects.get(email='import1@example.com')
+        self.assertFalse(user.has_usable_password())
+        invitation = report['invitations'][0]
+        self.assertTrue(default_token_generator.check_token(user, invitation['token']))
+
+        api = APIClient()
+        accept = {'uid': invitation['uid'], 'token': invitation['token'], 'password': 'Invited-pass-123'}
+        response = api.post('/api/auth/accept_invitation/', {**accept, 'password_confirm': 'other'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = api.post('/api/auth/accept_invitation/', {**accept, 'password_confirm': 'Invited-pass-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.json()['tokens'])
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('Invited-pass-123'))
+        # Invitations work once
+        response = api.post('/api/auth/accept_invitation/', {**accept, 'password_confirm': 'Invited-pass-123'}, format='json')
+        self.assertEqual(response.json(), {'non_field_errors': ['Invalid or expired invitation.']})
+
+    def test_process_pool_hashing(self):
+        report = BorrowerImporter(workers=2).run([borrower_row(index) for index in range(3)])
+        self.assertEqual(report['created'], 3)
+        self.assertTrue(CustomUser.objects.get(email='import2@example.com').check_password('Sup3r-secret-pass'))
+
+    def test_bulk_import_endpoint_accepts_csv_upload_from_admins_only(self):
+        admin = CustomUser.objects.create(email='admin@example.com', username='admin', role='admin')
+        rows = [borrower_row(1), borrower_row(2)]
+        upload = io.StringIO()
+        writer = csv.DictWriter(upload, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        api = APIClient()
+
+        api.force_authenticate(create_borrower(9))
+        self.assertEqual(api.post('/api/clients/bulk_import/', rows, format='json').status_code, 403)
+
+        api.force_authenticate(admin)
+        csv_file = SimpleUploadedFile('borrowers.csv', upload.getvalue().encode())
+        response = api.post('/api/clients/bulk_import/?invite=false', {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 2)
+
+        # Larger files are left to manage.py import_borrowers
+        with override_settings(BULK_IMPORT={'MAX_ROWS': 1}):
+            response = api.post('/api/clients/bulk_import/', [borrower_row(3), borrower_row(4)], format='json')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(CustomUser.objects.filter(email='import3@example.com').exists())
+
+    def test_bulk_import_endpoint_rejects_malformed_rows(self):
+        api = APIClient()
+        api.force_authenticate(CustomUser.objects.create(email='admin@example.com', username='admin', role='admin'))
+        uploads = [
+            ('borrowers.json', b'[{"email": '),
+            ('borrowers.json', b'{"email": "import1@example.com"}'),
+            ('borrowers.json', b'["import1@example.com"]'),
+            ('borrowers.csv', 'email,first_name\nimport1@example.com,Jos\xe9\n'.encode('latin-1')),
+        ]
+        for name, content in uploads:
+            response = api.post('/api/clients/bulk_import/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+            self.assertEqual(response.status_code, 400, name)
+            self.assertIn('error', response.json())
+        response = api.post('/api/clients/bulk_import/', [borrower_row(1), 'import2@example.com'], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Expected a list of objects, one per row'})
+        self.assertFalse(CustomUser.objects.filter(email='import1@example.com').exists())
+
+
+@override_settings(LOGIN_HASH_POOL_WORKERS=1)
+class PooledLoginTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email='pooled@example.com', username='pooled', password='Pooled-pass-123'
+        )
+
+    def test_login_verifies_password_in_pool(self):
+        api = APIClient()
+        response = api.post('/api/auth/login/', {'email': 'pooled@example.com', 'password': 'Pooled-pass-123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['email'], 'pooled@example.com')
+
+        response = api.post('/api/auth/login/', {'email': 'pooled@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+        response = api.post('/api/auth/login/', {'email': 'nobody@example.com', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        # Django's stock pbkdf2_sha1 hashes predate the tunable hashers
+        for algorithm in ('scrypt', 'pbkdf2_sha1'):
+            self.user.password = make_password('Pooled-pass-123', hasher=algorithm)
+            self.user.save(update_fields=['password'])
+
+            user = authenticate(username='pooled@example.com', password='Pooled-pass-123')
+            self.assertEqual(user, self.user)
+            self.user.refresh_from_db()
+            self.assertEqual(identify_hasher(self.user.password).algorithm, get_hasher().algorithm)
+        self.assertIsInstance(identify_hasher(self.user.password), type(get_hasher()))
+
+
+class CachedJWTAuthenticationTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_borrower(1)
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_cached_user_needs_no_queries(self):
+        self.assertEqual(self.api.get('/api/companies/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.api.get('/api/companies/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_user_loads_full_profile(self):
+        self.api.get('/api/companies/')
+        response = self.api.get('/api/auth/profile/')
+        self.assertEqual(response.json()['email'], 'borrower1@example.com')
+        self.assertEqual(response.json()['client_profile']['gender'], 'male')
+
+    def test_saving_user_invalidates_cache(self):
+        self.api.get('/api/companies/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.api.get('/api/companies/').status_code, 401)
+
+    def test_user_cached_again_before_the_commit_is_invalidated_after_it(self):
+        stale = CustomUser.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user.is_active = False
+                self.user.save()
+                # A concurrent request still reading the committed row
+                user_cache.set(stale)
+        self.assertIsNone(user_cache.get(self.user.pk))
+
+
+class AsyncAuthViewsTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_lender(1)
+        self.user.set_password('Async-pass-123')
+        self.user.save()
+        profile_cache.invalidate(self.user.pk)
+        self.credentials = {'email': 'lender1@example.com', 'password': 'Async-pass-123'}
+
+    async def test_login_matches_the_sync_view(self):
+        sync_response = await sync_to_async(APIClient().post)('/api/auth/login/', self.credentials, format='json')
+        response = await AsyncClient().post('/api/async/auth/login/', self.credentials, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user'], sync_response.json()['user'])
+        self.assertEqual(response.json()['user']['company_name'], 'Lender 1')
+        self.assertTrue(await OutstandingToken.objects.filter(user=self.user).aexists())
+
+        wrong = {**self.credentials, 'password': 'wrong'}
+        response = await AsyncClient().post('/api/async/auth/login/', wrong, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ['Invalid email or password.']})
+        response = await AsyncClient().post('/api/async/auth/login/', {'email': 'x'}, content_type='application/json')
+        self.assertEqual(set(response.json()), {'email', 'password'})
+        self.assertEqual((await AsyncClient().get('/api/async/auth/login/')).status_code, 405)
+
+    async def test_profile_and_refresh_require_a_token(self):
+        response = await AsyncClient().get('/api/async/auth/profile/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+        response = await AsyncClient().get('/api/async/auth/profile/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.json()['code'], 'token_not_valid')
+
+        refresh = await sync_to_async(RefreshToken.for_user)(self.user)
+        client = AsyncClient()
+        auth = {'Authorization': f'Bearer {refresh.access_token}'}
+        responses = await asyncio.gather(*(client.get('/api/async/auth/profile/', headers=auth) for _ in range(10)))
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(responses[0].json()['company_profile']['company_name'], 'Lender 1')
+        response = await client.get('/api/async/auth/profile/', headers={**auth, 'If-None-Match': responses[0]['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await client.post('/api/async/auth/refresh_token/', {'refresh': str(refresh)}, content_type='application/json', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.json()['access'])['user_id'], str(self.user.pk))
+        response = await client.post('/api/async/auth/refresh_token/', {'refresh': 'nope'}, content_type='application/json', headers=auth)
+        self.assertEqual(response.status_code, 401)
+        for body in ([str(refresh)], json.dumps(str(refresh)), 5, {'refresh': 5}):
+            response = await client.post('/api/async/auth/refresh_token/', body, content_type='application/json', headers=auth)
+            self.assertEqual(response.json(), {'error': 'Refresh token required'}, body)
+            self.assertEqual(response.status_code, 400)
+
+
+class DatabaseMetricsTestCase(TestCase):
+    def test_metrics_endpoint_is_staff_only(self):
+        api = APIClient()
+        api.force_authenticate(create_lender(1))
+        self.assertEqual(api.get('/api/metrics/db/').status_code, 403)
+
+        staff = CustomUser.objects.create(email='ops@example.com', username='ops', is_staff=True)
+        api.force_authenticate(staff)
+        response = api.get('/api/metrics/db/')
+        self.assertEqual(response.status_code, 200)
+        default = response.json()['databases'][0]
+        self.assertEqual(default['alias'], 'default')
+        self.assertEqual(default['pooled'], bool(connection.settings_dict['OPTIONS'].get('pool')))
+        self.assertGreaterEqual(default['open'], 1)
+
+    def test_pool_metrics_track_checkouts(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Pooling is PostgreSQL-only')
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            self.skipTest('Pooling needs psycopg 3 with psycopg_pool')
+        settings_dict = {
+            **connection.settings_dict, 'CONN_MAX_AGE': 0,
+            'OPTIONS': {**connection.settings_dict['OPTIONS'], 'pool': {'min_size': 1, 'max_size': 1}},
+        }
+        pooled = type(connections['default'])(settings_dict, alias='pool-metrics')
+        try:
+            pooled.ensure_connection()
+            metrics = pool_metrics(pooled)
+            self.assertEqual((metrics['alias'], metrics['pooled'], metrics['in_use']), ('pool-metrics', True, 1))
+            self.assertEqual(metrics['max_size'], 1)
+            pooled.close()
+            metrics = pool_metrics(pooled)
+            self.assertEqual(metrics['in_use'], 0)
+            self.assertGreaterEqual(metrics['created'], 1)
+        finally:
+            pooled.close()
+            pooled.close_pool()
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.staff = CustomUser.objects.create(email='ops@example.com', username='ops', is_staff=True)
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+
+    def test_requests_are_recorded_per_route(self):
+        create_borrower(1)
+        self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+        self.api.get('/api/clients/')
+
+        route = registry.snapshot()[('client-list', 'GET')]
+        self.assertEqual(route.statuses, {200: 2})
+        self.assertEqual(route.duration.count, 2)
+        self.assertGreater(route.queries.sum, 0)
+        self.assertGreater(route.serializer_time.sum, 0)
+        self.assertGreater(route.response_size.sum, 0)
+
+    def test_prometheus_endpoint(self):
+        self.api.get('/api/clients/')
+        response = self.api.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{route="client-list",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{route="client-list",method="GET",le="+Inf"} 1', body)
+        self.assertIn('http_request_recent_duration_seconds{route="client-list",method="GET",quantile="0.99"}', body)
+        self.assertIn('db_connections_open{alias="default"}', body)
+
+    def test_metrics_need_staff_or_the_metrics_token(self):
+        scraper = APIClient()
+        self.assertEqual(scraper.get('/api/metrics/').status_code, 401)
+        with override_settings(METRICS_TOKEN='scrape-me'):
+            scraper.credentials(HTTP_AUTHORIZATION='Bearer scrape-me')
+            self.assertEqual(scraper.get('/api/metrics/').status_code, 200)
+            scraper.credentials(HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertEqual(scraper.get('/api/metrics/').status_code, 401)
+        lender = APIClient()
+        lender.force_authenticate(create_lender(1))
+        self.assertEqual(lender.get('/api/metrics/').status_code, 403)
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        create_borrower(1)
+        with override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 0}):
+            with self.assertLogs('users.instrumentation', 'WARNING') as logs:
+                self.api.get('/api/clients/')
+        self.assertIn('Slow request GET /api/clients/ (client-list)', logs.output[0])
+        self.assertIn('FROM "Client"', logs.output[0])
+
+        # SQL parameters (password hashes, tokens, account numbers) stay out of the log
+        with override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 0}):
+            with self.assertLogs('users.instrumentation', 'WARNING') as logs:
+                self.api.post('/api/auth/login/', {'email': 'secret@example.com', 'password': 'x'}, format='json')
+        self.assertIn('FROM "users_customuser"', logs.output[0])
+        self.assertNotIn('secret@example.com', logs.output[0])
+
+        with override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 60_000, 'SLOW_REQUEST_QUERIES': 1000}):
+            with self.assertNoLogs('users.instrumentation', 'WARNING'):
+                self.api.get('/api/clients/')
+
+
+class ProfileCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = create_lender(1, business_city='Makati')
+        profile_cache.invalidate(self.user.pk)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeat_fetches_are_served_from_the_cache(self):
+        first = self.client.get('/api/auth/profile/')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['company_profile']['company_name'], 'Lender 1')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/auth/profile/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get('/api/auth/profile/')['ETag']
+        response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_profile_changes_invalidate_the_cache(self):
+        etag = self.client.get('/api/auth/profile/')['ETag']
+        company = self.user.company_profile
+        company.business_city = 'Taguig'
+        company.save()
+        response = self.client.get('/api/auth/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Taguig', response.json()['company_profile']['full_address'])
+
+        self.user.first_name = 'Andres'
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').json()['first_name'], 'Andres')
+
+
+class TokenRevocationTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        revocation_filter._reset()
+        self.user = create_borrower(1)
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_unrevoked_refresh_skips_blacklist_table(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.api.post('/api/auth/refresh_token/', {'refresh': refresh})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.post('/api/auth/refresh_token/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'blacklistedtoken' in query['sql']])
+
+    def test_blacklisted_token_is_rejected_after_filter_is_built(self):
+        refresh = str(RefreshToken.for_user(self.user))
+        self.api.post('/api/auth/refresh_token/', {'refresh': refresh})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.api.post('/api/auth/logout/', {'refresh_token': refresh})
+        response = self.api.post('/api/auth/refresh_token/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000)
+        for index in range(1000):
+            bloom.add(f'jti-{index}')
+        self.assertTrue(all(f'jti-{index}' in bloom for index in range(1000)))
+        false_positives = sum(f'other-{index}' in bloom for index in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_full_filter_is_rebuilt_with_room_for_the_live_blacklist(self):
+        jtis = []
+        for _ in range(3):
+            refresh = RefreshToken.for_user(self.user)
+            refresh.blacklist()
+            jtis.append(refresh['jti'])
+        revocations = RevocationFilter(capacity=2)
+        revocations.sync(1)
+        revocations.sync(2)
+        self.assertEqual(revocations.bloom.capacity, 6)
+        self.assertTrue(all(jti in revocations.bloom for jti in jtis))
+        # The next sync adds to the filter (the overlap rereads the 3 rows) instead of rebuilding it
+        revocations.sync(3)
+        self.assertEqual(revocations.bloom.count, 6)
+
+    def test_prune_removes_only_expired_tokens(self):
+        now = timezone.now()
+        for index in range(5):
+            OutstandingToken.objects.create(
+                user=self.user, jti=f'expired-{index}', token='x', expires_at=now - timedelta(days=1)
+            )
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti='expired-0'))
+        fresh = OutstandingToken.objects.create(user=self.user, jti='fresh', token='x', expires_at=now + timedelta(days=1))
+
+        self.assertEqual(prune_expired_tokens(batch_size=2), 5)
+        self.assertEqual(list(OutstandingToken.objects.all()), [fresh])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+def company_payload(index, **overrides):
+    payload = {
+        'email': f'company{index}@example.com',
+        'username': f'company{index}',
+        'password': 'Lender-pass-123',
+        'password_confirm': 'Lender-pass-123',
+        'first_name': 'Jose',
+        'last_name': 'Rizal',
+        'company_name': f'Lending Co {index}',
+        'business_street': '1 Ayala Ave',
+        'business_barangay': 'Bel-Air',
+        'business_city': 'Makati',
+        'business_region': 'ncr',
+        'contact_person_name': 'Jose Rizal',
+        'contact_person_email': f'contact{index}@example.com',
+        'contact_person_phone': '09170000000',
+        'company_phone': '0281234567',
+        'sec_registration_number': f'CS2025{index:05d}',
+        'company_tin': f'123-456-{index:03d}',
+        'business_type': 'Lending Company',
+        'license_number': f'LIC-{index}',
+        'loan_products_offered': ['personal', 'salary'],
+        'minimum_interest_rate': '1.50',
+        'maximum_interest_rate': '3.00',
+        'processing_fee': '2.00',
+        'late_payment_fee': '5.00',
+        'lending_policy_description': 'Salary-backed loans for employed borrowers.',
+        'minimum_loan_amount': '5000.00',
+        'maximum_loan_amount': '500000.00',
+        'loan_term_minimum_months': 3,
+        'loan_term_maximum_months': 36,
+        'bank_name': 'BPI',
+        'bank_account_number': f'11{index}',
+        'bank_account_name': f'Lending Co {index}',
+        'bank_branch': 'Makati',
+    }
+    payload.update(overrides)
+    return payload
+
+
+class CompanyRegistrationTestCase(TestCase):
+    def test_validation_runs_no_queries(self):
+        serializer = LendingCompanyRegistrationSerializer(data=company_payload(1))
+        with self.assertNumQueries(0):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def test_duplicate_unique_fields_map_to_field_errors(self):
+        api = APIClient()
+        self.assertEqual(api.post('/api/auth/register_company/', company_payload(1), format='json').status_code, 201)
+        for field in ('email', 'username', 'sec_registration_number', 'company_tin', 'company_name'):
+            payload = company_payload(2, **{field: company_payload(1)[field]})
+            response = api.post('/api/auth/register_company/', payload, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(list(response.json()), [field])
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+        # PostgreSQL's message quotes the duplicate value, which must not be matched against field names
+        response = api.post('/api/auth/register_company/', company_payload(3, username='myemail3'), format='json')
+        self.assertEqual(response.status_code, 201)
+        response = api.post('/api/auth/register_company/', company_payload(4, username='myemail3'), format='json')
+        self.assertEqual(list(response.json()), ['username'])
+
+
+task_calls = []
+
+
+@task
+def record_task_call(value, fail=False):
+    task_calls.append(value)
+    if fail:
+        raise RuntimeError(f'task {value} failed')
+
+
+@override_settings(TASK_QUEUE={'BACKEND': 'immediate'})
+class RegistrationFollowUpTestCase(TestCase):
+    def register(self):
+        response = APIClient().post('/api/auth/register_borrower/', borrower_registration(1, 'test'), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def test_follow_ups_run_after_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            body = self.register()
+        # Only the essential rows are written by the request
+        self.assertFalse(OutstandingToken.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+        for callback in callbacks:
+            callback()
+        user = CustomUser.objects.get(pk=body['user']['id'])
+        token = OutstandingToken.objects.get()
+        self.assertEqual((token.user, token.token), (user, body['tokens']['refresh']))
+        self.assertEqual(mail.outbox[0].to, [user.email])
+        with self.assertNumQueries(0):
+            profile_cache.get(user.pk)
+
+    def test_logout_before_the_token_row_is_written(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            body = self.register()
+        api = APIClient()
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {body['tokens']['access']}")
+        response = api.post('/api/auth/logout/', {'refresh_token': body['tokens']['refresh']}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        for callback in callbacks:
+            callback()
+        self.assertTrue(BlacklistedToken.objects.filter(token__token=body['tokens']['refresh']).exists())
+
+
+@override_settings(TASK_QUEUE={'BACKEND': 'database', 'MAX_ATTEMPTS': 2, 'RETRY_DELAY': 0})
+class DatabaseTaskQueueTestCase(TestCase):
+    def setUp(self):
+        task_calls.clear()
+
+    def test_tasks_are_stored_and_deleted_once_run(self):
+        record_task_call.defer('a')
+        record_task_call.defer('b')
+        self.assertEqual(list(Task.objects.values_list('args', flat=True)), [['a'], ['b']])
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(task_calls, ['a', 'b'])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_are_retried_then_kept(self):
+        record_task_call.defer('c', fail=True)
+        with self.assertLogs('users.task_queue', 'ERROR') as logs:
+            run_pending()
+        self.assertIn('failed, attempt 1', logs.output[0])
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('pending', 1))
+
+        with self.assertLogs('users.task_queue', 'ERROR'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('failed', 2))
+        self.assertIn('task c failed', queued.last_error)
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(task_calls, ['c', 'c'])
+
+    def test_arguments_must_be_json_serializable(self):
+        with self.assertRaises(TypeError):
+            record_task_call.defer(CustomUser())
+
+
+class LenderSearchTestCase(TestCase):
+    def setUp(self):
+        terms = {
+            'minimum_loan_amount': 10000, 'maximum_loan_amount': 100000,
+            'loan_term_minimum_months': 6, 'loan_term_maximum_months': 24,
+            'minimum_interest_rate': '1.50',
+        }
+        create_lender(1, business_region='ncr', loan_products_offered=['personal', 'business'], **terms)
+        create_lender(2, business_region='ncr', loan_products_offered=['salary'], **terms)
+        create_lender(3, business_region='region7', loan_products_offered=['business'], **terms)
+        create_lender(4, business_region='ncr', loan_products_offered=['business'], **{
+            **terms, 'maximum_loan_amount': 20000, 'minimum_interest_rate': '3.00',
+        })
+        create_lender(5, business_region='ncr', loan_products_offered=['business'])
+        self.client = APIClient()
+        self.client.force_authenticate(create_borrower(1))
+
+    def search(self, **params):
+        response = self.client.get('/api/companies/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['company_name'] for row in response.json()['results'])
+
+    def test_borrowers_find_lenders_covering_the_request(self):
+        self.assertEqual(self.search(amount=50000, term=12, product='business', region='ncr'), ['Lender 1'])
+        self.assertEqual(self.search(amount=15000, product='business'), ['Lender 1', 'Lender 3', 'Lender 4'])
+        self.assertEqual(self.search(amount=15000, product='business', rate='2.00'), ['Lender 1', 'Lender 3'])
+        self.assertEqual(self.search(term=36), [])
+        self.assertEqual(len(self.search()), 5)
+
+    def test_results_leave_out_private_company_details(self):
+        row = self.client.get('/api/companies/search/', {'region': 'region7'}).json()['results'][0]
+        self.assertEqual((row['company_name'], row['minimum_interest_rate']), ('Lender 3', '1.50'))
+        self.assertEqual(row['loan_products_offered'], ['business'])
+        for private in ('bank_account_number', 'bank_account_name', 'company_tin', 'sec_registration_number',
+                        'license_number', 'contact_person_email', 'user'):
+            self.assertNotIn(private, row)
+
+    def test_pages_walk_every_match(self):
+        response = self.client.get('/api/companies/search/', {'page_size': 2})
+        names = []
+        while True:
+            body = response.json()
+            names.extend(row['company_name'] for row in body['results'])
+            if not body['next']:
+                break
+            response = self.client.get(body['next'])
+        self.assertEqual(sorted(names), [f'Lender {index}' for index in range(1, 6)])
+
+    def test_invalid_criteria_are_rejected(self):
+        response = self.client.get('/api/companies/search/', {'amount': 'lots', 'product': 'crypto'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'amount', 'product'})
+
+
+class ClientSearchTestCase(TestCase):
+    def setUp(self):
+        self.staff = CustomUser.objects.create(
+            email='staff@example.com', username='staff', role='employee', user_type='lending_company'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.staff)
+        self.juan = create_borrower(
+            1, middle_name='Peñaflor', current_city='Quezon City', current_barangay='San Roque',
+        )
+        CustomUser.objects.filter(pk=self.juan.pk).update(phone_number='09171234567')
+        rebuild_search_documents(Client.objects.all())
+        create_borrower(2, current_city='Cebu City', current_barangay='Lahug')
+
+    def search(self, query, **params):
+        response = self.api.get('/api/clients/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['email'] for row in response.json()['results']]
+
+    def test_document_is_normalized(self):
+        self.assertEqual(
+            Client.objects.get(user=self.juan).search_document,
+            ' juan penaflor dela cruz 1 borrower1@example.com quezon city san roque 09171234567',
+        )
+
+    def test_every_term_must_start_a_word(self):
+        self.assertEqual(self.search('juan dela'), ['borrower2@example.com', 'borrower1@example.com'])
+        self.assertEqual(self.search('Juan QUEZON'), ['borrower1@example.com'])
+        self.assertEqual(self.search('penaflor'), ['borrower1@example.com'])
+        self.assertEqual(self.search('san ro'), ['borrower1@example.com'])
+        self.assertEqual(self.search('borrower2@'), ['borrower2@example.com'])
+        self.assertEqual(self.search('ahug'), [])
+        self.assertEqual(self.search('juan', limit=1), ['borrower2@example.com'])
+
+    def test_phone_numbers_match_in_any_format(self):
+        self.assertEqual(self.search('+63 917 123 4567'), ['borrower1@example.com'])
+        self.assertEqual(self.search('0917-123'), ['borrower1@example.com'])
+
+    def test_saving_the_user_or_client_refreshes_the_document(self):
+        self.juan.last_name = 'Santos'
+        self.juan.save()
+        self.assertEqual(self.search('santos'), ['borrower1@example.com'])
+
+        client = Client.objects.get(user__email='borrower2@example.com')
+        client.current_city = 'Davao City'
+        client.save(update_fields=['current_city'])
+        self.assertEqual(self.search('davao'), ['borrower2@example.com'])
+
+        # Logins only save last_login, which is not part of the document
+        with self.assertNumQueries(1):
+            self.juan.save(update_fields=['last_login'])
+
+    def test_staff_only_and_validated(self):
+        self.assertEqual(self.api.get('/api/clients/search/').status_code, 400)
+        self.assertEqual(self.api.get('/api/clients/search/', {'q': 'juan', 'limit': 500}).status_code, 400)
+        borrower = APIClient()
+        borrower.force_authenticate(self.juan)
+        self.assertEqual(borrower.get('/api/clients/search/', {'q': 'juan'}).status_code, 403)
+
+    def test_bulk_loaded_clients_are_searchable(self):
+        seed_borrowers(3)
+        self.assertEqual(self.search('09170000002'), ['borrower2@b.seed.avendro.test'])
+
+
+class LoanQuoteTestCase(TestCase):
+    def setUp(self):
+        terms = {
+            'minimum_loan_amount': 10000, 'maximum_loan_amount': 100000,
+            'loan_term_minimum_months': 6, 'loan_term_maximum_months': 24,
+        }
+        create_lender(1, minimum_interest_rate='2.00', processing_fee='3.00', **terms)
+        create_lender(2, minimum_interest_rate='1.50', **{**terms, 'maximum_loan_amount': 20000})
+        create_lender(3, **terms)
+        self.client = APIClient()
+        self.client.force_authenticate(create_borrower(1))
+
+    def quote(self, **body):
+        return self.client.post('/api/companies/quotes/', body, format='json')
+
+    def test_schedules_are_exact_to_the_centavo(self):
+        batch = ScheduleBatch.from_decimals(
+            [Decimal('10000')] * 3 + [Decimal('12345.67')], [12, 12, 12, 7], [Decimal('2')] * 3 + [Decimal('0')],
+            ['equal', 'diminishing', 'add_on', 'equal'], Decimal('3'),
+        )
+        equal, diminishing, add_on, interest_free = (batch.summary(index) for index in range(4))
+        self.assertEqual(equal['installment'], Decimal('945.60'))
+        self.assertEqual(equal['total_interest'], Decimal('1347.15'))
+        self.assertEqual(equal['net_proceeds'], Decimal('9700.00'))
+        self.assertEqual(diminishing['total_interest'], Decimal('1300.00'))
+        self.assertEqual(add_on['total_interest'], Decimal('2400.00'))
+        self.assertEqual(interest_free['total_interest'], Decimal('0.00'))
+        # A flat rate costs far more than its nominal rate
+        self.assertEqual(add_on['effective_rate'], Decimal('4.00'))
+
+        for index in range(4):
+            schedule = batch.schedule(index)
+            self.assertEqual(sum(row['principal'] for row in schedule), batch.summary(index)['amount'])
+            self.assertEqual(schedule[-1]['balance'], Decimal('0.00'))
+        self.assertEqual(batch.schedule(0)[0], {
+            'month': 1, 'payment': Decimal('945.60'), 'principal': Decimal('745.60'),
+            'interest': Decimal('200.00'), 'balance': Decimal('9254.40'),
+        })
+
+    def test_lenders_quote_the_amounts_and_terms_they_cover(self):
+        response = self.quote(amounts=['15000', '50000'], terms=[12, 36])
+        self.assertEqual(response.status_code, 200, response.content)
+        quotes = [(row['company_name'], row['amount'], row['term']) for row in response.json()['quotes']]
+        # Cheapest first for each amount and term; lender 3 publishes no rate
+        self.assertEqual(quotes, [
+            ('Lender 2', '15000.00', 12), ('Lender 1', '15000.00', 12), ('Lender 1', '50000.00', 12),
+        ])
+
+        response = self.quote(amounts=['15000'], terms=[12], method='add_on', include_schedule=True)
+        cheapest = response.json()['quotes'][0]
+        self.assertEqual(cheapest['total_interest'], '2700.00')
+        self.assertEqual(cheapest['processing_fee'], '0.00')
+        self.assertEqual(len(cheapest['schedule']['payment']), 12)
+        self.assertEqual(cheapest['schedule']['payment'][0], '1475.00')
+        self.assertEqual(cheapest['schedule']['balance'][-1], '0.00')
+
+    def test_requests_are_validated_and_bounded(self):
+        self.assertEqual(self.quote(amounts=[], terms=[12], method='balloon').status_code, 400)
+        with mock.patch('users.loan_quotes.MAX_QUOTES', 2):
+            response = self.quote(amounts=['15000', '50000'], terms=[12])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('3 quotes match', response.json()['error'])
+
+
+class LoanLedgerTestCase(TestCase):
+    def setUp(self):
+        create_borrower(1)
+        create_lender(1, minimum_interest_rate='2.00', processing_fee='3.00')
+        self.application = LoanApplication.objects.create(
+            client=Client.objects.get(), company=Company.objects.get(), product='personal',
+            amount=Decimal('10000'), term_months=6,
+        )
+        self.loan = open_loan(self.application, released_at=datetime(2026, 1, 31, 9, tzinfo=dt_timezone.utc))
+
+    def balance(self):
+        return Loan.objects.values_list('outstanding_balance', 'total_paid', 'payments_count', 'status').get()
+
+    def test_loans_are_priced_like_quotes(self):
+        self.assertEqual(self.application.status, 'approved')
+        self.assertEqual(self.loan.installment, Decimal('1785.26'))
+        self.assertEqual(self.loan.total_payable, Decimal('10711.54'))
+        self.assertEqual(self.loan.outstanding_balance, self.loan.total_payable)
+        self.assertEqual(self.loan.processing_fee, Decimal('300.00'))
+        self.assertEqual(self.loan.maturity_date, date(2026, 7, 31))
+
+    def test_payments_update_running_totals(self):
+        # Savepoint, loan update, duplicate reference check, insert, release
+        with self.assertNumQueries(5):
+            record_payment(self.loan.pk, '1785.26', reference='OR-1')
+        self.assertEqual(self.balance(), (Decimal('8926.28'), Decimal('1785.26'), 1, 'active'))
+
+        with self.assertRaisesMessage(PaymentRejected, 'already recorded'):
+            record_payment(self.loan.pk, '1785.26', reference='OR-1')
+        with self.assertRaisesMessage(PaymentRejected, 'exceeds the outstanding balance'):
+            record_payment(self.loan.pk, '9000')
+        # Rejected payments leave no trace
+        self.assertEqual(self.balance(), (Decimal('8926.28'), Decimal('1785.26'), 1, 'active'))
+
+        record_payment(self.loan.pk, '8926.28', channel='gcash')
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('10711.54'), 2, 'paid'))
+        with self.assertRaisesMessage(PaymentRejected, 'is paid'):
+            record_payment(self.loan.pk, '1')
+
+    def test_reversals_are_new_entries(self):
+        payment = record_payment(self.loan.pk, '10711.54')
+        reverse_payment(payment)
+        self.assertEqual(self.balance(), (Decimal('10711.54'), Decimal('0.00'), 0, 'active'))
+        self.assertEqual(sorted(Payment.objects.values_list('amount', flat=True)), [Decimal('-10711.54'), Decimal('10711.54')])
+        with self.assertRaisesMessage(PaymentRejected, 'already reversed'):
+            reverse_payment(payment)
+
+    def test_ledger_is_append_only(self):
+        payment = record_payment(self.loan.pk, '100')
+        payment.amount = Decimal('1')
+        for change in (payment.save, payment.delete, Payment.objects.all().delete,
+                       lambda: Payment.objects.update(amount=1)):
+            with self.assertRaises(TypeError):
+                change()
+        self.assertEqual(Payment.objects.get().amount, Decimal('100.00'))
+
+    def test_deleting_accounts_with_loans_is_refused(self):
+        record_payment(self.loan.pk, '100')
+        api = APIClient()
+        api.force_authenticate(CustomUser.objects.create(email='admin@example.com', username='admin', role='admin'))
+        client = self.application.client
+        for url in (f'/api/clients/{client.pk}/', f'/api/companies/{self.application.company_id}/',
+                    f'/api/users/{client.user_id}/'):
+            response = api.delete(url)
+            self.assertEqual(response.status_code, 409, url)
+            self.assertIn('deactivate', response.json()['error'])
+        self.assertTrue(Client.objects.filter(pk=client.pk).exists())
+
+    def test_payments_land_in_monthly_partitions(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('The ledger is only partitioned on PostgreSQL')
+        paid_at = datetime(2031, 5, 10, tzinfo=dt_timezone.utc)
+        payment = record_payment(self.loan.pk, '100', paid_at=paid_at)
+        self.assertEqual(create_payment_partitions(paid_at, 2), ['users_payment_p2031_05', 'users_payment_p2031_06'])
+        self.assertIn('users_payment_p2031_05', payment_partitions())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT tableoid::regclass::text FROM users_payment WHERE id = %s', [payment.pk])
+            self.assertEqual(cursor.fetchone()[0], 'users_payment_p2031_05')
+        self.assertEqual(create_payment_partitions(paid_at, 2), [])
+
+
+class CreditScoringTestCase(TestCase):
+    def setUp(self):
+        create_borrower(1, monthly_income=Decimal('60000'), marital_status='married')
+        create_borrower(2, employment_status='unemployed')
+        create_borrower(3, monthly_income=Decimal('60000'), marital_status='married')
+        create_lender(1, minimum_interest_rate='2.00')
+        self.prudent, self.jobless, self.late = Client.objects.order_by('pk')
+        released_at = timezone.now() - timedelta(days=100)
+        for client in (self.prudent, self.late):
+            application = LoanApplication.objects.create(
+                client=client, company=Company.objects.get(), product='personal', amount=Decimal('10000'), term_months=6,
+            )
+            loan = open_loan(application, released_at=released_at)
+        for month in range(3):
+            record_payment(Loan.objects.get(client=self.prudent).pk, loan.installment, reference=f'OR-{month}')
+
+    def scores(self):
+        return list(Client.objects.order_by('pk').values_list('credit_score', flat=True))
+
+    def test_scores_follow_income_employment_and_repayment(self):
+        self.assertEqual(score_clients(chunk_size=2), {'read': 3, 'written': 3})
+        prudent, jobless, late = self.scores()
+        self.assertTrue(300 <= jobless < late < prudent <= 850)
+
+    def test_only_changed_clients_are_rescored(self):
+        score_clients()
+        self.assertEqual(score_clients(), {'read': 0, 'written': 0})
+
+        self.prudent.refresh_from_db()
+        self.jobless.refresh_from_db()
+        self.jobless.employment_status = 'employed'
+        self.jobless.monthly_income = Decimal('30000')
+        self.jobless.save(update_fields=['employment_status', 'monthly_income'])
+        self.prudent.bank_name = 'BPI'
+        self.prudent.save()
+        before = self.scores()
+        # Both were saved, only one has new inputs
+        self.assertEqual(score_clients(), {'read': 2, 'written': 1})
+        self.assertGreater(self.scores()[1], before[1])
+
+        record_payment(Loan.objects.get(client=self.late).pk, '500')
+        self.assertEqual(list(clients_to_score(Client.objects.all())), [self.late])
+        # Installments fall due without writes, so active borrowers are checked daily
+        tomorrow = timezone.now() + timedelta(days=2)
+        self.assertEqual(clients_to_score(Client.objects.all(), now=tomorrow).count(), 2)
+
+
+class DashboardTestCase(TestCase):
+    def assertCountsCurrent(self):
+        stored = DashboardCount.objects.exclude(count=0).values_list('rollup', 'bucket', 'count', 'total')
+        self.assertEqual(
+            sorted((rollup, bucket, count, Decimal(total)) for rollup, bucket, count, total in stored),
+            sorted((rollup, bucket, count, Decimal(total)) for rollup, bucket, count, total in compute_rollups()),
+        )
+
+    def test_saves_and_deletes_keep_counts_current(self):
+        create_borrower(1, monthly_income=Decimal('25000'))
+        create_borrower(2, current_region='region7', monthly_income=Decimal('150000'))
+        create_lender(1, loan_products_offered=['personal', 'sme'])
+        BorrowerImporter(workers=1).run([borrower_row(1), borrower_row(2, current_region='barmm')])
+        self.assertCountsCurrent()
+
+        client = Client.objects.get(user__username='borrower1')
+        client.current_region = 'region7'
+        client.monthly_income = Decimal('5000')
+        client.save(update_fields=['current_region', 'monthly_income'])
+        # Saves of other fields neither read nor write the counts
+        client.bank_name = 'BPI'
+        with self.assertNumQueries(1):
+            client.save(update_fields=['bank_name'])
+        company = Company.objects.get()
+        company.loan_products_offered = ['sme', 'salary']
+        company.save()
+        self.assertCountsCurrent()
+
+        CustomUser.objects.filter(username='borrower2').delete()
+        self.assertCountsCurrent()
+        self.assertEqual(DashboardCount.objects.get(rollup='clients_by_region', bucket='region7').count, 1)
+
+    def test_endpoint_serves_rollups_with_staleness(self):
+        create_borrower(1, monthly_income=Decimal('25000'))
+        create_borrower(2, employment_status='student')
+        api = APIClient()
+        api.force_authenticate(create_lender(1, business_region='region3', loan_products_offered=['personal']))
+        self.assertTrue(api.get('/api/dashboards/').json()['stale'])
+
+        self.assertEqual(refresh_dashboards(), 9)
+        with self.assertNumQueries(1):
+            data = api.get('/api/dashboards/').json()
+        self.assertFalse(data['stale'])
+        self.assertEqual((data['clients']['count'], data['clients']['income_total']), (2, '25000.00'))
+        self.assertEqual([entry['bucket'] for entry in data['clients']['by_income']], ['20000-40000', 'none'])
+        self.assertEqual(data['clients']['by_income'][0]['label'], '₱20,000 - ₱39,999')
+        self.assertEqual(data['companies']['by_region'], [{'bucket': 'region3', 'label': 'Central Luzon (Region III)', 'count': 1}])
+        self.assertEqual(data['companies']['by_product'][0]['label'], 'Personal Loans')
+
+        later = timezone.now() + timedelta(hours=2)
+        self.assertTrue(dashboard_data(now=later)['stale'])
+
+    def test_endpoint_is_closed_to_borrowers(self):
+        api = APIClient()
+        api.force_authenticate(create_borrower(1))
+        self.assertEqual(api.get('/api/dashboards/').status_code, 403)
+
+
+class NotificationsTestCase(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.borrower = create_borrower(1)
+        self.lender = create_lender(1)
+
+    def socket(self, token, path='/ws/notifications/', header=False):
+        scope = {'type': 'websocket', 'path': path, 'query_string': b'', 'headers': []}
+        if header:
+            scope['headers'] = [(b'authorization', f'Bearer {token}'.encode())]
+        else:
+            scope['query_string'] = f'token={token}'.encode()
+        return ApplicationCommunicator(asgi_application, scope)
+
+    async def connect(self, user, lifetime=None, header=False):
+        token = await sync_to_async(AccessToken.for_user)(user)
+        if lifetime is not None:
+            token.set_exp(lifetime=lifetime)
+        socket = self.socket(token, header=header)
+        await socket.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await socket.receive_output(), {'type': 'websocket.accept'})
+        return socket
+
+    async def receive_event(self, socket):
+        message = await socket.receive_output(1)
+        self.assertEqual(message['type'], 'websocket.send')
+        return json.loads(message['text'])
+
+    async def test_events_reach_the_sockets_of_their_users(self):
+        rejected = self.socket('nope')
+        await rejected.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await rejected.receive_output(), {'type': 'websocket.accept'})
+        self.assertEqual(await rejected.receive_output(), {'type': 'websocket.close', 'code': 4401})
+        elsewhere = self.socket('nope', path='/ws/other/')
+        await elsewhere.send_input({'type': 'websocket.connect'})
+        self.assertEqual(await elsewhere.receive_output(), {'type': 'websocket.close', 'code': 4404})
+
+        borrower = await self.connect(self.borrower)
+        lenders = [await self.connect(self.lender), await self.connect(self.lender, header=True)]
+        notify([self.borrower.pk], {'type': 'test', 'n': 1})
+        broadcast({'type': 'test', 'n': 2})
+        self.assertEqual(await self.receive_event(borrower), {'type': 'test', 'n': 1})
+        self.assertEqual(await self.receive_event(borrower), {'type': 'test', 'n': 2})
+        for socket in lenders:
+            self.assertEqual(await self.receive_event(socket), {'type': 'test', 'n': 2})
+            self.assertTrue(await socket.receive_nothing())
+
+        await borrower.send_input({'type': 'websocket.receive', 'text': '{"type": "ping"}'})
+        self.assertEqual(await self.receive_event(borrower), {'type': 'pong'})
+        for socket in [borrower, *lenders]:
+            await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await socket.wait(1)
+        self.assertEqual(get_hub().count, 0)
+
+    @override_settings(NOTIFICATIONS={'QUEUE': 2})
+    async def test_slow_sockets_and_expired_tokens_are_closed(self):
+        socket = await self.connect(self.borrower)
+        # Three events before the writer gets to run
+        with self.assertLogs('users.notifications', 'WARNING'):
+            for index in range(3):
+                get_hub().dispatch([self.borrower.pk], f'{{"n": {index}}}')
+        self.assertEqual(await self.receive_event(socket), {'n': 0})
+        self.assertEqual(await self.receive_event(socket), {'n': 1})
+        self.assertEqual(await socket.receive_output(1), {'type': 'websocket.close', 'code': 4008})
+        await socket.wait(1)
+
+        socket = await self.connect(self.borrower, lifetime=timedelta(seconds=1))
+        self.assertEqual(await socket.receive_output(3), {'type': 'websocket.close', 'code': 4401})
+        await socket.wait(1)
+        self.assertEqual(get_hub().count, 0)
+
+    @override_settings(TASK_QUEUE={'BACKEND': 'immediate'})
+    def test_loan_events_are_pushed_after_commit(self):
+        create_lender(2, minimum_interest_rate='2.00')
+        with mock.patch('users.tasks.notify') as pushed:
+            with self.captureOnCommitCallbacks(execute=True):
+                application = LoanApplication.objects.create(
+                    client=Client.objects.get(), company=Company.objects.get(user__username='lender2'),
+                    product='personal', amount=Decimal('10000'), term_months=6,
+                )
+            pushed.assert_called_once()
+            recipients, event = pushed.call_args.args
+            self.assertEqual(recipients, [application.company.user_id])
+            self.assertEqual((event['type'], event['status'], event['amount']), ('loan_application', 'pending', '10000.00'))
+
+            pushed.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                application.purpose = 'Tuition'
+                application.save()
+            pushed.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                loan = open_loan(application)
+            self.assertEqual(pushed.call_args.args[0], [self.borrower.pk])
+            self.assertEqual(pushed.call_args.args[1]['status'], 'approved')
+
+            with self.captureOnCommitCallbacks(execute=True):
+                record_payment(loan.pk, '500')
+            recipients, event = pushed.call_args.args
+            self.assertEqual(recipients, [self.borrower.pk, application.company.user_id])
+            self.assertEqual((event['type'], event['amount']), ('payment', '500.00'))
+            self.assertEqual(Decimal(event['outstanding_balance']), loan.total_payable - 500)
+
+
+class BenchmarkSeedTestCase(TestCase):
+    def test_seeding_tops_up_and_cleans_up(self):
+        seed_borrowers(30, batch_size=8)
+        seed_borrowers(45, batch_size=8)
+        seed_lenders(5)
+
+        self.assertEqual(seeded_users('b').count(), 45)
+        self.assertEqual(Client.objects.count(), 45)
+        self.assertEqual(Company.objects.count(), 5)
+        self.assertEqual(CustomUser.objects.filter(user_type='lending_company', role='admin').count(), 5)
+        employed = Client.objects.filter(employment_status__in=['employed', 'self_employed'])
+        self.assertFalse(employed.filter(monthly_income__isnull=True).exists())
+
+        delete_seeded()
+        self.assertFalse(CustomUser.objects.exists())
+        self.assertFalse(Client.objects.exists())
+
+
+class ApiBenchmarkTestCase(TestCase):
+    def test_every_scenario_succeeds(self):
+        seed_lenders(3)
+        record = ApiBenchmark(requests=3, warmup=1, profile=2).run(SCENARIOS)
+
+        self.assertEqual(set(record['scenarios']), {scenario.name for scenario in SCENARIOS})
+        for name, summary in record['scenarios'].items():
+            self.assertEqual(summary['failed'], 0, name)
+            self.assertEqual(summary['count'], 3, name)
+        self.assertEqual(record['lenders'], 3)
+        self.assertFalse(CustomUser.objects.filter(email__endswith='@bench.avendro.test').exists())
+
+    def test_compare_flags_slower_percentiles_and_extra_queries(self):
+        def run(p50, p95, queries, borrowers=100):
+            summary = {'count': 10, 'failed': 0, 'p50_ms': p50, 'p95_ms': p95, 'queries_per_request': queries}
+            return {'commit': 'abc', 'vendor': 'sqlite', 'borrowers': borrowers, 'lenders': 10,
+                    'scenarios': {'profile': summary}}
+
+        baseline = run(10, 20, 1)
+        self.assertEqual(compare(baseline, run(10.5, 40, 1)), [('profile', 'p95_ms', 20, 40)])
+        self.assertEqual(compare(baseline, run(10, 20, 3)), [('profile', 'queries_per_request', 1, 3)])
+        # Within the threshold or the noise floor
+        self.assertEqual(compare(baseline, run(12, 20.9, 1)), [])
+        self.assertIs(find_baseline([baseline], run(10, 20, 1, borrowers=500)), None)
+        self.assertIs(find_baseline([baseline], run(10, 20, 1), commit='abc'), baseline)
+
+
+# SQLite's shared in-memory test database raises "table is locked" for concurrent writers
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+@override_settings(TASK_QUEUE={'BACKEND': 'immediate'})
+class CompanyRegistrationConcurrencyTestCase(TransactionTestCase):
+    def test_concurrent_registrations_cannot_share_a_tin(self):
+        attempts = 4
+        barrier = threading.Barrier(attempts)
+
+        def register(index):
+            try:
+                barrier.wait()
+                payload = company_payload(index, company_tin='999-999-999')
+                response = APIClient().post('/api/auth/register_company/', payload, format='json')
+                return response.status_code, response.json()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=attempts) as executor:
+            results = list(executor.map(register, range(attempts)))
+
+        statuses = sorted(status_code for status_code, _ in results)
+        self.assertEqual(statuses, [201] + [400] * (attempts - 1))
+        for status_code, body in results:
+            if status_code == 400:
+                self.assertEqual(body, {'company_tin': ['This TIN already exists.']})
+        self.assertEqual(Company.objects.filter(company_tin='999-999-999').count(), 1)
+        self.assertEqual(CustomUser.objects.count(), 1)
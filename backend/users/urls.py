@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'auth', views.AuthViewSet, basename='auth')
@@ -9,5 +9,11 @@ router.register(r'companies', views.CompanyViewSet)
 router.register(r'clients', views.ClientViewSet)
 
 urlpatterns = [
+    path('async/auth/login/', async_views.login, name='async-auth-login'),
+    path('async/auth/profile/', async_views.profile, name='async-auth-profile'),
+    path('async/auth/refresh_token/', async_views.refresh_token, name='async-auth-refresh-token'),
+    path('dashboards/', views.DashboardView.as_view(), name='dashboards'),
+    path('metrics/', views.PrometheusMetricsView.as_view(), name='metrics'),
+    path('metrics/db/', views.DatabaseMetricsView.as_view(), name='metrics-db'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
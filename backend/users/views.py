@@ -1,5 +1,9 @@
+from itertools import islice
+
 from django.shortcuts import render
 from django.contrib.auth import logout
+from django.db.models import ProtectedError
+from django.http import HttpResponse
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,13 +13,34 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
 from .models import CustomUser, Company, Client
+from .query_planning import QueryPlanMixin
+from .exports import StreamingExportMixin
+from .fast_serialization import FastListMixin
+from .pagination import LenderSearchPagination
+from .authentication import CachedJWTAuthentication, MetricsTokenAuthentication
+from .instrumentation import PROMETHEUS_CONTENT_TYPE, render_prometheus
+from .permissions import IsAdminRole, IsLenderStaff, IsMetricsScraper
+from .profile_cache import profile_cache
+from .bulk_import import BorrowerImporter, check_rows, import_options, read_rows
+from .db_metrics import connection_metrics
+from .lender_search import filter_lenders
+from .client_search import search_clients
+from .dashboards import dashboard_data
+from .loan_quotes import TooManyQuotes, quote_lenders
+from .revocation import DeferredRefreshToken, FastRevocationRefreshToken
+from .tasks import after_registration
 from .serializers import (
+    AcceptInvitationSerializer,
     BorrowerRegistrationSerializer, 
     LendingCompanyRegistrationSerializer,
     LoginSerializer,
     UserProfileSerializer,
     CompanySerializer,
-    ClientSerializer
+    ClientSerializer,
+    ClientSearchSerializer,
+    LenderSearchResultSerializer,
+    LenderSearchSerializer,
+    LoanQuoteSerializer
 )
 
 class AuthViewSet(viewsets.ViewSet):
@@ -33,9 +58,11 @@ class AuthViewSet(viewsets.ViewSet):
         if serializer.is_valid():
             user = serializer.save()
             
-            # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            # Generate JWT tokens; the OutstandingToken row and the follow-up work
+            # (welcome email, profile cache warm-up, audit log) go to the task queue
+            refresh = DeferredRefreshToken.for_user(user)
             access_token = refresh.access_token
+            after_registration(user, request.META.get('REMOTE_ADDR'))
             
             return Response({
                 'message': 'Borrower registered successfully',
@@ -69,9 +96,11 @@ class AuthViewSet(viewsets.ViewSet):
         if serializer.is_valid():
             user = serializer.save()
             
-            # Generate JWT tokens
-            refresh = RefreshToken.for_user(user)
+            # Generate JWT tokens; the OutstandingToken row and the follow-up work
+            # (welcome email, profile cache warm-up, audit log) go to the task queue
+            refresh = DeferredRefreshToken.for_user(user)
             access_token = refresh.access_token
+            after_registration(user, request.META.get('REMOTE_ADDR'))
             
             return Response({
                 'message': 'Lending company registered successfully',
@@ -128,6 +157,25 @@ class AuthViewSet(viewsets.ViewSet):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['post'])
+    def accept_invitation(self, request):
+        """
+        Set the first password of a borrower invited by a bulk import, and log them in
+        """
+        serializer = AcceptInvitationSerializer(data=request.data)
+        if serializer.is_valid():
+            user = serializer.save()
+            refresh = RefreshToken.for_user(user)
+            return Response({
+                'message': 'Password set successfully',
+                'tokens': {
+                    'access': str(refresh.access_token),
+                    'refresh': str(refresh)
+                }
+            }, status=status.HTTP_200_OK)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def logout(self, request):
         """
@@ -136,7 +184,7 @@ class AuthViewSet(viewsets.ViewSet):
         try:
             refresh_token = request.data.get('refresh_token')
             if refresh_token:
-                token = RefreshToken(refresh_token)
+                token = FastRevocationRefreshToken(refresh_token)
                 token.blacklist()
             
             return Response({
@@ -150,10 +198,12 @@ class AuthViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def profile(self, request):
         """
-        Get current user profile
+        Get current user profile (cached per user, honors If-None-Match)
         """
-        serializer = UserProfileSerializer(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if request.accepted_renderer.format != 'json':
+            serializer = UserProfileSerializer(request.user)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return profile_cache.response(request)
     
     @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated])
     def refresh_token(self, request):
@@ -167,7 +217,7 @@ class AuthViewSet(viewsets.ViewSet):
                     'error': 'Refresh token required'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            refresh = RefreshToken(refresh_token)
+            refresh = FastRevocationRefreshToken(refresh_token)
             access_token = refresh.access_token
             
             return Response({
@@ -179,13 +229,28 @@ class AuthViewSet(viewsets.ViewSet):
                 'error': 'Invalid refresh token'
             }, status=status.HTTP_401_UNAUTHORIZED)
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class KeepLoanRecordsMixin:
+    """
+    Refuse to delete what loans still refer to (Loan and Payment protect their
+    client, company and application) with a 409 instead of a server error
+    """
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response({
+                'error': 'Loans are on record for this account, so it cannot be deleted; deactivate it instead'
+            }, status=status.HTTP_409_CONFLICT)
+
+
+class CompanyViewSet(KeepLoanRecordsMixin, FastListMixin, StreamingExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for Company management
     """
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
     permission_classes = [permissions.IsAuthenticated]
+    export_basename = 'companies'
     
     def get_queryset(self):
         """
@@ -198,14 +263,56 @@ class CompanyViewSet(viewsets.ModelViewSet):
             return Company.objects.filter(user=user)
         else:
             return Company.objects.none()
+    
+    @action(detail=False, methods=['get'], pagination_class=LenderSearchPagination)
+    def search(self, request):
+        """
+        Find lenders covering ?amount=&term=&product=&region=&rate= (highest acceptable rate).
+        Open to every authenticated user so borrowers can compare lenders, who see
+        public terms only (LenderSearchResultSerializer).
+        """
+        params = LenderSearchSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Only the public columns (and the keyset's created_at) are read
+        fields = [name for name in LenderSearchResultSerializer.Meta.fields if name != 'loan_products_display']
+        queryset = filter_lenders(Company.objects.only(*fields, 'created_at'), params.validated_data)
+        page = self.paginate_queryset(queryset)
+        serializer = LenderSearchResultSerializer(page, many=True, context=self.get_serializer_context())
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['post'])
+    def quotes(self, request):
+        """
+        Repayment quotes from every lender (optionally filtered by product, region or ids)
+        whose bounds cover each of the posted amounts and terms, cheapest first per amount and term.
+        Open to every authenticated user, like search.
+        """
+        params = LoanQuoteSerializer(data=request.data)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = params.validated_data
+        companies = filter_lenders(Company.objects.all(), data)
+        if 'companies' in data:
+            companies = companies.filter(pk__in=data['companies'])
+        try:
+            quotes = quote_lenders(companies, data['amounts'], data['terms'], data['method'], data['include_schedule'])
+        except TooManyQuotes as e:
+            return Response({
+                'error': f'{e}; narrow the search by product, region or company'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'count': len(quotes), 'quotes': quotes}, status=status.HTTP_200_OK)
 
-class ClientViewSet(viewsets.ModelViewSet):
+class ClientViewSet(KeepLoanRecordsMixin, FastListMixin, QueryPlanMixin, StreamingExportMixin, viewsets.ModelViewSet):
     """
     ViewSet for Client management
     """
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated]
+    export_basename = 'clients'
     
     def get_queryset(self):
         """
@@ -218,8 +325,57 @@ class ClientViewSet(viewsets.ModelViewSet):
             return Client.objects.filter(user=user)
         else:
             return Client.objects.none()
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsLenderStaff])
+    def search(self, request):
+        """
+        Lender staff lookup: clients whose name, email, phone, city or barangay match ?q=
+        (word prefixes, plus near misses where pg_trgm is installed), best matches first, ?limit= at most 100
+        """
+        params = ClientSearchSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = Client.objects.select_related('user').defer('search_document')
+        clients = search_clients(queryset, params.validated_data['q'], params.validated_data['limit'])
+        serializer = self.get_serializer(clients, many=True)
+        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminRole])
+    def bulk_import(self, request):
+        """
+        Import borrowers from an uploaded CSV/JSON file or a JSON list of rows.
+        Pass ?invite=true to create invitation accounts without passwords, which
+        borrowers set through accept_invitation. Passwords are hashed in this
+        request, so files over BULK_IMPORT['MAX_ROWS'] rows (MAX_INVITE_ROWS with
+        ?invite=true) are refused: run ``manage.py import_borrowers`` for those.
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            rows = read_rows(upload, upload.name)
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            return Response({
+                'error': 'Upload a CSV/JSON file as "file" or post a JSON list of rows'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        invite = request.query_params.get('invite') == 'true'
+        options = import_options()
+        max_rows = options['MAX_INVITE_ROWS' if invite else 'MAX_ROWS']
+        try:
+            rows = check_rows(list(islice(rows, max_rows + 1)))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > max_rows:
+            return Response({
+                'error': f'At most {max_rows} rows per request; import larger files with manage.py import_borrowers'
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
+        importer = BorrowerImporter(workers=options['WORKERS'], invite=invite)
+        return Response(importer.run(rows), status=status.HTTP_200_OK)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(KeepLoanRecordsMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """
     ViewSet for user management (admin only)
     """
@@ -245,4 +401,40 @@ class UserViewSet(viewsets.ModelViewSet):
             return CustomUser.objects.all()
         else:
             # Regular users can only see their own profile
-            return CustomUser.objects.filter(id=user.id)
\ No newline at end of file
+            return CustomUser.objects.filter(id=user.id)
+
+
+class DashboardView(APIView):
+    """
+    Pre-computed client and company counts for the overview dashboards, with when they were
+    last rebuilt (refreshed_at) and changed (updated_at); see users/dashboards.py.
+    Platform-wide figures, so for lender staff and admins only
+    """
+    permission_classes = [IsLenderStaff]
+    
+    def get(self, request):
+        return Response(dashboard_data(), status=status.HTTP_200_OK)
+
+
+class MetricsView(APIView):
+    """
+    Base for monitoring endpoints: staff users, or scrapers sending the METRICS_TOKEN
+    """
+    authentication_classes = [MetricsTokenAuthentication, CachedJWTAuthentication]
+    permission_classes = [permissions.IsAdminUser | IsMetricsScraper]
+
+
+class DatabaseMetricsView(MetricsView):
+    """
+    Database connection metrics for monitoring
+    """
+    def get(self, request):
+        return Response({'databases': connection_metrics()}, status=status.HTTP_200_OK)
+
+
+class PrometheusMetricsView(MetricsView):
+    """
+    Per-route request metrics and database connection metrics in the Prometheus text format
+    """
+    def get(self, request):
+        return HttpResponse(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)